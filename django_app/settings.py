@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,6 +24,8 @@ SECRET_KEY = config("SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=False, cast=bool)
 
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=Csv())
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -44,6 +46,9 @@ CRISPY_TEMPLATE_PACK = "bootstrap4"
 
 
 MIDDLEWARE = [
+    'my_farm.middleware.ProfilingMiddleware',
+    'my_farm.middleware.MetricsMiddleware',
+    'my_farm.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -51,6 +56,9 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'my_farm.middleware.QueryCountMiddleware',
+    'my_farm.middleware.SlowQueryMiddleware',
+    'my_farm.middleware.ChangeLogMiddleware',
 ]
 
 ROOT_URLCONF = 'django_app.urls'
@@ -59,8 +67,16 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
+        'APP_DIRS': DEBUG,
         'OPTIONS': {
+            # Outside of DEBUG compiled templates are kept in memory. With DEBUG the loaders are left to Django's
+            # defaults, so template edits show up without a restart.
+            **({} if DEBUG else {'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ]}),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -81,10 +97,15 @@ MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': config('DATABASE_NAME', default=BASE_DIR / 'db.sqlite3'),
+        # The tests use a database file, as threads cannot share an in-memory database, e.g. in the job worker tests.
+        'TEST': {'NAME': config('TEST_DATABASE_NAME', default=BASE_DIR / 'test_db.sqlite3')},
     }
 }
 
+# The test runner points METRICS_DIR at a temporary directory, so test runs do not add to the metrics of the site.
+TEST_RUNNER = 'my_farm.tests.runner.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -124,6 +145,25 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (
     os.path.join(BASE_DIR, "my_farm/static/"),
 )
+STATIC_ROOT = config('STATIC_ROOT', default=os.path.join(BASE_DIR, 'staticfiles'))
+
+# Outside of DEBUG, collectstatic writes content-hashed files with precompressed .br and .gz siblings to STATIC_ROOT.
+# Serve them from the web server with "Cache-Control: public, max-age=31536000, immutable", e.g. with nginx's
+# gzip_static and brotli_static.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': config('STATICFILES_BACKEND', default=(
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'my_farm.storage.CompressedManifestStaticFilesStorage'
+        )),
+    },
+}
+# Precompressed siblings that save less than this share of the original size are not kept.
+STATIC_COMPRESSION_MIN_SAVING = config('STATIC_COMPRESSION_MIN_SAVING', default=0.05, cast=float)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -140,5 +180,142 @@ LOGIN_REDIRECT_URL = '/my_farm/'
 LOGOUT_REDIRECT_URL = '/'
 
 
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-MEDIA_URL = '/media/'
\ No newline at end of file
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+MEDIA_URL = '/media/'
+
+
+# Query instrumentation
+# my_farm.middleware.QueryCountMiddleware logs the query summary of a QUERY_LOG_SAMPLE_RATE share of production
+# requests, and my_farm.middleware.SlowQueryMiddleware logs queries slower than SLOW_QUERY_THRESHOLD_MS with their
+# origin and query plan; 0 disables slow-query logging.
+
+QUERY_LOG_SAMPLE_RATE = config('QUERY_LOG_SAMPLE_RATE', default=0.01, cast=float)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=250, cast=float)
+
+# Logging
+# The my_farm loggers write to the console at MY_FARM_LOG_LEVEL.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'my_farm': {
+            'handlers': ['console'],
+            'level': config('MY_FARM_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
+# Request profiling
+# One in PROFILING_SAMPLE_RATE requests is profiled when enabled; 0 profiles only requests with a signed token.
+
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0, cast=int)
+PROFILING_BACKEND = config('PROFILING_BACKEND', default='cprofile')
+PROFILING_DIR = config('PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_FILES = config('PROFILING_MAX_FILES', default=200, cast=int)
+PROFILING_TOKEN_MAX_AGE = config('PROFILING_TOKEN_MAX_AGE', default=24 * 60 * 60, cast=int)
+
+# Prometheus metrics
+# The /metrics endpoint is disabled unless METRICS_TOKEN is set. Worker processes flush their metrics to files in
+# METRICS_DIR, a directory of this host, and every scrape moves the metrics of processes that exited into its own file.
+
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(BASE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+
+# Caching
+# my_farm.cache.TieredCache keeps a small in-process LRU (L1) in front of the shared 'default' cache (L2). Set
+# CACHE_BACKEND to django.core.cache.backends.redis.RedisCache and CACHE_LOCATION to a redis:// URL to share L2
+# through Redis instead of the file system.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    },
+    # Used by the {% cache %} tags of the listing and detail templates. Their keys contain the primary key and
+    # 'updated_at' of every rendered row, so they never go stale and a per-process memory cache is enough.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template_fragments',
+        'OPTIONS': {'MAX_ENTRIES': config('TEMPLATE_FRAGMENT_MAX_ENTRIES', default=5000, cast=int)},
+    },
+}
+# Sessions are read from the shared cache and only fall back to the django_session table on a cache miss.
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+CACHE_L1_MAX_ENTRIES = config('CACHE_L1_MAX_ENTRIES', default=256, cast=int)
+CACHE_L1_VERSION_TTL = config('CACHE_L1_VERSION_TTL', default=1, cast=float)
+# Seconds entries of each cache namespace are kept, model changes invalidate them earlier.
+CACHE_TTLS = {
+    'dashboard': config('CACHE_TTL_DASHBOARD', default=60, cast=int),
+    'groups': config('CACHE_TTL_GROUPS', default=300, cast=int),
+    'herds': config('CACHE_TTL_HERDS', default=300, cast=int),
+    'fields': config('CACHE_TTL_FIELDS', default=300, cast=int),
+    'reports': config('CACHE_TTL_REPORTS', default=900, cast=int),
+    'occupancy': config('CACHE_TTL_OCCUPANCY', default=900, cast=int),
+    'projections': config('CACHE_TTL_PROJECTIONS', default=3600, cast=int),
+}
+
+# Field occupancy
+# The field detail page shows the daily stocking density of the last FIELD_OCCUPANCY_DAYS days and flags fields stocked
+# above FIELD_MAX_LIVESTOCK_UNITS_PER_HA livestock units per hectare.
+
+FIELD_OCCUPANCY_DAYS = config('FIELD_OCCUPANCY_DAYS', default=365, cast=int)
+FIELD_MAX_LIVESTOCK_UNITS_PER_HA = config('FIELD_MAX_LIVESTOCK_UNITS_PER_HA', default=2.0, cast=float)
+
+# Group data
+# The group data page shows GROUP_DATA_PAGE_SIZE cattle per page.
+
+GROUP_DATA_PAGE_SIZE = config('GROUP_DATA_PAGE_SIZE', default=100, cast=int)
+
+# Census projection
+# The birth and loss rates applied to census projections are derived from the last PROJECTION_HISTORY_MONTHS months.
+
+PROJECTION_HISTORY_MONTHS = config('PROJECTION_HISTORY_MONTHS', default=12, cast=int)
+
+# Change log
+# The change log API returns at most CHANGE_LOG_PAGE_SIZE entries per request.
+
+CHANGE_LOG_PAGE_SIZE = config('CHANGE_LOG_PAGE_SIZE', default=500, cast=int)
+
+# Device sync
+# A delta sync reads at most SYNC_PAGE_SIZE change log entries, and uploads of offline edits may decompress to at most
+# SYNC_MAX_UPLOAD_SIZE bytes.
+
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=5000, cast=int)
+SYNC_MAX_UPLOAD_SIZE = config('SYNC_MAX_UPLOAD_SIZE', default=10 * 1024 * 1024, cast=int)
+
+# Background jobs
+# Workers started with 'manage.py run_workers' poll the queue every JOB_POLL_INTERVAL seconds when it is empty. Failed
+# jobs are tried JOB_MAX_ATTEMPTS times, waiting JOB_RETRY_BACKOFF seconds before the first retry and twice as long
+# before every next one. Running jobs refresh their lock four times per JOB_LOCK_TIMEOUT, and jobs whose lock is older
+# than JOB_LOCK_TIMEOUT seconds, because their worker stopped, are queued again.
+
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_RETRY_BACKOFF = config('JOB_RETRY_BACKOFF', default=30, cast=int)
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=600, cast=int)
+
+# Response compression
+# my_farm.middleware.CompressionMiddleware compresses responses of these content types with Brotli or gzip.
+
+COMPRESSION_ENABLED = config('COMPRESSION_ENABLED', default=True, cast=bool)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+COMPRESSION_CONTENT_TYPES = config('COMPRESSION_CONTENT_TYPES', cast=Csv(), default=(
+    'text/html,text/css,text/plain,text/csv,text/javascript,application/javascript,application/json,'
+    'application/x-ndjson,image/svg+xml'
+))
+
+# Conditional GET
+# Part of every ETag; change it on deployments that change the rendered pages so clients do not keep old copies.
+
+ETAG_VERSION = config('ETAG_VERSION', default='1')
@@ -4,6 +4,7 @@ from django.urls import path, include
 from django.contrib.auth.views import LoginView, PasswordResetView
 from django_app.views import main
 from user.views import profile, register, password
+from my_farm.views_metrics import metrics
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -17,6 +18,7 @@ urlpatterns = [
     path('login/', LoginView.as_view(template_name='login.html'), name='login'),
     path('profile/', profile, name='profile'),
     path('profile/password_change/', password, name='password_change'),
+    path('metrics', metrics, name='metrics'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
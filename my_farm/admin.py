@@ -1,27 +1,102 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.shortcuts import render
+from django.utils.functional import cached_property
+from .memberships import mark_lost, move_cattle
 from .models import Cattle, Herd, Field
+from .query_plans import estimated_count
 
+# Changelists the query planner expects to have at least this many rows show the estimate instead of an exact count.
+ESTIMATED_COUNT_THRESHOLD = 10000
 
-class CattleAdmin(admin.ModelAdmin):
-    list_display = ['number', 'name', 'breed', 'birth_date', 'entry_date', 'end_date']
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that takes the number of rows of large changelists from the query planner's estimate instead of
+    counting them, see my_farm.query_plans.estimated_count. Small changelists, and changelists on databases without
+    estimates, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class PerformantModelAdmin(admin.ModelAdmin):
+    """
+    A ModelAdmin whose changelists do not count the whole table on every page load.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class MoveToHerdForm(forms.Form):
+    herd = forms.ModelChoiceField(queryset=Herd.objects.all(),
+                                  widget=AutocompleteSelect(Cattle._meta.get_field('herd'), admin.site))
+
+
+@admin.register(Cattle)
+class CattleAdmin(PerformantModelAdmin):
+    list_display = ['number', 'name', 'breed', 'herd', 'birth_date', 'entry_date', 'end_date']
+    list_select_related = ['herd']
     ordering = ['name']
+    # Exact numbers are found with the unique index on 'number'.
+    search_fields = ['number__exact', 'name__startswith']
+    autocomplete_fields = ['herd']
+    actions = ['move_to_herd', 'mark_sold']
+
+    @admin.action(description='Move selected cattle to a herd')
+    def move_to_herd(self, request, queryset):
+        """
+        Asks for the herd to move the selected cattle to, then moves them with my_farm.memberships.move_cattle.
+        """
+        form = MoveToHerdForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            herd = form.cleaned_data['herd']
+            moved = move_cattle(queryset, herd)
+            self.message_user(request, f'Moved {moved} cattle to {herd}.', messages.SUCCESS)
+            return None
 
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Move cattle to a herd',
+            'opts': self.model._meta,
+            'form': form,
+            'media': self.media + form.media,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return render(request, 'admin/my_farm/cattle/move_to_herd.html', context)
 
-admin.site.register(Cattle)
+    @admin.action(description='Mark selected cattle as sold today')
+    def mark_sold(self, request, queryset):
+        """
+        Records the selected cattle that are still on the farm as sold, with my_farm.memberships.mark_lost.
+        """
+        sold = mark_lost(queryset, 'Sold')
+        self.message_user(request, f'Marked {sold} cattle as sold.', messages.SUCCESS)
 
 
-class HerdAdmin(admin.ModelAdmin):
+@admin.register(Herd)
+class HerdAdmin(PerformantModelAdmin):
     list_display = ['name', 'location', 'field', 'description', 'start_date', 'is_active', 'herd_leader']
+    list_select_related = ['field', 'herd_leader']
     ordering = ['field']
+    search_fields = ['name__startswith']
+    # The herd leader is picked by search instead of a select listing every cattle.
+    autocomplete_fields = ['field', 'herd_leader']
 
 
-admin.site.register(Herd)
-
-
-class FieldAdmin(admin.ModelAdmin):
+@admin.register(Field)
+class FieldAdmin(PerformantModelAdmin):
     list_display = ['name', 'location', 'coordinates', 'field_size', 'size_unit', 'field_type', 'is_active',
                     'description']
     ordering = ['name']
-
-admin.site.register(Field)
-
+    search_fields = ['name__startswith']
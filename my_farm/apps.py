@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CattleFarmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'my_farm'
+
+    def ready(self):
+        """
+        Connects the signal handlers that keep the denormalized herd and field counters up to date and registers the
+        background job functions.
+        """
+        from . import signals, tasks  # noqa: F401
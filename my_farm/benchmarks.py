@@ -0,0 +1,252 @@
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from .cache import clear_cached_data
+from .cattle_groups import GroupsManagement
+from .models import Cattle, Herd, Field
+from .report_calculations import GroupNumbers, AcquisitionLossCalculator, MovementCalculator, GroupByCalculator
+from .snapshot import cattle_snapshot
+from .utils import calculate_age
+
+BENCHMARKS = {}
+
+
+def benchmark(name, cached=False):
+    """
+    Registers a benchmark setup function under the given name.
+
+    The setup function runs once and returns a callable whose execution time is measured.
+
+    :param name: The benchmark name used in the results.
+    :param cached: Whether the measured code reads the tiered cache, the template fragments or the cattle snapshot.
+        Such benchmarks are registered twice: under the name with all of them cleared before every timed round, and
+        as '<name>_warm' with the data cached by the previous round.
+    :return: The decorator.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, cached)
+        if cached:
+            BENCHMARKS[f'{name}_warm'] = (setup, False)
+        return setup
+    return decorator
+
+
+def clear_caches():
+    """
+    Drops the cached data and the cattle snapshot, so the next round computes everything again.
+    """
+    clear_cached_data()
+    cattle_snapshot.columns = None
+
+
+def run_benchmark(name, rounds):
+    """
+    Runs a registered benchmark and returns timing statistics in seconds.
+
+    :param name: The registered benchmark name.
+    :param rounds: The number of timed rounds, after one untimed warm-up round.
+    :return: A dictionary with the number of rounds and the min, max, mean, median and stdev timings.
+    """
+    setup, cold = BENCHMARKS[name]
+    func = setup()
+    func()
+
+    timings = []
+    for _ in range(rounds):
+        if cold:
+            clear_caches()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'rounds': rounds,
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.mean(timings),
+        'median': statistics.median(timings),
+        'stdev': statistics.stdev(timings) if rounds > 1 else 0.0,
+    }
+
+
+def dataset_summary():
+    """
+    Returns the size of the dataset the benchmarks run against.
+    """
+    return {
+        'cattle': Cattle.objects.count(),
+        'herds': Herd.objects.count(),
+        'fields': Field.objects.count(),
+    }
+
+
+def report_range():
+    """
+    Returns the date range used by the report benchmarks: the last year up to today.
+    """
+    end_date = date.today()
+    return end_date - timedelta(days=365), end_date
+
+
+def report_groups():
+    """
+    Calculates the estimation, start date and end date groups the report calculators work on, including the cattle
+    that left the farm.
+    """
+    start_date, end_date = report_range()
+    columns = cattle_snapshot.current()
+    estimation_date = columns.group_records(end_date)
+    start_date_groups = columns.group_records(start_date)
+    end_date_groups = columns.group_records(end_date)
+    return estimation_date, start_date_groups, end_date_groups
+
+
+@contextmanager
+def rolled_back():
+    """
+    Runs the benchmarks in a transaction that is rolled back at the end, so the 'benchmark' user and its sessions are
+    not left in the database.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def logged_in_client():
+    """
+    Returns a test client logged in as the 'benchmark' user, creating the user if needed. Run the view benchmarks
+    inside rolled_back, so the user is not kept.
+    """
+    user, _ = User.objects.get_or_create(username='benchmark')
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def get_page(client, url, **params):
+    """
+    Returns a callable that requests the URL and fails if the response is not successful.
+    """
+    def request():
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise AssertionError(f'{url} returned {response.status_code}.')
+        return response
+    return request
+
+
+@benchmark('calculate_age')
+def bench_calculate_age():
+    birth_dates = list(Cattle.objects.filter(birth_date__isnull=False).values_list('birth_date', flat=True))
+    today = date.today()
+    return lambda: [calculate_age(birth_date, today) for birth_date in birth_dates]
+
+
+@benchmark('calculate_groups')
+def bench_calculate_groups():
+    today = date.today()
+    return lambda: GroupsManagement().calculate_groups(reference_date=today)
+
+
+@benchmark('snapshot_reload')
+def bench_snapshot_reload():
+    return cattle_snapshot.reload
+
+
+@benchmark('group_numbers')
+def bench_group_numbers():
+    start_date, end_date = report_range()
+    estimation_date, start_date_groups, end_date_groups = report_groups()
+
+    def run():
+        for group_name, cattle_data in estimation_date.items():
+            group = GroupNumbers(group_name, cattle_data)
+            group.calculate_start_date_stats(start_date_groups, start_date)
+            group.calculate_end_date_stats(end_date_groups, end_date)
+            group.calculate_difference()
+    return run
+
+
+@benchmark('acquisition_loss_calculator')
+def bench_acquisition_loss_calculator():
+    start_date, end_date = report_range()
+    estimation_date, _, _ = report_groups()
+
+    def run():
+        for group_name, cattle_data in estimation_date.items():
+            calculator = AcquisitionLossCalculator(group_name, cattle_data)
+            calculator.calculate_acquisition(start_date, end_date)
+            calculator.calculate_loss(start_date, end_date)
+    return run
+
+
+@benchmark('movement_calculator')
+def bench_movement_calculator():
+    start_date, end_date = report_range()
+    estimation_date, start_date_groups, end_date_groups = report_groups()
+
+    def run():
+        for group_name, cattle_data in estimation_date.items():
+            calculator = MovementCalculator(group_name, cattle_data)
+            calculator.calculate_movement_in_and_out(start_date_groups, start_date, end_date_groups, end_date)
+    return run
+
+
+@benchmark('group_by_calculator')
+def bench_group_by_calculator():
+    start_date, end_date = report_range()
+    columns = cattle_snapshot.current()
+    current_herds = {herd_id: (name, field_name) for herd_id, name, field_name in
+                     Herd.objects.values_list('id', 'name', 'field__name')}
+    return lambda: GroupByCalculator(['herd', 'age_group']).calculate(columns, start_date, end_date,
+                                                                      current_herds=current_herds)
+
+
+@benchmark('livestock_movement_report_view', cached=True)
+def bench_livestock_movement_report_view():
+    start_date, end_date = report_range()
+    return get_page(logged_in_client(), reverse('my_farm:report'),
+                    start_date=start_date.isoformat(), end_date=end_date.isoformat())
+
+
+@benchmark('home_view', cached=True)
+def bench_home_view():
+    return get_page(logged_in_client(), reverse('my_farm:home'))
+
+
+@benchmark('search_cattle_view', cached=True)
+def bench_search_cattle_view():
+    return get_page(logged_in_client(), reverse('my_farm:search_cattle'), query='Angus')
+
+
+@benchmark('search_herd_view', cached=True)
+def bench_search_herd_view():
+    return get_page(logged_in_client(), reverse('my_farm:search_herd'), query='Herd 1')
+
+
+@benchmark('search_field_view', cached=True)
+def bench_search_field_view():
+    return get_page(logged_in_client(), reverse('my_farm:search_field'), query='Pasture')
+
+
+@benchmark('cattle_info_pagination', cached=True)
+def bench_cattle_info_pagination():
+    middle_page = Cattle.objects.count() // 8 + 1
+    return get_page(logged_in_client(), reverse('my_farm:cattle_info'), page=middle_page)
+
+
+@benchmark('herd_list_pagination', cached=True)
+def bench_herd_list_pagination():
+    middle_page = Herd.objects.count() // 10 + 1
+    return get_page(logged_in_client(), reverse('my_farm:herd_list'), page=middle_page)
+
+
+@benchmark('field_list_pagination', cached=True)
+def bench_field_list_pagination():
+    middle_page = Field.objects.count() // 10 + 1
+    return get_page(logged_in_client(), reverse('my_farm:field_list'), page=middle_page)
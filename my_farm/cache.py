@@ -0,0 +1,176 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from .metrics import record_cache
+
+MISSING = object()
+
+# Namespaces whose cached data is derived from each model, see my_farm.signals.invalidate_cached_data.
+INVALIDATED_BY = {
+    'Cattle': ('dashboard', 'groups', 'herds', 'reports', 'occupancy', 'projections'),
+    'Herd': ('dashboard', 'herds', 'fields', 'reports', 'occupancy'),
+    'Field': ('dashboard', 'herds', 'fields', 'reports', 'occupancy'),
+}
+
+
+class TieredCache:
+    """
+    A two-tier cache with a small in-process LRU (L1) in front of the shared Django cache (L2).
+
+    Keys are grouped in namespaces with their own TTL from the CACHE_TTLS setting. Every namespace has a version stored
+    in L2 and the version is part of every key, so invalidating a namespace replaces its version and all workers stop
+    reading the old entries. Workers read the namespace versions from L2 at most once every CACHE_L1_VERSION_TTL
+    seconds, which bounds how long another worker's L1 can serve data that was invalidated elsewhere.
+
+    L1 values are stored pickled, like in Django's local-memory cache, so callers can never mutate a cached value.
+    """
+
+    def __init__(self, alias='default', max_entries=None, version_ttl=None):
+        """
+        :param alias: The alias of the shared cache in CACHES.
+        :param max_entries: The maximum number of L1 entries, defaults to the CACHE_L1_MAX_ENTRIES setting.
+        :param version_ttl: Seconds a namespace version is trusted without reading L2, defaults to the
+            CACHE_L1_VERSION_TTL setting.
+        """
+        self.alias = alias
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_or_set(self, namespace, key, default):
+        """
+        Returns the cached value for the key, computing and caching it on a miss.
+
+        :param namespace: The cache namespace, one of the CACHE_TTLS keys.
+        :param key: The key within the namespace.
+        :param default: A callable that computes the value on a miss.
+        :return: The cached or computed value.
+        """
+        ttl = settings.CACHE_TTLS[namespace]
+        full_key = f'my_farm:{namespace}:{self.get_version(namespace)}:{key}'
+
+        value = self.get_local(full_key)
+        if value is not MISSING:
+            record_cache(namespace, hit=True, tier='l1')
+            return value
+
+        value = self.shared.get(full_key, MISSING)
+        if value is not MISSING:
+            record_cache(namespace, hit=True, tier='l2')
+            self.set_local(full_key, value, ttl)
+            return value
+
+        record_cache(namespace, hit=False)
+        value = default()
+        self.shared.set(full_key, value, ttl)
+        self.set_local(full_key, value, ttl)
+        return value
+
+    def invalidate(self, *namespaces):
+        """
+        Invalidates every key of the given namespaces in both tiers and in all worker processes.
+
+        :param namespaces: The namespaces to invalidate.
+        """
+        now = time.monotonic()
+        for namespace in namespaces:
+            version = time.time_ns()
+            self.shared.set(self.version_key(namespace), version, None)
+            with self.lock:
+                self.versions[namespace] = (version, now)
+                prefix = f'my_farm:{namespace}:'
+                for full_key in [full_key for full_key in self.entries if full_key.startswith(prefix)]:
+                    del self.entries[full_key]
+
+    def clear_local(self):
+        """
+        Empties L1, e.g. between tests.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+    def version_key(self, namespace):
+        return f'my_farm:{namespace}:version'
+
+    def get_version(self, namespace):
+        """
+        Returns the current version of a namespace, reading it from L2 when the local copy is too old.
+        """
+        version_ttl = settings.CACHE_L1_VERSION_TTL if self.version_ttl is None else self.version_ttl
+        now = time.monotonic()
+        with self.lock:
+            version, checked = self.versions.get(namespace, (None, None))
+        if version is not None and now - checked < version_ttl:
+            return version
+
+        version_key = self.version_key(namespace)
+        version = self.shared.get(version_key)
+        if version is None:
+            self.shared.add(version_key, time.time_ns(), None)
+            version = self.shared.get(version_key)
+        with self.lock:
+            self.versions[namespace] = (version, now)
+        return version
+
+    def get_local(self, full_key):
+        with self.lock:
+            entry = self.entries.get(full_key)
+            if entry is None:
+                return MISSING
+            expires, payload = entry
+            if expires < time.monotonic():
+                del self.entries[full_key]
+                return MISSING
+            self.entries.move_to_end(full_key)
+        return pickle.loads(payload)
+
+    def set_local(self, full_key, value, ttl):
+        max_entries = settings.CACHE_L1_MAX_ENTRIES if self.max_entries is None else self.max_entries
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[full_key] = (time.monotonic() + ttl, payload)
+            self.entries.move_to_end(full_key)
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+
+tiered_cache = TieredCache()
+
+
+def clear_cached_data():
+    """
+    Drops the data of every cache namespace in both tiers and the cached template fragments, e.g. before a cold
+    benchmark round. Other entries of the shared cache, like sessions, are kept.
+    """
+    caches['template_fragments'].clear()
+    tiered_cache.invalidate(*settings.CACHE_TTLS)
+    tiered_cache.clear_local()
+
+
+def cached_page(namespace, key, queryset, per_page, page_number):
+    """
+    Paginates a queryset, caching the object count and the objects of the requested page.
+
+    :param namespace: The cache namespace.
+    :param key: The key of the listing within the namespace, e.g. built from its filters.
+    :param queryset: The queryset to paginate.
+    :param per_page: The number of objects per page.
+    :param page_number: The requested page number, handled like Paginator.get_page.
+    :return: The page object, with the objects of the page loaded from the cache.
+    """
+    paginator = Paginator(queryset, per_page)
+    paginator.count = tiered_cache.get_or_set(namespace, f'{key}:count', queryset.count)
+    page = paginator.get_page(page_number)
+    page.object_list = tiered_cache.get_or_set(namespace, f'{key}:page:{page.number}', lambda: list(page.object_list))
+    return page
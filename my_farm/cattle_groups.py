@@ -1,6 +1,52 @@
+from datetime import date
+from django.core.paginator import Paginator
+from django.db.models import Q
 from my_farm.models import Cattle
-from .report_calculations import GroupDataFilters
-from .utils import calculate_age
+from .cache import tiered_cache
+from .snapshot import cattle_snapshot, latest_birth_ordinal
+
+# The columns shown on the group data page.
+GROUP_DATA_FIELDS = ('id', 'type', 'number', 'name', 'gender', 'breed', 'birth_date', 'acquisition_method',
+                     'entry_date', 'comments')
+
+# The columns the group data page can be sorted by.
+GROUP_DATA_SORTS = ('type', 'number', 'name', 'gender', 'breed', 'birth_date', 'acquisition_method', 'entry_date')
+
+
+def parse_group_sort(params):
+    """
+    Reads the sort order of the group data page from the 'sort' query parameter, a column name optionally prefixed
+    with '-' for descending order.
+
+    :param params: The query parameters, e.g. request.GET.
+    :return: The sort order, 'name' if the parameter is missing or names an unknown column.
+    """
+    sort = params.get('sort', '')
+    return sort if sort.lstrip('-') in GROUP_DATA_SORTS else 'name'
+
+
+def group_filter(group_name, reference_date):
+    """
+    Returns the conditions cattle on the farm meet to be in an age group on the reference date, following the rules
+    of the cattle snapshot.
+
+    :param group_name: The name of the age group.
+    :param reference_date: The reference date.
+    :return: A Q object, or None for an unknown group.
+    """
+    young = date.fromordinal(latest_birth_ordinal(reference_date, 12))
+    adult = date.fromordinal(latest_birth_ordinal(reference_date, 24))
+    conditions = {
+        'Cows': Q(gender='Cow'),
+        'Calves': Q(gender__in=('Heifer', 'Bull'), birth_date__gt=young, birth_date__lte=reference_date),
+        'Young_Heifer': Q(gender='Heifer', birth_date__gt=adult, birth_date__lte=young),
+        'Adult_Heifer': Q(gender='Heifer', birth_date__lte=adult),
+        'Young_Bull': Q(gender='Bull', birth_date__gt=adult, birth_date__lte=young),
+        'Adult_Bull': Q(gender='Bull', birth_date__lte=adult),
+    }
+    if group_name not in conditions:
+        return None
+    return conditions[group_name] & Q(entry_date__lt=reference_date, end_date__isnull=True)
 
 
 class GroupsManagement:
@@ -13,62 +59,42 @@ class GroupsManagement:
         Initializes a GroupsManagement instance with an empty dictionary to store cattle groups.
 
         The 'groups' attribute is a dictionary where each key represents the name of a cattle group,
-        and the corresponding value is a list of GroupDataFilters instances containing cattle data for that group.
+        and the corresponding value is the list of IDs of the cattle in that group.
         """
-        self.groups: dict[str, list[GroupDataFilters]] = {}
+        self.groups: dict[str, list[int]] = {}
 
-    def calculate_groups(self, reference_date):
+    def calculate_groups(self, reference_date, version=None):
         """
-        Calculates the groups of cattle based on the provided estimation date.
+        Calculates the groups of cattle on the reference date from the process-wide cattle snapshot.
 
         :param reference_date: The reference date for the calculation.
+        :param version: The global data version, if the caller already read it, see CattleSnapshot.current.
+        :return: A dictionary of group names to the IDs of the cattle in the group that have not left the farm.
+        """
+        return cattle_snapshot.current(version).group_ids(reference_date)
+
+    def cached_groups(self, reference_date, version=None):
+        """
+        Returns the groups of cattle for the reference date from the 'groups' cache, calculating them on a miss.
+
+        :param reference_date: The reference date for the calculation.
+        :param version: The global data version, if the caller already read it, see CattleSnapshot.current.
         :return: A dictionary containing the calculated groups of cattle.
         """
-        cattle_list = list(Cattle.objects.filter(deleted=False).values())
-
-        groups = {
-            'Cows': [
-                cattle for cattle in cattle_list if (
-                    cattle['gender'] == 'Cow' and cattle['entry_date'] < reference_date
-                )
-            ],
-            'Calves': [
-                cattle for cattle in cattle_list if (
-                    cattle['gender'] in ['Heifer', 'Bull'] and
-                    0 <= calculate_age(cattle['birth_date'], reference_date) < 12 and
-                    cattle['entry_date'] < reference_date
-                )
-            ],
-            'Young_Heifer': [
-                cattle for cattle in cattle_list if (
-                    cattle['gender'] == 'Heifer' and
-                    12 <= calculate_age(cattle['birth_date'], reference_date) < 24 and
-                    cattle['entry_date'] < reference_date
-                )
-            ],
-            'Adult_Heifer': [
-                cattle for cattle in cattle_list if (
-                    cattle['gender'] == 'Heifer' and
-                    calculate_age(cattle['birth_date'], reference_date) >= 24 and
-                    cattle['entry_date'] < reference_date
-                )
-            ],
-            'Young_Bull': [
-                cattle for cattle in cattle_list if (
-                    cattle['gender'] == 'Bull' and
-                    12 <= calculate_age(cattle['birth_date'], reference_date) < 24 and
-                    cattle['entry_date'] < reference_date
-                )
-            ],
-            'Adult_Bull': [
-                cattle for cattle in cattle_list if (
-                    cattle['gender'] == 'Bull' and
-                    calculate_age(cattle['birth_date'], reference_date) >= 24 and
-                    cattle['entry_date'] < reference_date
-                )
-            ],
-        }
-        return groups
+        return tiered_cache.get_or_set('groups', reference_date.isoformat(),
+                                       lambda: self.calculate_groups(reference_date, version))
+
+    def group_queryset(self, group_name, reference_date):
+        """
+        Returns the cattle of a group on the reference date as a queryset, so that large groups can be sorted and
+        paginated by the database.
+
+        :param group_name: The name of the group.
+        :param reference_date: The reference date for the group calculation.
+        :return: A queryset of the cattle in the group that have not left the farm, or None for an unknown group.
+        """
+        conditions = group_filter(group_name, reference_date)
+        return None if conditions is None else Cattle.objects.filter(conditions)
 
     def add_group(self, group_name, reference_date):
         """
@@ -102,33 +128,24 @@ class CattleGroupData:
         self.comments = None
         self.active_cattle = 0
         self.cattle_list = []
+        self.page = None
 
-    def cattle_data(self):
+    def cattle_page(self, queryset, page_number, per_page):
         """
-        Extracts the cattle data from the group data and assigns it to the instance properties.
+        Loads one page of the cattle of the group and assigns it to the 'page' and 'cattle_list' properties, and the
+        number of cattle counted by the same queryset to 'active_cattle'.
+
+        :param queryset: The sorted cattle of the group, see GroupsManagement.group_queryset.
+        :param page_number: The requested page number, handled like Paginator.get_page.
+        :param per_page: The number of cattle per page.
         """
-        for cattle_data in self.group_data:
-            if cattle_data['end_date'] is None:
-                cattle = {
-                    'id': cattle_data['id'],
-                    'type': cattle_data['type'],
-                    'number': cattle_data['number'],
-                    'name': cattle_data['name'],
-                    'gender': cattle_data['gender'],
-                    'breed': cattle_data['breed'],
-                    'birth_date': cattle_data['birth_date'],
-                    'acquisition_method': cattle_data['acquisition_method'],
-                    'entry_date': cattle_data['entry_date'],
-                    'comments': cattle_data['comments'],
-                }
-                self.cattle_list.append(cattle)
+        paginator = Paginator(queryset.only(*GROUP_DATA_FIELDS), per_page)
+        self.page = paginator.get_page(page_number)
+        self.cattle_list = self.page.object_list
+        self.active_cattle = paginator.count
 
     def count_active_cattle(self):
         """
-        Counts the number of active cattle in the group.
-
-        The active cattle are those whose 'end_date' is None in the group data.
+        Counts the number of active cattle in the group, which holds only the cattle that have not left the farm.
         """
-        self.active_cattle = sum(
-            1 for cattle_data in self.group_data if cattle_data['end_date'] is None)
-
+        self.active_cattle = len(self.group_data)
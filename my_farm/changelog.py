@@ -0,0 +1,179 @@
+import threading
+from contextlib import contextmanager
+from functools import cache
+from django.db import transaction
+from django.db.models import FileField
+from .models import ChangeLogEntry, ChangeLogSequence
+
+# Columns that are derived from other rows or the save itself and are left out of the diffs.
+UNTRACKED_FIELDS = {'updated_at'}
+
+buffer_state = threading.local()
+
+
+@cache
+def tracked_fields(model):
+    """
+    Returns the concrete fields of a model whose changes are logged: all but the primary key, the 'updated_at'
+    timestamp and the denormalized counters.
+    """
+    excluded = UNTRACKED_FIELDS | set(getattr(model, 'counter_fields', ()))
+    return [field for field in model._meta.concrete_fields if not field.primary_key and field.name not in excluded]
+
+
+def load_previous_values(instance):
+    """
+    Loads the tracked column values an instance has in the database, by attname.
+
+    :param instance: The instance about to be saved.
+    :return: A dictionary of column values, or None if the row does not exist yet.
+    """
+    if not instance.pk:
+        return None
+    fields = tracked_fields(type(instance))
+    row = type(instance)._base_manager.filter(pk=instance.pk).values(*(field.attname for field in fields)).first()
+    return {field.attname: column_value(field, row[field.attname]) for field in fields} if row else None
+
+
+def current_values(instance):
+    """
+    Returns the tracked column values of an instance, by attname, as they are written to the database. Deferred
+    columns are left out, as they are not written.
+    """
+    deferred = instance.get_deferred_fields()
+    return {field.attname: column_value(field, field.get_prep_value(getattr(instance, field.attname)))
+            for field in tracked_fields(type(instance)) if field.attname not in deferred}
+
+
+def column_value(field, value):
+    """
+    Normalizes a column value for comparison, storing empty file names as None.
+    """
+    if isinstance(field, FileField):
+        return str(value) if value else None
+    return value
+
+
+def diff(previous, current):
+    """
+    Returns the changed columns as {column: [old, new]}.
+    """
+    return {column: [previous.get(column), value] for column, value in current.items()
+            if previous.get(column) != value}
+
+
+def record_change(model, object_id, action, changes):
+    """
+    Logs a change in the current transaction, so the entry commits or rolls back together with the change.
+
+    Inside batched_changes the entry is written with the other entries of the block at its end, otherwise at once.
+
+    :param model: The changed model class.
+    :param object_id: The primary key of the changed row.
+    :param action: ChangeLogEntry.CREATE, UPDATE or DELETE.
+    :param changes: The field-level diff.
+    """
+    entry = ChangeLogEntry(model=model.__name__, object_id=object_id, action=action, changes=changes,
+                           user_id=current_user_id())
+    if hasattr(buffer_state, 'entries'):
+        buffer_state.entries.append(entry)
+    else:
+        write_entries([entry])
+
+
+def write_entries(entries):
+    """
+    Writes change log entries with one bulk_create, numbered with IDs from ChangeLogSequence so that the IDs follow
+    the commit order. The allocation locks the sequence until the transaction ends, which is why entries are written
+    as late as possible.
+    """
+    with transaction.atomic(savepoint=False):
+        first_id = ChangeLogSequence.allocate(len(entries))
+        for offset, entry in enumerate(entries):
+            entry.id = first_id + offset
+        ChangeLogEntry.objects.bulk_create(entries)
+
+
+def current_user_id():
+    """
+    Returns the ID of the user the changes are attributed to inside attributed_changes, looking it up on first use.
+    """
+    if not hasattr(buffer_state, 'get_user_id'):
+        return None
+    if not hasattr(buffer_state, 'user_id'):
+        buffer_state.user_id = buffer_state.get_user_id()
+    return buffer_state.user_id
+
+
+@contextmanager
+def attributed_changes(get_user_id):
+    """
+    Attributes the changes logged inside the block to a user.
+
+    :param get_user_id: A callable returning the ID of the user who made the changes, called only if a change is
+        logged.
+    """
+    buffer_state.get_user_id = get_user_id
+    try:
+        yield
+    finally:
+        del buffer_state.get_user_id
+        buffer_state.__dict__.pop('user_id', None)
+
+
+@contextmanager
+def batched_changes():
+    """
+    Collects the change log entries recorded inside the block and writes them with one bulk_create at its end.
+
+    The block must run inside the atomic block of the changes, so the entries are written in the same transaction.
+    When the block raises, its entries are dropped along with the changes being rolled back. Nested blocks hand their
+    entries to the enclosing block.
+    """
+    enclosing = getattr(buffer_state, 'entries', None)
+    buffer_state.entries = []
+    try:
+        yield
+        entries = buffer_state.entries
+    finally:
+        if enclosing is None:
+            del buffer_state.entries
+        else:
+            buffer_state.entries = enclosing
+
+    if enclosing is not None:
+        enclosing.extend(entries)
+    elif entries:
+        write_entries(entries)
+
+
+def read_changes(after=0, limit=500, models=None):
+    """
+    Reads the change log entries after a cursor, in ID order.
+
+    Consumers keep the returned cursor and pass it as 'after' on their next read to tail the log. As the IDs follow
+    the commit order, see ChangeLogSequence, no entry below the cursor can still commit and every entry is read exactly
+    once. The query is a range scan of the primary key, or of the model index when models are given.
+
+    :param after: The cursor, the ID of the last entry read before, 0 to read from the start.
+    :param limit: The maximum number of entries to return.
+    :param models: Optional model names, e.g. ['Cattle'], to restrict the entries to.
+    :return: A tuple of the list of entries and the cursor to continue from.
+    """
+    entries = ChangeLogEntry.objects.filter(id__gt=after).order_by('id')
+    if models:
+        entries = entries.filter(model__in=models)
+    entries = list(entries[:limit])
+    return entries, entries[-1].id if entries else after
+
+
+def object_history(model, object_id):
+    """
+    Returns the change log entries of one cattle, herd or field, newest first.
+
+    :param model: The model class.
+    :param object_id: The primary key of the row.
+    :return: A queryset of entries with their users.
+    """
+    return ChangeLogEntry.objects.filter(model=model.__name__, object_id=object_id).select_related(
+        'user').order_by('-id')
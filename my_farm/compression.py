@@ -0,0 +1,97 @@
+import gzip
+import secrets
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def parse_accept_encoding(header):
+    """
+    Parses an Accept-Encoding header into a dictionary of lowercase codings and their quality values.
+
+    :param header: The Accept-Encoding header value.
+    :return: A dictionary such as {'br': 1.0, 'gzip': 0.8}.
+    """
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding.lower()] = quality
+    return codings
+
+
+def choose_encoding(header):
+    """
+    Picks the response encoding for an Accept-Encoding header, preferring Brotli when it is installed.
+
+    :param header: The Accept-Encoding header value.
+    :return: 'br', 'gzip' or None if the client accepts neither.
+    """
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+    if brotli is not None and codings.get('br', wildcard) > 0:
+        return 'br'
+    if codings.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def brotli_padding(max_random_bytes):
+    """
+    Builds a Brotli metadata block of 1 to max_random_bytes random bytes, which decoders skip.
+
+    Like the random filename Django's compress_string puts in the gzip header, it varies the compressed length to
+    mitigate BREACH. It must be written where the Brotli stream is byte-aligned, i.e. right after a flush.
+
+    :param max_random_bytes: The maximum number of random bytes, at most 256.
+    :return: The metadata block, or no bytes if max_random_bytes is 0.
+    """
+    if not max_random_bytes:
+        return b''
+    length = secrets.randbelow(max_random_bytes) + 1
+    # ISLAST=0, MNIBBLES=0 (coded as 3), reserved bit, MSKIPBYTES=1, MSKIPLEN-1, padded to the byte boundary.
+    header = 3 << 1 | 1 << 4 | (length - 1) << 6
+    return header.to_bytes(2, 'little') + secrets.token_bytes(length)
+
+
+def brotli_compress(data, quality, max_random_bytes=0):
+    """
+    Compresses bytes with Brotli, padded with up to max_random_bytes random bytes.
+    """
+    if not max_random_bytes:
+        return brotli.compress(data, quality=quality)
+    return b''.join(brotli_compress_sequence([data], quality, max_random_bytes))
+
+
+def brotli_compress_sequence(sequence, quality, max_random_bytes=0):
+    """
+    Compresses an iterable of byte chunks with Brotli, flushing after every chunk so streamed responses stay
+    incremental. The stream starts with up to max_random_bytes random bytes of padding.
+    """
+    compressor = brotli.Compressor(quality=quality)
+    if max_random_bytes:
+        yield compressor.process(b'') + compressor.flush() + brotli_padding(max_random_bytes)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def gzip_compress_static(data):
+    """
+    Compresses a static file with maximum compression and a fixed timestamp, so that repeated collectstatic runs
+    produce identical files.
+    """
+    return gzip.compress(data, compresslevel=9, mtime=0)
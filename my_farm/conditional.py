@@ -0,0 +1,150 @@
+import hashlib
+from datetime import date
+from django.conf import settings
+from .models import Cattle, Herd, Field, DataVersion
+from .utils import parse_report_range
+
+
+def make_etag(request, *parts):
+    """
+    Builds an opaque ETag from the given version parts and the current user, whose name is rendered on every page.
+
+    :param request: The HTTP request object.
+    :param parts: The values the page content depends on.
+    :return: The ETag, without quotes.
+    """
+    value = ':'.join(str(part) for part in (settings.ETAG_VERSION, request.user.pk, request.user.get_username(), *parts))
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def row_versions(request, queryset, pk, fields):
+    """
+    Loads the 'updated_at' columns a detail page depends on with a single query, once per request.
+
+    The result is stored on the request, so the ETag and Last-Modified functions of a view share the lookup.
+
+    :param request: The HTTP request object.
+    :param queryset: The queryset of the displayed model.
+    :param pk: The primary key of the displayed object.
+    :param fields: The 'updated_at' fields of the object and its rendered relations.
+    :return: A tuple with the field values, or None if the object does not exist.
+    """
+    lookups = request.__dict__.setdefault('_row_versions', {})
+    key = (queryset.model, pk)
+    if key not in lookups:
+        lookups[key] = queryset.filter(pk=pk).values_list(*fields).first() if pk else None
+    return lookups[key]
+
+
+def latest(versions):
+    """
+    Returns the most recent of the loaded 'updated_at' values, ignoring missing relations.
+    """
+    return max((value for value in versions if value is not None), default=None) if versions else None
+
+
+def cattle_versions(request, cattle_id=None):
+    return row_versions(request, Cattle.objects, cattle_id, ['updated_at', 'herd__updated_at'])
+
+
+def herd_versions(request, herd_id=None):
+    return row_versions(request, Herd.objects, herd_id,
+                        ['updated_at', 'field__updated_at', 'herd_leader__updated_at'])
+
+
+def field_versions(request, field_id=None):
+    return row_versions(request, Field.objects, field_id, ['updated_at'])
+
+
+def cattle_detail_etag(request, cattle_id=None):
+    versions = cattle_versions(request, cattle_id)
+    return make_etag(request, 'cattle', cattle_id, *versions) if versions else None
+
+
+def cattle_detail_last_modified(request, cattle_id=None):
+    return latest(cattle_versions(request, cattle_id))
+
+
+def herd_detail_etag(request, herd_id=None):
+    versions = herd_versions(request, herd_id)
+    return make_etag(request, 'herd', herd_id, *versions) if versions else None
+
+
+def herd_detail_last_modified(request, herd_id=None):
+    return latest(herd_versions(request, herd_id))
+
+
+def field_detail_etag(request, field_id=None):
+    """
+    Returns the ETag of a field page, which also shows the occupancy series of the cattle data up to today.
+    """
+    versions = field_versions(request, field_id)
+    if not versions:
+        return None
+    version, _ = data_version(request)
+    return make_etag(request, 'field', field_id, *versions, version, date.today(), request.GET.urlencode())
+
+
+def data_version(request):
+    """
+    Returns the global data version and the time it last changed, once per request.
+    """
+    if not hasattr(request, '_data_version'):
+        request._data_version = DataVersion.current()
+    return request._data_version
+
+
+def group_data_etag(request, group_name):
+    """
+    Returns the ETag of a cattle group page, which also changes every day as the cattle grow into other groups, and
+    depends on the page, sort order and streaming options in the query string.
+    """
+    version, _ = data_version(request)
+    return make_etag(request, 'group', group_name, date.today(), version, request.GET.urlencode())
+
+
+def report_etag(request):
+    """
+    Returns the ETag of the movement report for the date range and dimensions in the query string.
+    """
+    report_range = parse_report_range(request.GET)
+    if report_range is None:
+        return None
+    version, _ = data_version(request)
+    return make_etag(request, 'report', *report_range, request.GET.get('by', ''), version)
+
+
+def report_last_modified(request):
+    if parse_report_range(request.GET) is None:
+        return None
+    _, updated_at = data_version(request)
+    return updated_at
+
+
+def report_api_etag(request):
+    """
+    Returns the ETag of the JSON movement report, which also depends on the requested fields.
+    """
+    report_range = parse_report_range(request.GET)
+    if report_range is None:
+        return None
+    version, _ = data_version(request)
+    return make_etag(request, 'report-api', *report_range, request.GET.get('by', ''), version,
+                     request.GET.get('fields', ''))
+
+
+def dashboard_api_etag(request):
+    """
+    Returns the ETag of the JSON dashboard, which changes with the data version, the day and the requested fields.
+    """
+    version, _ = data_version(request)
+    return make_etag(request, 'dashboard-api', date.today(), version, request.GET.get('fields', ''))
+
+
+def data_query_etag(request, **kwargs):
+    """
+    Returns the ETag of a page or JSON endpoint computed from the cattle data, like the census projection or the herd
+    history, which changes with the URL, the query string, the data version and the day.
+    """
+    version, _ = data_version(request)
+    return make_etag(request, request.path, date.today(), version, request.GET.urlencode())
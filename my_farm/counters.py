@@ -0,0 +1,63 @@
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from .models import Herd, Field
+
+ACTIVE_CATTLE_FILTER = Q(cattle__deleted=False, cattle__loss_method__isnull=True)
+
+
+def is_counted(deleted, loss_method):
+    """
+    Returns True if a cattle with the given state counts towards its herd's active cattle count.
+    """
+    return not deleted and loss_method is None
+
+
+def adjust_herd_count(herd_id, amount):
+    """
+    Atomically adds the amount to a herd's active cattle count and marks the herd as updated.
+    """
+    if herd_id is not None and amount:
+        Herd.objects.filter(pk=herd_id).update(active_cattle_count=F('active_cattle_count') + amount,
+                                               updated_at=timezone.now())
+
+
+def adjust_field_count(field_id, amount):
+    """
+    Atomically adds the amount to a field's herd count and marks the field as updated.
+    """
+    if field_id is not None and amount:
+        Field.objects.filter(pk=field_id).update(herd_count=F('herd_count') + amount, updated_at=timezone.now())
+
+
+def reconcile_herd_counts(dry_run=False):
+    """
+    Recomputes the active cattle count of every herd and corrects the ones that drifted.
+
+    Counters drift when cattle are changed without signals, e.g. with bulk_create or queryset update.
+
+    :param dry_run: If True, only reports the drifted herds.
+    :return: A list of (herd, stored count, actual count) tuples for the drifted herds.
+    """
+    drifted = Herd.objects.annotate(actual=Count('cattle', filter=ACTIVE_CATTLE_FILTER)).exclude(
+        active_cattle_count=F('actual')).only('id', 'name', 'active_cattle_count')
+    changes = [(herd, herd.active_cattle_count, herd.actual) for herd in drifted]
+    if not dry_run:
+        for herd, _, actual in changes:
+            Herd.objects.filter(pk=herd.pk).update(active_cattle_count=actual, updated_at=timezone.now())
+    return changes
+
+
+def reconcile_field_counts(dry_run=False):
+    """
+    Recomputes the herd count of every field and corrects the ones that drifted.
+
+    :param dry_run: If True, only reports the drifted fields.
+    :return: A list of (field, stored count, actual count) tuples for the drifted fields.
+    """
+    drifted = Field.objects.annotate(actual=Count('field_herds')).exclude(
+        herd_count=F('actual')).only('id', 'name', 'herd_count')
+    changes = [(field, field.herd_count, field.actual) for field in drifted]
+    if not dry_run:
+        for field, _, actual in changes:
+            Field.objects.filter(pk=field.pk).update(herd_count=actual, updated_at=timezone.now())
+    return changes
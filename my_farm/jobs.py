@@ -0,0 +1,244 @@
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# The registered job functions, by name.
+JOBS = {}
+
+# The number of due jobs a worker tries to claim before it waits for the next poll.
+CLAIM_CANDIDATES = 10
+
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+# Running jobs refresh their lock, and workers release stale jobs, this many times per JOB_LOCK_TIMEOUT.
+LOCK_REFRESHES_PER_TIMEOUT = 4
+
+
+def register_job(name):
+    """
+    Registers a function as a background job under the given name.
+
+    The function is called with the Job instance, to report progress with Job.report_progress, and the job's
+    arguments as keyword arguments. Its return value must be JSON-serializable and is stored as the job's result.
+
+    :param name: The name jobs are queued with.
+    :return: The decorator.
+    """
+    def decorator(function):
+        JOBS[name] = function
+        return function
+    return decorator
+
+
+def enqueue(name, arguments=None, priority=0, run_at=None, max_attempts=None, user=None):
+    """
+    Queues a background job.
+
+    :param name: The name of a registered job function.
+    :param arguments: The keyword arguments of the function, which must be JSON-serializable.
+    :param priority: Jobs with a higher priority run first.
+    :param run_at: The earliest time the job runs, by default now.
+    :param max_attempts: The number of times the job is tried, by default JOB_MAX_ATTEMPTS.
+    :param user: The user who queued the job.
+    :return: The created Job.
+    :raises ValueError: If no job function is registered under the name.
+    """
+    if name not in JOBS:
+        raise ValueError(f'No job function is registered as {name!r}.')
+    return Job.objects.create(
+        name=name,
+        arguments=arguments or {},
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        created_by=user,
+    )
+
+
+def claim_job(worker):
+    """
+    Claims the next due job for a worker.
+
+    A job is claimed with a conditional update from 'queued' to 'running', which only one worker can win, so claiming
+    is safe on SQLite, where the update takes the database write lock, as well as on PostgreSQL. Where the database
+    supports it the candidates are also selected FOR UPDATE SKIP LOCKED in the same transaction, so concurrent workers
+    pick different jobs instead of racing for the same one. On SQLite the candidates are read outside a transaction,
+    because upgrading a read transaction to a write fails at once while another worker writes, instead of waiting
+    for the lock.
+
+    :param worker: The name of the worker.
+    :return: The claimed Job, or None if no job is due.
+    """
+    now = timezone.now()
+    candidates = Job.objects.runnable(now).values_list('id', flat=True)
+    if not connection.features.has_select_for_update_skip_locked:
+        return claim_first(list(candidates[:CLAIM_CANDIDATES]), worker, now)
+    with transaction.atomic():
+        return claim_first(list(candidates.select_for_update(skip_locked=True)[:CLAIM_CANDIDATES]), worker, now)
+
+
+def claim_first(job_ids, worker, now):
+    """
+    Claims the first of the given queued jobs that no other worker claimed in the meantime.
+
+    :return: The claimed Job, or None.
+    """
+    for job_id in job_ids:
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1, progress=0,
+            progress_message='')
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def retry_delay(attempts):
+    """
+    Returns the exponential backoff before the next attempt of a job, starting at JOB_RETRY_BACKOFF seconds and
+    doubling with every attempt up to an hour, with up to 10% of random jitter so failed jobs do not retry in lockstep.
+    """
+    delay = min(timedelta(seconds=settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+    return delay * (1 + random.random() / 10)
+
+
+def lock_refresh_interval():
+    """
+    Returns the seconds between the lock refreshes of running jobs and between the releases of stale jobs.
+    """
+    return settings.JOB_LOCK_TIMEOUT / LOCK_REFRESHES_PER_TIMEOUT
+
+
+class Heartbeat:
+    """
+    A context manager that refreshes the lock of a running job from a background thread, so that jobs which run for
+    longer than JOB_LOCK_TIMEOUT without reporting progress are not released to another worker while they run.
+
+    :param job: The claimed Job.
+    :param interval: The seconds between refreshes.
+    """
+
+    def __init__(self, job, interval):
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f'heartbeat-{job.pk}', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        """
+        Refreshes the lock every interval until the job finishes, on the thread's own database connection.
+        """
+        held = Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, locked_by=self.job.locked_by)
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    held.update(locked_at=timezone.now())
+                except OperationalError as exc:
+                    # The job itself may hold the SQLite write lock for longer than its timeout; try again later.
+                    logger.warning('Could not refresh the lock of job %s: %s', self.job, exc)
+        finally:
+            connection.close()
+
+
+def run_job(job, heartbeat_interval=None):
+    """
+    Runs a claimed job and stores its result, or queues it again with a backoff when it fails and has attempts left.
+
+    The lock of the job is refreshed while it runs, see Heartbeat. The outcome is only stored while the worker still
+    holds the job, so a job that was given to another worker after its lock expired is not overwritten.
+
+    :param job: The claimed Job.
+    :param heartbeat_interval: The seconds between lock refreshes, by default a quarter of JOB_LOCK_TIMEOUT.
+    :return: True if the job succeeded.
+    """
+    held = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    try:
+        function = JOBS.get(job.name)
+        if function is None:
+            raise LookupError(f'No job function is registered as {job.name!r}.')
+        with Heartbeat(job, lock_refresh_interval() if heartbeat_interval is None else heartbeat_interval):
+            result = function(job, **job.arguments)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s failed on attempt %d of %d:\n%s', job, job.attempts, job.max_attempts, error)
+        if job.attempts < job.max_attempts:
+            held.update(status=Job.QUEUED, run_at=timezone.now() + retry_delay(job.attempts), error=error,
+                        locked_by='', locked_at=None)
+        else:
+            held.update(status=Job.FAILED, error=error, finished_at=timezone.now(), locked_by='', locked_at=None)
+        return False
+
+    held.update(status=Job.SUCCEEDED, result=result, progress=100, error='', finished_at=timezone.now(),
+                locked_by='', locked_at=None)
+    return True
+
+
+def release_stale_jobs():
+    """
+    Queues the running jobs whose lock was not refreshed for JOB_LOCK_TIMEOUT seconds again, or fails them when they
+    have no attempts left. Their worker stopped, as a running job refreshes its lock, see Heartbeat.
+
+    :return: The number of released jobs.
+    """
+    now = timezone.now()
+    stale = Job.objects.stale(now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT))
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, run_at=now, error='The worker stopped responding.', locked_by='', locked_at=None)
+    failed = stale.update(status=Job.FAILED, error='The worker stopped responding.', finished_at=now, locked_by='',
+                          locked_at=None)
+    return requeued + failed
+
+
+def work(worker, stop, poll_interval=None, burst=False):
+    """
+    Runs due jobs until the stop event is set, waiting poll_interval seconds whenever the queue is empty. Stale jobs
+    are released before the first claim and then every quarter of JOB_LOCK_TIMEOUT, whether the queue is empty or not.
+
+    :param worker: The name of the worker, stored on the jobs it claims.
+    :param stop: A threading or multiprocessing Event that stops the worker after its current job.
+    :param poll_interval: The seconds to wait when no job is due, by default JOB_POLL_INTERVAL.
+    :param burst: If True, returns as soon as no job is due instead of waiting for more.
+    :return: The number of jobs run.
+    """
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    count = 0
+    next_release = time.monotonic()
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            if time.monotonic() >= next_release:
+                release_stale_jobs()
+                next_release = time.monotonic() + lock_refresh_interval()
+            job = claim_job(worker)
+        except OperationalError as exc:
+            # SQLite reports a busy database when several workers write for longer than its timeout.
+            logger.warning('Worker %s could not claim a job: %s', worker, exc)
+            stop.wait(poll_interval)
+            continue
+
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+
+        run_job(job)
+        count += 1
+    return count
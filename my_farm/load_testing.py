@@ -0,0 +1,280 @@
+import base64
+import http.cookiejar
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+
+CSRF_TOKEN_PATTERN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+GROUP_NAMES = ['Cows', 'Calves', 'Young_Heifer', 'Adult_Heifer', 'Young_Bull', 'Adult_Bull']
+SEARCH_QUERIES = ['Angus', 'Crossbreed', 'Heifer', 'Cow 1', 'Herd 1', '2021']
+# 1x1 transparent PNG used by the upload scenario.
+PICTURE = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+
+
+class LoadTestClient:
+    """
+    An HTTP client with its own cookie jar that logs in once and then runs scenarios as that user.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        """
+        Returns the value of the CSRF cookie, which Django accepts as the form token.
+        """
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None, headers=None):
+        """
+        Sends a GET request, or a POST request if data is given, and reads the whole response.
+
+        :param path: The request path, relative to the base URL.
+        :param data: The encoded request body for POST requests.
+        :param headers: Additional request headers.
+        :return: A tuple with the status code and the response body.
+        """
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        if data is not None:
+            request.add_header('Referer', self.base_url + path)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def get(self, path, **params):
+        if params:
+            path = f'{path}?{urllib.parse.urlencode(params)}'
+        return self.request(path)
+
+    def post(self, path, fields):
+        fields = {'csrfmiddlewaretoken': self.csrf_token(), **fields}
+        data = urllib.parse.urlencode(fields, doseq=True).encode()
+        return self.request(path, data, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def post_file(self, path, field_name, filename, content):
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="csrfmiddlewaretoken"\r\n\r\n'
+            f'{self.csrf_token()}\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n'
+        ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+        return self.request(path, body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def login(self, username, password):
+        """
+        Logs in through the login form.
+
+        :raises RuntimeError: If the login form does not redirect after submitting the credentials.
+        """
+        status, body = self.get('/login/')
+        match = CSRF_TOKEN_PATTERN.search(body.decode())
+        token = match.group(1) if match else self.csrf_token()
+        data = urllib.parse.urlencode({'csrfmiddlewaretoken': token, 'username': username, 'password': password})
+        status, body = self.request('/login/', data.encode(), {'Content-Type': 'application/x-www-form-urlencoded'})
+        if b'name="password"' in body:
+            raise RuntimeError(f'Could not log in as {username!r}.')
+
+
+class Scenarios:
+    """
+    The weighted user scenarios of the load test.
+
+    Each scenario method runs one or more requests with a client and returns a list of (endpoint, status, seconds)
+    tuples. The ids of existing cattle, herds and fields are used for drill-down and edit scenarios.
+    """
+
+    WEIGHTS = {
+        'dashboard': 25,
+        'group_drill_down': 15,
+        'search': 20,
+        'lists': 15,
+        'report': 10,
+        'edit': 10,
+        'upload': 5,
+    }
+
+    def __init__(self, cattle_ids, herd_ids, field_ids):
+        self.cattle_ids = cattle_ids
+        self.herd_ids = herd_ids
+        self.field_ids = field_ids
+
+    def pick(self, rng):
+        """
+        Picks a scenario method at random according to the scenario weights.
+        """
+        name = rng.choices(list(self.WEIGHTS), weights=list(self.WEIGHTS.values()))[0]
+        return getattr(self, name)
+
+    @staticmethod
+    def timed(endpoint, call, *args, **kwargs):
+        start = time.perf_counter()
+        status, _ = call(*args, **kwargs)
+        return endpoint, status, time.perf_counter() - start
+
+    def dashboard(self, client, rng):
+        return [self.timed('home', client.get, '/my_farm/')]
+
+    def group_drill_down(self, client, rng):
+        group_name = rng.choice(GROUP_NAMES)
+        return [self.timed('group_data', client.get, f'/my_farm/group_data/{group_name}/')]
+
+    def search(self, client, rng):
+        endpoint, path = rng.choice([
+            ('search_cattle', '/my_farm/search_cattle/'),
+            ('search_herd', '/my_farm/search_herd/'),
+            ('search_field', '/my_farm/fields/search_field/'),
+        ])
+        return [self.timed(endpoint, client.get, path, query=rng.choice(SEARCH_QUERIES))]
+
+    def lists(self, client, rng):
+        endpoint, path, page_count = rng.choice([
+            ('cattle_info', '/my_farm/cattle_info/', max(len(self.cattle_ids) // 4, 1)),
+            ('herd_list', '/my_farm/herds/', max(len(self.herd_ids) // 5, 1)),
+            ('field_list', '/my_farm/fields/', max(len(self.field_ids) // 5, 1)),
+        ])
+        return [self.timed(endpoint, client.get, path, page=rng.randint(1, page_count))]
+
+    def report(self, client, rng):
+        end_date = date.today() - timedelta(days=rng.randrange(365))
+        start_date = end_date - timedelta(days=rng.choice([30, 90, 365]))
+        return [
+            self.timed('report', client.get, '/my_farm/livestock_movement_report/',
+                       start_date=start_date.isoformat(), end_date=end_date.isoformat()),
+        ]
+
+    def edit(self, client, rng):
+        if not self.field_ids:
+            return []
+        field_id = rng.choice(self.field_ids)
+        return [
+            self.timed('update_field', client.post, f'/my_farm/fields/update_field/{field_id}/', {
+                'name': f'Field {field_id}',
+                'location': 'Load test',
+                'coordinates': '55.00000, 24.00000',
+                'field_size': rng.randint(2, 120),
+                'size_unit': 'ha',
+                'field_type': 'Pasture',
+                'is_active': 'on',
+            }),
+        ]
+
+    def upload(self, client, rng):
+        if not self.cattle_ids:
+            return []
+        cattle_id = rng.choice(self.cattle_ids)
+        return [
+            self.timed('upload_cattle_picture', client.post_file,
+                       f'/my_farm/upload_cattle_picture/{cattle_id}/', 'picture', 'load_test.png', PICTURE),
+        ]
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the nearest-rank percentile of an already sorted list of values.
+    """
+    index = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def summarize(samples, duration):
+    """
+    Summarizes latency samples per endpoint.
+
+    :param samples: A list of (endpoint, status, seconds) tuples.
+    :param duration: The length of the load test in seconds.
+    :return: A dictionary mapping endpoint names to request counts, error counts, throughput and latencies in ms.
+    """
+    by_endpoint = defaultdict(list)
+    for endpoint, status, seconds in samples:
+        by_endpoint[endpoint].append((status, seconds))
+    by_endpoint['total'] = [(status, seconds) for _, status, seconds in samples]
+
+    summary = {}
+    for endpoint, results in by_endpoint.items():
+        if not results:
+            continue
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        summary[endpoint] = {
+            'requests': len(results),
+            'errors': sum(1 for status, _ in results if status >= 400),
+            'throughput': len(results) / duration,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1],
+        }
+    return summary
+
+
+def run_load_test(base_url, scenarios, clients, duration, username, password, seed=None):
+    """
+    Runs the weighted scenarios from concurrent logged-in clients for the given duration.
+
+    :param base_url: The base URL of the running application.
+    :param scenarios: A Scenarios instance.
+    :param clients: The number of concurrent clients.
+    :param duration: The length of the load test in seconds.
+    :param username: The username the clients log in with.
+    :param password: The password the clients log in with.
+    :param seed: The random seed for scenario selection.
+    :return: The per-endpoint summary returned by summarize().
+    """
+    samples = []
+    samples_lock = threading.Lock()
+    timing = {}
+    login_errors = []
+
+    def start_clock():
+        timing['started'] = time.monotonic()
+        timing['deadline'] = timing['started'] + duration
+
+    start_barrier = threading.Barrier(clients, action=start_clock)
+
+    def worker(worker_index):
+        rng = random.Random(None if seed is None else seed + worker_index)
+        client = LoadTestClient(base_url)
+        try:
+            client.login(username, password)
+        except (RuntimeError, OSError) as error:
+            login_errors.append(error)
+            start_barrier.abort()
+            return
+        try:
+            start_barrier.wait()
+        except threading.BrokenBarrierError:
+            return
+
+        local_samples = []
+        while time.monotonic() < timing['deadline']:
+            local_samples.extend(scenarios.pick(rng)(client, rng))
+        with samples_lock:
+            samples.extend(local_samples)
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if login_errors:
+        raise RuntimeError(f'{len(login_errors)} clients could not log in: {login_errors[0]}')
+
+    return summarize(samples, time.monotonic() - timing['started'])
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from my_farm.query_plans import key_queries, find_full_scans
+from my_farm.synthetic_farm import generate_farm
+
+
+class Command(BaseCommand):
+    help = ('Seeds a temporary test database with a synthetic farm, runs EXPLAIN for the key view queries and fails '
+            'if any of them reads a my_farm table with a full scan.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cattle', type=int, default=5000, help='Cattle in the seeded database.')
+        parser.add_argument('--current', action='store_true',
+                            help='Explain the queries on the configured database instead of a seeded test database.')
+
+    def handle(self, *args, **options):
+        if options['current']:
+            failures = self.check_plans(options['verbosity'])
+        else:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                generate_farm(cattle_count=options['cattle'], herd_count=max(options['cattle'] // 100, 1),
+                              field_count=max(options['cattle'] // 300, 1), years=5, seed=1)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                failures = self.check_plans(options['verbosity'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            raise CommandError(f'Full table scans in: {", ".join(failures)}.')
+        self.stdout.write(self.style.SUCCESS('All key queries use indexes.'))
+
+    def check_plans(self, verbosity):
+        """
+        Explains every key query and reports the ones with full table scans.
+
+        :param verbosity: The command verbosity; 2 or more prints every query plan.
+        :return: The labels of the queries with full table scans.
+        """
+        failures = []
+        for label, queryset in key_queries().items():
+            plan, scanned_tables = find_full_scans(queryset)
+            if scanned_tables:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'{label}: full scan of {", ".join(scanned_tables)}\n{plan}'))
+            elif verbosity >= 2:
+                self.stdout.write(f'{label}:\n{plan}')
+        return failures
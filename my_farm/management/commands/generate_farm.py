@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from my_farm.models import Cattle, Herd, Field
+from my_farm.signals import batched_model_changes
+from my_farm.synthetic_farm import generate_farm
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic farm with fields, herds and cattle for benchmarking and load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cattle', type=int, default=1000, help='Number of cattle, from 1k to 1M.')
+        parser.add_argument('--herds', type=int, default=None, help='Number of herds, defaults to one per 100 cattle.')
+        parser.add_argument('--fields', type=int, default=None, help='Number of fields, defaults to one per 3 herds.')
+        parser.add_argument('--years', type=int, default=5, help='Years of births and losses to simulate.')
+        parser.add_argument('--loss-rate', type=float, default=0.25, help='Share of cattle that have left the farm.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible farm.')
+        parser.add_argument('--clear', action='store_true', help='Delete all existing cattle, herds and fields first.')
+
+    def handle(self, *args, **options):
+        herd_count = options['herds'] or max(options['cattle'] // 100, 1)
+        field_count = options['fields'] or max(herd_count // 3, 1)
+
+        with transaction.atomic(), batched_model_changes():
+            if options['clear']:
+                # Deleting fields and herds first detaches the cattle, so deleting them needs no counter updates.
+                Herd.objects.update(herd_leader=None)
+                Field.objects.all().delete()
+                Herd.objects.all().delete()
+                Cattle.all_objects.all().delete()
+
+            fields, herds, cattle = generate_farm(
+                cattle_count=options['cattle'],
+                herd_count=herd_count,
+                field_count=field_count,
+                years=options['years'],
+                loss_rate=options['loss_rate'],
+                seed=options['seed'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Created {fields} fields, {herds} herds and {cattle} cattle.'))
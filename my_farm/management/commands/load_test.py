@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from my_farm.load_testing import Scenarios, run_load_test
+from my_farm.models import Cattle, Herd, Field
+from my_farm.synthetic_farm import generate_farm
+
+
+class Command(BaseCommand):
+    help = ('Boots the application on a seeded synthetic database and drives weighted user scenarios from many '
+            'concurrent logged-in clients, reporting p50/p95/p99 latency and throughput per endpoint. '
+            'With --url an already running server is tested instead.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server; skips seeding and booting.')
+        parser.add_argument('--username', default='loadtest', help='User the clients log in as.')
+        parser.add_argument('--password', default='load-test-password', help='Password of the user.')
+        parser.add_argument('--cattle', type=int, default=5000, help='Cattle in the seeded database.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Server worker processes; more than one boots gunicorn instead of runserver.')
+        parser.add_argument('--port', type=int, default=8765, help='Port of the booted server.')
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent clients.')
+        parser.add_argument('--duration', type=float, default=30, help='Length of the test in seconds.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the farm and the scenarios.')
+        parser.add_argument('--output', help='File to write the JSON results to.')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            summary = self.run(options['url'], options)
+        else:
+            summary = self.run_on_seeded_server(options)
+
+        self.stdout.write(f'{"endpoint":<24}{"requests":>10}{"errors":>8}{"req/s":>9}'
+                          f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+        for endpoint, stats in sorted(summary.items()):
+            self.stdout.write(f'{endpoint:<24}{stats["requests"]:>10}{stats["errors"]:>8}{stats["throughput"]:>9.1f}'
+                              f'{stats["p50"]:>10.1f}{stats["p95"]:>10.1f}{stats["p99"]:>10.1f}')
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'options': {key: options[key] for key in ('url', 'cattle', 'workers', 'clients',
+                                                                     'duration')},
+                           'endpoints': summary}, file, indent=2)
+
+    def run(self, base_url, options):
+        scenarios = Scenarios(
+            cattle_ids=list(Cattle.objects.values_list('id', flat=True)),
+            herd_ids=list(Herd.objects.values_list('id', flat=True)),
+            field_ids=list(Field.objects.values_list('id', flat=True)),
+        )
+        self.stdout.write(f'Running {options["clients"]} clients against {base_url} for {options["duration"]}s.')
+        try:
+            return run_load_test(base_url, scenarios, options['clients'], options['duration'],
+                                 options['username'], options['password'], options['seed'])
+        except RuntimeError as error:
+            raise CommandError(str(error)) from error
+
+    def run_on_seeded_server(self, options):
+        """
+        Seeds a temporary SQLite database, boots a server on it and runs the load test against that server.
+        """
+        work_dir = Path(tempfile.mkdtemp(prefix='my_farm_load_test_'))
+        database_name = str(work_dir / 'db.sqlite3')
+        server = None
+        try:
+            connection = connections['default']
+            connection.close()
+            connection.settings_dict['NAME'] = database_name
+            call_command('migrate', verbosity=0)
+            generate_farm(cattle_count=options['cattle'], herd_count=max(options['cattle'] // 100, 1),
+                          field_count=max(options['cattle'] // 300, 1), years=5, seed=options['seed'])
+            User.objects.create_user(options['username'], password=options['password'])
+            connection.close()
+
+            base_url = f'http://127.0.0.1:{options["port"]}'
+            server = self.boot_server(options['workers'], options['port'], {
+                'DATABASE_NAME': database_name,
+                'MEDIA_ROOT': str(work_dir / 'media'),
+                'ALLOWED_HOSTS': '127.0.0.1,localhost',
+            })
+            self.wait_for_server(base_url, server)
+            return self.run(base_url, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def boot_server(workers, port, environment):
+        """
+        Starts runserver, or gunicorn with the given number of workers, as a subprocess.
+
+        :return: The server process.
+        """
+        address = f'127.0.0.1:{port}'
+        if workers > 1:
+            if shutil.which('gunicorn') is None:
+                raise CommandError('--workers greater than 1 requires gunicorn to be installed.')
+            command = ['gunicorn', 'django_app.wsgi', '--workers', str(workers), '--bind', address]
+        else:
+            command = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'runserver', '--noreload', address]
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env={**os.environ, **environment},
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    @staticmethod
+    def wait_for_server(base_url, server, timeout=30):
+        """
+        Waits until the server answers requests.
+
+        :raises CommandError: If the server exits or does not answer within the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('The server exited before it started answering requests.')
+            try:
+                urllib.request.urlopen(f'{base_url}/login/', timeout=1)
+                return
+            except urllib.error.HTTPError:
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'The server did not start within {timeout} seconds.')
@@ -0,0 +1,33 @@
+import io
+import pstats
+from django.core.management.base import BaseCommand, CommandError
+from my_farm.profiling import list_profiles
+
+
+class Command(BaseCommand):
+    help = 'Aggregates the captured cProfile profiles and prints the functions that took the most time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only aggregate profiles of this URL name, e.g. "report".')
+        parser.add_argument('--top', type=int, default=30, help='Number of functions to print.')
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'],
+                            help='Statistic used to rank the functions.')
+        parser.add_argument('--filter', dest='pattern', help='Only print functions matching this regular expression, '
+                                                             'e.g. "calculate_age|relativedelta".')
+
+    def handle(self, *args, **options):
+        profiles = [path for path in list_profiles(options['view']) if path.suffix == '.prof']
+        if not profiles:
+            raise CommandError('No captured profiles were found.')
+
+        output = io.StringIO()
+        stats = pstats.Stats(str(profiles[0]), stream=output)
+        for path in profiles[1:]:
+            stats.add(str(path))
+
+        stats.strip_dirs().sort_stats(options['sort'])
+        restrictions = [options['pattern']] if options['pattern'] else []
+        stats.print_stats(*restrictions, options['top'])
+
+        self.stdout.write(f'Aggregated {len(profiles)} profiles.')
+        self.stdout.write(output.getvalue())
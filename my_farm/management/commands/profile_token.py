@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from my_farm.profiling import make_profile_token
+
+
+class Command(BaseCommand):
+    help = "Prints a signed token that enables profiling of a request via the '?profile=<token>' query parameter."
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_profile_token())
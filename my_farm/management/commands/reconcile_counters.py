@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from my_farm.counters import reconcile_herd_counts, reconcile_field_counts
+from my_farm.models import Herd, Field
+from my_farm.signals import notify_model_changed
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the denormalized active cattle counts of herds and herd counts of fields, and corrects the '
+            'ones that drifted from the actual rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted counters.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            herds = reconcile_herd_counts(dry_run=options['dry_run'])
+            fields = reconcile_field_counts(dry_run=options['dry_run'])
+            if herds and not options['dry_run']:
+                notify_model_changed(Herd)
+            if fields and not options['dry_run']:
+                notify_model_changed(Field)
+
+        for herd, stored, actual in herds:
+            self.stdout.write(f'Herd {herd.pk} "{herd.name}": active cattle count {stored} -> {actual}')
+        for field, stored, actual in fields:
+            self.stdout.write(f'Field {field.pk} "{field.name}": herd count {stored} -> {actual}')
+
+        verb = 'Found' if options['dry_run'] else 'Corrected'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(herds)} herd and {len(fields)} field counters.'))
@@ -0,0 +1,82 @@
+import json
+import platform
+from datetime import datetime, timezone
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from my_farm.benchmarks import BENCHMARKS, run_benchmark, dataset_summary, rolled_back
+
+
+class Command(BaseCommand):
+    help = ('Runs the group, report and view benchmarks against the current database and writes the results as JSON '
+            'so that they can be compared between commits. Use generate_farm to create a dataset first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f'Benchmarks to run, all by default: {", ".join(BENCHMARKS)}.')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed rounds per benchmark.')
+        parser.add_argument('--label', default='', help='Label stored with the results, e.g. a commit hash.')
+        parser.add_argument('--output', help='File to write the JSON results to.')
+        parser.add_argument('--compare', help='JSON results of a previous run to compare the median timings with.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative slowdown of the median that counts as a regression.')
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Unknown benchmarks: {", ".join(unknown)}.')
+
+        results = {
+            'label': options['label'],
+            'created': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': dataset_summary(),
+            'benchmarks': {},
+        }
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), rolled_back():
+            for name in names:
+                stats = run_benchmark(name, options['rounds'])
+                results['benchmarks'][name] = stats
+                self.stdout.write(f'{name:<32} median {stats["median"] * 1000:10.2f} ms   '
+                                  f'min {stats["min"] * 1000:10.2f} ms')
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def compare(self, results, baseline_path, threshold):
+        """
+        Compares the median timings with a previous run and fails if any benchmark regressed beyond the threshold.
+
+        :param results: The results of this run.
+        :param baseline_path: Path of the JSON results of the previous run.
+        :param threshold: Relative slowdown that counts as a regression.
+        :raises CommandError: If at least one benchmark regressed.
+        """
+        with open(baseline_path) as file:
+            baseline = json.load(file)['benchmarks']
+
+        regressions = []
+        for name, stats in results['benchmarks'].items():
+            if name not in baseline:
+                continue
+            change = stats['median'] / baseline[name]['median'] - 1
+            self.stdout.write(f'{name:<32} {change:+8.1%}')
+            if change > threshold:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'Regressions beyond {threshold:.0%}: {", ".join(regressions)}.')
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def worker_process(number, stop, burst):
+    """
+    The entry point of a worker process. Ctrl+C and SIGTERM, which service managers send to the whole process group,
+    are left to the parent, which stops the workers after their current job.
+
+    The job modules are imported here so that the function can also be started by the 'spawn' method, which imports
+    this module in a fresh interpreter before Django is set up.
+    """
+    import django
+    django.setup()
+    from my_farm.jobs import work
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(f'{socket.gethostname()}:{os.getpid()}:{number}', stop, burst=burst)
+
+
+class Command(BaseCommand):
+    help = ('Runs the background jobs stored in the database with a pool of worker processes. Ctrl+C or SIGTERM '
+            'stops the workers after their current job.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes, by default the number of CPUs.')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due instead of polling.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1.')
+
+        # Worker processes must open their own database connections.
+        connections.close_all()
+        stop = multiprocessing.Event()
+        # The handlers only record the signal: setting the event inside a handler could deadlock on its lock.
+        signals = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: signals.append(signum))
+
+        def start(number):
+            process = multiprocessing.Process(target=worker_process, args=(number, stop, options['burst']),
+                                              name=f'worker-{number}')
+            process.start()
+            return process
+
+        processes = [start(number) for number in range(concurrency)]
+        self.stdout.write(f'Started {concurrency} workers.')
+
+        while any(process.is_alive() for process in processes):
+            time.sleep(1)
+            if signals and not stop.is_set():
+                self.stdout.write('Stopping the workers after their current job.')
+                stop.set()
+            for number, process in enumerate(processes):
+                # Workers that crashed are replaced; in burst mode workers exit when the queue is empty.
+                if not stop.is_set() and not options['burst'] and not process.is_alive():
+                    self.stderr.write(f'Worker {number} exited with code {process.exitcode}, restarting it.')
+                    processes[number] = start(number)
+
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('All workers stopped.'))
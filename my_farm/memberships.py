@@ -0,0 +1,172 @@
+from collections import Counter
+from datetime import date
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .changelog import batched_changes, record_change
+from .counters import adjust_herd_count, is_counted
+from .models import Cattle, HerdMembership, ChangeLogEntry
+from .signals import notify_model_changed
+
+BATCH_SIZE = 5000
+
+
+def record_herd_change(cattle, on_date=None):
+    """
+    Brings the membership history of a saved cattle up to date with its current herd.
+
+    Closes the open membership on the given date and opens one for the new herd. A second change on the day a
+    membership started replaces its herd instead of leaving a membership of zero days.
+
+    :param cattle: The saved Cattle instance.
+    :param on_date: The day the cattle joined its current herd, by default today.
+    """
+    on_date = on_date or date.today()
+    current = HerdMembership.objects.filter(cattle_id=cattle.pk, valid_to__isnull=True).first()
+    if current is not None and current.herd_id == cattle.herd_id:
+        return
+
+    if current is not None and current.valid_from >= on_date:
+        if cattle.herd_id is None:
+            current.delete()
+        else:
+            current.herd_id = cattle.herd_id
+            current.save(update_fields=['herd'])
+        return
+
+    if current is not None:
+        current.valid_to = on_date
+        current.save(update_fields=['valid_to'])
+    if cattle.herd_id is not None:
+        HerdMembership.objects.create(cattle_id=cattle.pk, herd_id=cattle.herd_id,
+                                      previous_herd_id=current.herd_id if current else None, valid_from=on_date)
+
+
+def move_cattle(queryset, herd, on_date=None):
+    """
+    Moves the cattle of a queryset to a herd with set-based updates instead of saving every cattle.
+
+    Closes the open memberships, creates the new ones in bulk, updates the herd of the cattle with a single query,
+    logs the moves in the change log and moves the active cattle between the herd counters.
+
+    :param queryset: The cattle to move.
+    :param herd: The Herd to move them to.
+    :param on_date: The day of the move, by default today.
+    :return: The number of moved cattle.
+    """
+    on_date = on_date or date.today()
+    with transaction.atomic(), batched_changes():
+        moving = queryset.exclude(herd=herd)
+        rows = list(moving.values_list('id', 'herd_id', 'deleted', 'loss_method'))
+        if not rows:
+            return 0
+
+        # Like record_herd_change, a membership that started on the day of the move gets the new herd instead.
+        open_memberships = HerdMembership.objects.filter(cattle_id__in=moving.values('pk'), valid_to__isnull=True)
+        replaced = set(open_memberships.filter(valid_from__gte=on_date).values_list('cattle_id', flat=True))
+        open_memberships.filter(valid_from__gte=on_date).update(herd=herd)
+        open_memberships.filter(valid_from__lt=on_date).update(valid_to=on_date)
+        HerdMembership.objects.bulk_create([
+            HerdMembership(cattle_id=cattle_id, herd_id=herd.pk, previous_herd_id=herd_id, valid_from=on_date)
+            for cattle_id, herd_id, _, _ in rows if cattle_id not in replaced
+        ], batch_size=BATCH_SIZE)
+        moving.update(herd=herd, updated_at=timezone.now())
+        for cattle_id, herd_id, _, _ in rows:
+            record_change(Cattle, cattle_id, ChangeLogEntry.UPDATE, {'herd_id': [herd_id, herd.pk]})
+
+        counted = Counter(herd_id for _, herd_id, deleted, loss_method in rows if is_counted(deleted, loss_method))
+        for herd_id, count in counted.items():
+            adjust_herd_count(herd_id, -count)
+        adjust_herd_count(herd.pk, sum(counted.values()))
+        notify_model_changed(Cattle)
+    return len(rows)
+
+
+def mark_lost(queryset, loss_method, on_date=None):
+    """
+    Records the loss of the cattle of a queryset with set-based updates instead of saving every cattle.
+
+    Sets the loss method of the cattle that have none and their end date if they have none, logs the changes in the
+    change log and removes the cattle from the active cattle counters of their herds. The herd memberships are kept,
+    like when a loss is saved through the cattle form.
+
+    :param queryset: The cattle that were lost.
+    :param loss_method: One of the Cattle.LOSS_METHOD values.
+    :param on_date: The end date of the cattle without one, by default today.
+    :return: The number of updated cattle.
+    """
+    on_date = on_date or date.today()
+    with transaction.atomic(), batched_changes():
+        losing = queryset.filter(loss_method__isnull=True)
+        rows = list(losing.values_list('id', 'herd_id', 'deleted', 'end_date'))
+        if not rows:
+            return 0
+
+        losing.update(loss_method=loss_method, end_date=Coalesce('end_date', Value(on_date)),
+                      updated_at=timezone.now())
+        for cattle_id, _, _, end_date in rows:
+            changes = {'loss_method': [None, loss_method]}
+            if end_date is None:
+                changes['end_date'] = [None, on_date]
+            record_change(Cattle, cattle_id, ChangeLogEntry.UPDATE, changes)
+
+        counted = Counter(herd_id for _, herd_id, deleted, _ in rows if is_counted(deleted, None))
+        for herd_id, count in counted.items():
+            adjust_herd_count(herd_id, -count)
+        notify_model_changed(Cattle)
+    return len(rows)
+
+
+def open_missing_memberships():
+    """
+    Opens a membership for every cattle in a herd that has none, e.g. after bulk_create, starting on its entry date.
+
+    :return: The number of created memberships.
+    """
+    today = date.today()
+    missing = Cattle.all_objects.filter(herd__isnull=False, memberships__isnull=True).values_list(
+        'id', 'herd_id', 'entry_date', 'herd__start_date')
+    created = HerdMembership.objects.bulk_create([
+        HerdMembership(cattle_id=cattle_id, herd_id=herd_id, valid_from=entry_date or herd_start_date or today)
+        for cattle_id, herd_id, entry_date, herd_start_date in missing.iterator()
+    ], batch_size=BATCH_SIZE)
+    return len(created)
+
+
+def herd_composition(herd_id, on_date):
+    """
+    Returns the cattle that were in a herd on a date, found with a range scan of the herd's memberships.
+
+    :param herd_id: The ID of the herd.
+    :param on_date: The date.
+    :return: A queryset of the cattle that belonged to the herd and had not left the farm on that date.
+    """
+    members = HerdMembership.objects.as_of(on_date).filter(herd_id=herd_id).values('cattle_id')
+    return Cattle.objects.filter(Q(end_date__isnull=True) | Q(end_date__gt=on_date), pk__in=members)
+
+
+def herd_transfer_counts(start_date, end_date):
+    """
+    Counts the cattle moved between every pair of herds within a date range.
+
+    :param start_date: The first day of the range.
+    :param end_date: The day after the range.
+    :return: A list of dictionaries with the 'from_herd' and 'to_herd' names and the 'count' of moved cattle.
+    """
+    return list(
+        HerdMembership.objects.transfers(start_date, end_date).exclude(previous_herd=F('herd'))
+        .values(from_herd=F('previous_herd__name'), to_herd=F('herd__name'))
+        .annotate(count=Count('id')).order_by('from_herd', 'to_herd')
+    )
+
+
+def herds_as_of(on_date):
+    """
+    Returns the herd and field name of every cattle on a date.
+
+    :param on_date: The date.
+    :return: A dictionary of cattle IDs to (herd name, field name) tuples.
+    """
+    memberships = HerdMembership.objects.as_of(on_date).values_list('cattle_id', 'herd__name', 'herd__field__name')
+    return {cattle_id: (herd_name, field_name) for cattle_id, herd_name, field_name in memberships}
@@ -0,0 +1,314 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    'my_farm_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'my_farm_db_queries_total': ('counter', 'SQL queries executed by URL name.'),
+    'my_farm_db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries by URL name.'),
+    'my_farm_report_duration_seconds': ('histogram', 'Movement report computation time by date range length.'),
+    'my_farm_cache_requests_total': ('counter', 'Cache lookups by namespace, result and answering tier.'),
+    'my_farm_cache_hit_ratio': ('gauge', 'Share of cache lookups answered from L1 or L2, by namespace.'),
+    'my_farm_herd_size': ('gauge', 'Active cattle in each herd.'),
+    'my_farm_active_cattle': ('gauge', 'Active cattle on the farm.'),
+}
+
+
+class MetricsRegistry:
+    """
+    Process-local store of counters and histograms.
+
+    Every worker process keeps its own registry and periodically writes it to a file in METRICS_DIR. The metrics
+    endpoint sums the files of all processes, so the metrics work with any number of workers without a shared
+    server. Updates only touch in-memory dictionaries, which keeps the collection cheap enough to stay on.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.pid = None
+        self.file_name = None
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, labels, amount=1.0):
+        """
+        Increments a counter.
+
+        :param name: The metric name.
+        :param labels: A dictionary of label names and values.
+        :param amount: The amount to add.
+        """
+        with self.lock:
+            self.counters[self.key(name, labels)] += amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        """
+        Records a value in a histogram.
+
+        :param name: The metric name.
+        :param labels: A dictionary of label names and values.
+        :param value: The observed value.
+        :param buckets: The upper bounds of the histogram buckets.
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets),
+                                                    'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """
+        Returns the registry contents in a JSON-serializable form.
+        """
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), dict(histogram, counts=list(histogram['counts']))]
+                               for (name, labels), histogram in self.histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        """
+        Adds the counters and histograms of a flushed registry, e.g. of a process that exited, to this registry.
+
+        :param snapshot: The registry contents as written by flush.
+        """
+        with self.lock:
+            add_snapshot(self.counters, self.histograms, snapshot)
+
+    def absorb_exited_processes(self):
+        """
+        Moves the metrics of processes that exited into this registry and removes their files, so METRICS_DIR only
+        holds a file per running process while the summed counters never decrease.
+
+        A file is claimed by renaming it before it is read, so concurrent scrapes never absorb the same file twice.
+        Process IDs can only be checked for processes on this host, so METRICS_DIR must not be shared between hosts.
+        """
+        absorbed = False
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            try:
+                pid = int(path.name.split('-', 1)[0])
+            except ValueError:
+                continue
+            if pid == os.getpid() or process_running(pid):
+                continue
+            claimed = path.with_name(f'.{path.name}.absorbed')
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                self.merge(json.loads(claimed.read_text()))
+            except (OSError, ValueError, KeyError):
+                pass
+            claimed.unlink(missing_ok=True)
+            absorbed = True
+        if absorbed:
+            self.flush(force=True)
+
+    def flush(self, force=False):
+        """
+        Writes the registry to this process's file in METRICS_DIR, at most once per METRICS_FLUSH_INTERVAL.
+
+        :param force: Write even if the flush interval has not passed yet.
+        """
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.file_name = f'{self.pid}-{time.time_ns()}.json'
+
+        metrics_dir = Path(settings.METRICS_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        temporary_path = metrics_dir / f'.{self.file_name}.tmp'
+        temporary_path.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary_path, metrics_dir / self.file_name)
+
+
+registry = MetricsRegistry()
+
+
+def add_snapshot(counters, histograms, snapshot):
+    """
+    Adds the counters and histograms of a flushed registry to the given dictionaries, keyed by (name, labels).
+    """
+    for name, labels, value in snapshot['counters']:
+        counters[(name, tuple(map(tuple, labels)))] += value
+    for name, labels, histogram in snapshot['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = dict(histogram, counts=list(histogram['counts']))
+            continue
+        merged['counts'] = [a + b for a, b in zip(merged['counts'], histogram['counts'])]
+        merged['sum'] += histogram['sum']
+        merged['count'] += histogram['count']
+
+
+def process_running(pid):
+    """
+    Returns whether a process with the given ID is running on this host. Outside POSIX every process is assumed to
+    run, as signal 0 cannot be used to probe it there.
+    """
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def record_request(url_name, duration, query_count, query_duration):
+    """
+    Records the latency and database usage of a request.
+
+    :param url_name: The URL name of the resolved view.
+    :param duration: The request duration in seconds.
+    :param query_count: The number of SQL queries the request ran.
+    :param query_duration: The time spent in SQL queries in seconds.
+    """
+    labels = {'view': url_name or 'unresolved'}
+    registry.observe('my_farm_request_duration_seconds', labels, duration)
+    registry.inc('my_farm_db_queries_total', labels, query_count)
+    registry.inc('my_farm_db_query_duration_seconds_total', labels, query_duration)
+    registry.flush()
+
+
+def record_report(start_date, end_date, duration):
+    """
+    Records the computation time of a movement report, labelled by the length of its date range.
+
+    :param start_date: The report start date.
+    :param end_date: The report end date.
+    :param duration: The computation time in seconds.
+    """
+    days = (end_date - start_date).days
+    if days <= 31:
+        date_range = 'month'
+    elif days <= 92:
+        date_range = 'quarter'
+    elif days <= 366:
+        date_range = 'year'
+    else:
+        date_range = 'multi_year'
+    registry.observe('my_farm_report_duration_seconds', {'range': date_range}, duration)
+
+
+def record_cache(namespace, hit, tier='none'):
+    """
+    Counts a cache lookup.
+
+    :param namespace: The cache namespace.
+    :param hit: True for a cache hit, False for a miss.
+    :param tier: The cache tier that answered a hit, 'l1' or 'l2'.
+    """
+    registry.inc('my_farm_cache_requests_total',
+                 {'namespace': namespace, 'result': 'hit' if hit else 'miss', 'tier': tier if hit else 'none'})
+
+
+def collect():
+    """
+    Sums the flushed registries of all worker processes, absorbing the ones of processes that exited first.
+
+    :return: A tuple of dictionaries with the summed counters and histograms, keyed by (name, labels).
+    """
+    registry.absorb_exited_processes()
+    registry.flush(force=True)
+    counters = defaultdict(float)
+    histograms = {}
+
+    for path in Path(settings.METRICS_DIR).glob('*.json'):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        add_snapshot(counters, histograms, snapshot)
+
+    return counters, histograms
+
+
+def cache_hit_ratios(counters):
+    """
+    Calculates the share of cache lookups answered by either tier, per namespace.
+
+    :param counters: Summed counters keyed by (name, labels), as returned by collect.
+    :return: Gauge values keyed by (name, labels).
+    """
+    hits = defaultdict(float)
+    lookups = defaultdict(float)
+    for (name, labels), value in counters.items():
+        if name == 'my_farm_cache_requests_total':
+            labels = dict(labels)
+            lookups[labels['namespace']] += value
+            if labels['result'] == 'hit':
+                hits[labels['namespace']] += value
+    return {
+        ('my_farm_cache_hit_ratio', (('namespace', namespace),)): hits[namespace] / total
+        for namespace, total in lookups.items() if total
+    }
+
+
+def format_labels(labels):
+    """
+    Formats (name, value) label pairs for the exposition format, escaping the values.
+    """
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def render(counters, histograms, gauges):
+    """
+    Renders metrics in the Prometheus text exposition format.
+
+    :param counters: Summed counters keyed by (name, labels).
+    :param histograms: Summed histograms keyed by (name, labels).
+    :param gauges: Gauge values keyed by (name, labels).
+    :return: The exposition text.
+    """
+    series = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        series[name].append(f'{name}{{{format_labels(labels)}}} {value}')
+    for (name, labels), value in sorted(gauges.items()):
+        series[name].append(f'{name}{{{format_labels(labels)}}} {value}' if labels else f'{name} {value}')
+    for (name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+        cumulative = 0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            cumulative += count
+            bucket_labels = format_labels(labels + (('le', repr(float(bound))),))
+            series[name].append(f'{name}_bucket{{{bucket_labels}}} {cumulative}')
+        series[name].append(f'{name}_bucket{{{format_labels(labels + (("le", "+Inf"),))}}} {histogram["count"]}')
+        series[name].append(f'{name}_sum{{{format_labels(labels)}}} {histogram["sum"]}')
+        series[name].append(f'{name}_count{{{format_labels(labels)}}} {histogram["count"]}')
+
+    lines = []
+    for name in sorted(series):
+        metric_type, help_text = METRIC_HELP.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(series[name])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,275 @@
+import cProfile
+import logging
+import random
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection, transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+from .changelog import attributed_changes, batched_changes
+from .compression import brotli_compress, brotli_compress_sequence, choose_encoding
+from .metrics import record_request
+from .profiling import build_profile_path, is_valid_profile_token, rotate_profiles
+from .query_budgets import get_query_budget
+from .query_instrumentation import QueryRecorder
+from .slow_queries import SlowQueryLogger
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware:
+    """
+    Records the SQL query count, total database time and duplicated query signatures of every request.
+
+    In debug mode the summary is added to the response as the 'X-DB-Queries' header. In production a sample of
+    requests, set by the QUERY_LOG_SAMPLE_RATE setting, is logged instead. Requests that exceed the query budget
+    declared for their URL in my_farm/query_budgets.py are always logged. The recorder is kept on the request as
+    'query_recorder' for MetricsMiddleware.
+    """
+
+    header_name = 'X-DB-Queries'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_LOG_SAMPLE_RATE', 0.0)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.query_recorder = recorder
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        budget = get_query_budget(url_name)
+
+        if settings.DEBUG:
+            response[self.header_name] = recorder.summary()
+        elif random.random() < self.sample_rate:
+            logger.info('%s %s: %s', request.method, request.path, recorder.summary())
+
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                '%s %s exceeded its query budget of %d: %s; duplicated: %s',
+                request.method, request.path, budget, recorder.summary(), list(recorder.duplicates),
+            )
+
+        return response
+
+
+class ChangeLogMiddleware:
+    """
+    Attributes the change log entries written while handling a request to the logged-in user.
+
+    Requests with other methods than GET, HEAD and OPTIONS run in a transaction, and the change log entries they
+    record are buffered and written with one bulk_create when it commits, see my_farm.changelog.batched_changes. It
+    must be placed after AuthenticationMiddleware.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with attributed_changes(lambda: request.user.pk if request.user.is_authenticated else None):
+            if request.method in self.safe_methods:
+                return self.get_response(request)
+            with transaction.atomic(), batched_changes():
+                return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and database usage of every request for the Prometheus metrics endpoint.
+
+    The database figures are taken from the recorder that QueryCountMiddleware attaches to the request, so this
+    middleware must be placed before QueryCountMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        recorder = getattr(request, 'query_recorder', None)
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        record_request(url_name, duration, recorder.count if recorder else 0, recorder.duration if recorder else 0.0)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with Brotli or gzip, depending on the Accept-Encoding header of the request.
+
+    Only responses with a content type listed in COMPRESSION_CONTENT_TYPES are compressed, and non-streaming responses
+    only when they are at least COMPRESSION_MIN_SIZE bytes long. Brotli is used when the brotli package is installed,
+    otherwise gzip. Strong ETags are made weak, because the compressed body is no longer byte-for-byte identical.
+
+    Like Django's GZipMiddleware, the output is padded with up to max_random_bytes random bytes to mitigate BREACH:
+    gzip in a random header filename, Brotli in a metadata block.
+    """
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.content_types = set(settings.COMPRESSION_CONTENT_TYPES)
+        self.brotli_quality = settings.COMPRESSION_BROTLI_QUALITY
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.content_types or response.has_header('Content-Encoding'):
+            return response
+        if getattr(response, 'is_async', False):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = brotli_compress_sequence(response.streaming_content, self.brotli_quality,
+                                                                      max_random_bytes=self.max_random_bytes)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content,
+                                                                max_random_bytes=self.max_random_bytes)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli_compress(response.content, self.brotli_quality,
+                                             max_random_bytes=self.max_random_bytes)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class SlowQueryMiddleware:
+    """
+    Logs the queries of a request that take longer than SLOW_QUERY_THRESHOLD_MS, together with their originating
+    view, my_farm stack frame and, once per query shape, their query plan. A threshold of 0 disables the middleware.
+    """
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD_MS <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    def __call__(self, request):
+        with connection.execute_wrapper(SlowQueryLogger(self.threshold, request)):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in profiler for production requests.
+
+    When PROFILING_ENABLED is set, one in every PROFILING_SAMPLE_RATE requests is profiled, as is any request with a
+    valid signed token in the 'profile' query parameter (see the profile_token management command). Profiles are
+    written to PROFILING_DIR with the view name and request duration in the filename, and only the newest
+    PROFILING_MAX_FILES are kept. With PROFILING_BACKEND set to 'pyinstrument' speedscope-compatible JSON files are
+    written instead of cProfile '.prof' files.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.backend = settings.PROFILING_BACKEND
+        if self.backend not in ('cprofile', 'pyinstrument'):
+            raise ImproperlyConfigured(f'Unknown PROFILING_BACKEND {self.backend!r}.')
+
+    def should_profile(self, request):
+        """
+        Decides whether the request is profiled.
+
+        :param request: The HTTP request object.
+        :return: True if the request carries a valid profile token or is picked by sampling.
+        """
+        token = request.GET.get('profile')
+        if token and is_valid_profile_token(token):
+            return True
+        return self.sample_rate > 0 and random.randrange(self.sample_rate) == 0
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        if self.backend == 'pyinstrument':
+            return self.profile_with_pyinstrument(request)
+        return self.profile_with_cprofile(request)
+
+    def profile_with_cprofile(self, request):
+        """
+        Handles the request under cProfile and writes the collected statistics to a '.prof' file.
+
+        :param request: The HTTP request object.
+        :return: The HTTP response.
+        """
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+
+        profiler.dump_stats(build_profile_path(self.get_view_name(request), duration, 'prof'))
+        rotate_profiles()
+        return response
+
+    def profile_with_pyinstrument(self, request):
+        """
+        Handles the request under pyinstrument and writes the collected samples as speedscope JSON.
+
+        :param request: The HTTP request object.
+        :return: The HTTP response.
+        """
+        try:
+            from pyinstrument import Profiler
+            from pyinstrument.renderers import SpeedscopeRenderer
+        except ImportError as exc:
+            raise ImproperlyConfigured("PROFILING_BACKEND 'pyinstrument' requires the pyinstrument package.") from exc
+
+        profiler = Profiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - start
+
+        path = build_profile_path(self.get_view_name(request), duration, 'speedscope.json')
+        path.write_text(profiler.output(renderer=SpeedscopeRenderer()))
+        rotate_profiles()
+        return response
+
+    @staticmethod
+    def get_view_name(request):
+        """
+        Returns the URL name of the resolved view, or None if the request did not resolve.
+        """
+        return request.resolver_match.url_name if request.resolver_match else None
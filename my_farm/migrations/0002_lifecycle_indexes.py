@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-19 07:30
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_farm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cattle',
+            options={'default_manager_name': 'all_objects', 'ordering': ['name'], 'verbose_name': 'Cattle Info', 'verbose_name_plural': 'Cattle Info'},
+        ),
+        migrations.AlterModelManagers(
+            name='cattle',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='cattle',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['name'], name='cattle_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cattle',
+            index=models.Index(condition=models.Q(('deleted', False), ('loss_method__isnull', True)), fields=['herd'], name='cattle_active_herd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cattle',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['entry_date'], name='cattle_active_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cattle',
+            index=models.Index(condition=models.Q(('deleted', False), ('end_date__isnull', False)), fields=['end_date'], name='cattle_active_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='herd',
+            index=models.Index(fields=['is_active', 'start_date'], name='herd_active_start_idx'),
+        ),
+    ]
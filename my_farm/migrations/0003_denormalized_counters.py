@@ -0,0 +1,35 @@
+# Generated by Django 4.2.4 on 2026-10-19 07:33
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Herd = apps.get_model('my_farm', 'Herd')
+    Field = apps.get_model('my_farm', 'Field')
+    active = Q(cattle__deleted=False, cattle__loss_method__isnull=True)
+    for herd in Herd.objects.annotate(actual=Count('cattle', filter=active)).filter(actual__gt=0):
+        Herd.objects.filter(pk=herd.pk).update(active_cattle_count=herd.actual)
+    for field in Field.objects.annotate(actual=Count('field_herds')).filter(actual__gt=0):
+        Field.objects.filter(pk=field.pk).update(herd_count=field.actual)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_farm', '0002_lifecycle_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='field',
+            name='herd_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='herd',
+            name='active_cattle_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.4 on 2026-10-19 07:53
+
+from datetime import date
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_memberships(apps, schema_editor):
+    Cattle = apps.get_model('my_farm', 'Cattle')
+    HerdMembership = apps.get_model('my_farm', 'HerdMembership')
+    today = date.today()
+    cattle = Cattle._default_manager.filter(herd__isnull=False).values_list('id', 'herd_id', 'entry_date', 'herd__start_date')
+    HerdMembership.objects.bulk_create([
+        HerdMembership(cattle_id=cattle_id, herd_id=herd_id, valid_from=entry_date or herd_start_date or today)
+        for cattle_id, herd_id, entry_date, herd_start_date in cattle.iterator()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_farm', '0005_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HerdMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valid_from', models.DateField()),
+                ('valid_to', models.DateField(blank=True, null=True)),
+                ('cattle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='my_farm.cattle')),
+                ('herd', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='my_farm.herd')),
+                ('previous_herd', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfers_out', to='my_farm.herd')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['herd', 'valid_from', 'valid_to'], name='membership_herd_asof_idx'), models.Index(fields=['valid_from', 'valid_to'], name='membership_asof_idx'), models.Index(condition=models.Q(('previous_herd__isnull', False)), fields=['valid_from', 'herd', 'previous_herd'], name='membership_transfer_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='herdmembership',
+            constraint=models.UniqueConstraint(condition=models.Q(('valid_to__isnull', True)), fields=('cattle',), name='membership_one_open_per_cattle'),
+        ),
+        migrations.RunPython(backfill_memberships, migrations.RunPython.noop),
+    ]
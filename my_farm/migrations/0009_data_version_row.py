@@ -0,0 +1,19 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:32
+
+from django.db import migrations
+
+
+def create_data_version(apps, schema_editor):
+    DataVersion = apps.get_model('my_farm', 'DataVersion')
+    DataVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_farm', '0008_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_data_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.4 on 2026-10-19 12:10
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def create_change_log_sequence(apps, schema_editor):
+    ChangeLogEntry = apps.get_model('my_farm', 'ChangeLogEntry')
+    ChangeLogSequence = apps.get_model('my_farm', 'ChangeLogSequence')
+    last_id = ChangeLogEntry.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    ChangeLogSequence.objects.update_or_create(pk=1, defaults={'last_id': last_id})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_farm', '0009_data_version_row'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_id', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_change_log_sequence, migrations.RunPython.noop),
+    ]
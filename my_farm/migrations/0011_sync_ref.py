@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-19 12:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_farm', '0010_change_log_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRef',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ref', models.CharField(max_length=64, unique=True)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, router, transaction
+from django.utils import timezone
 
 
 class BaseModel(models.Model):
@@ -11,7 +14,93 @@ class BaseModel(models.Model):
         abstract = True
 
 
-class CattleManager(models.Manager):
+class AtomicSaveModel(models.Model):
+    """
+    An abstract model whose saves run in a transaction, so the counters, herd memberships and change log entries the
+    receivers in my_farm.signals write commit or roll back together with the row.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            return super().delete(*args, **kwargs)
+
+
+class CounterFieldsModel(AtomicSaveModel):
+    """
+    An abstract model for models with denormalized counter columns that are only changed through atomic updates.
+
+    Saving an existing instance never writes the counters, so a stale value loaded before a concurrent update cannot
+    overwrite it.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the instance, leaving the counter columns out of the update of an existing row.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class CattleQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Cattle model with projections matched to what the cattle templates render.
+    """
+
+    LISTING_FIELDS = ['id', 'type', 'number', 'name', 'gender', 'breed', 'birth_date', 'acquisition_method',
+                      'entry_date', 'loss_method', 'end_date', 'comments', 'updated_at']
+
+    def for_listing(self):
+        """
+        Restricts the queryset to the columns rendered by the cattle listing and search templates.
+
+        :return: A queryset that does not load the picture, herd and deleted columns.
+        """
+        return self.only(*self.LISTING_FIELDS)
+
+    def for_detail(self):
+        """
+        Joins the herd so that the cattle detail page does not need a second query for it.
+
+        :return: A queryset with the herd selected in the same query.
+        """
+        return self.select_related('herd')
+
+    def active(self):
+        """
+        Filters the queryset to cattle that are still on the farm, i.e. that have no loss method.
+
+        :return: A queryset containing cattle objects with 'loss_method' not set.
+        """
+        return self.filter(loss_method__isnull=True)
+
+    def update(self, **kwargs):
+        """
+        Updates the rows and, unless given, sets their updated_at, which auto_now only sets on save, so that the cattle
+        snapshot picks up updates made with a queryset, see my_farm.snapshot.CattleSnapshot.refreshed.
+        """
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class CattleManager(models.Manager.from_queryset(CattleQuerySet)):
     """
     Custom manager for the Cattle model that filters out deleted cattle objects from the queryset.
     """
@@ -25,7 +114,78 @@ class CattleManager(models.Manager):
         return super().get_queryset().filter(deleted=False)
 
 
-class Cattle(models.Model):
+class HerdQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Herd model with joins and projections matched to what the herd templates render.
+    """
+
+    LISTING_FIELDS = ['id', 'name', 'location', 'description', 'start_date', 'is_active', 'active_cattle_count',
+                      'updated_at',
+                      'field', 'field__name', 'field__updated_at',
+                      'herd_leader', 'herd_leader__name', 'herd_leader__gender', 'herd_leader__birth_date',
+                      'herd_leader__updated_at']
+
+    def for_listing(self):
+        """
+        Joins the field and herd leader of every herd and restricts the columns to those rendered in herd lists,
+        so that a page of herds is loaded in a single query regardless of its length.
+
+        :return: A queryset with the field and herd leader selected in the same query.
+        """
+        return self.select_related('field', 'herd_leader').only(*self.LISTING_FIELDS)
+
+    def for_detail(self):
+        """
+        Joins the field and herd leader so that the herd detail page does not need extra queries for them.
+
+        :return: A queryset with the field and herd leader selected in the same query.
+        """
+        return self.select_related('field', 'herd_leader')
+
+
+class FieldQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Field model with projections matched to what the field templates render.
+    """
+
+    LISTING_FIELDS = ['id', 'name', 'location', 'coordinates', 'field_size', 'size_unit', 'field_type', 'is_active',
+                      'description', 'herd_count', 'updated_at']
+
+    def for_listing(self):
+        """
+        Restricts the queryset to the columns rendered by the field listing and search templates.
+
+        :return: A queryset that does not load the picture column.
+        """
+        return self.only(*self.LISTING_FIELDS)
+
+
+class HerdMembershipQuerySet(models.QuerySet):
+    """
+    Custom queryset for the HerdMembership model with the as-of and transfer lookups.
+    """
+
+    def as_of(self, on_date):
+        """
+        Filters the queryset to the memberships that were current on the given date.
+
+        :param on_date: The date.
+        :return: A queryset of the memberships with valid_from <= on_date < valid_to.
+        """
+        return self.filter(models.Q(valid_to__isnull=True) | models.Q(valid_to__gt=on_date), valid_from__lte=on_date)
+
+    def transfers(self, start_date, end_date):
+        """
+        Filters the queryset to the memberships that started with a move from another herd within a date range.
+
+        :param start_date: The first day of the range.
+        :param end_date: The day after the range.
+        :return: A queryset of the memberships with a previous herd and start_date <= valid_from < end_date.
+        """
+        return self.filter(previous_herd__isnull=False, valid_from__gte=start_date, valid_from__lt=end_date)
+
+
+class Cattle(AtomicSaveModel):
     """
     Represents information about cattle, including breed, gender, acquisition method, and loss method.
     """
@@ -68,7 +228,11 @@ class Cattle(models.Model):
     comments = models.TextField(max_length=2000)
     deleted = models.BooleanField(default=False)
     picture = models.ImageField(upload_to='cattle_pictures', blank=True, null=True)
+    # Part of the template fragment cache keys, see my_farm/templates/cattle.
+    updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CattleManager()
+    all_objects = CattleQuerySet.as_manager()
 
     def delete(self):
         """
@@ -84,6 +248,16 @@ class Cattle(models.Model):
         verbose_name = "Cattle Info"
         verbose_name_plural = "Cattle Info"
         ordering = ['name']
+        # Unique checks, the admin and related managers must also see soft-deleted cattle.
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(deleted=False), name='cattle_active_name_idx'),
+            models.Index(fields=['herd'], condition=models.Q(deleted=False, loss_method__isnull=True),
+                         name='cattle_active_herd_idx'),
+            models.Index(fields=['entry_date'], condition=models.Q(deleted=False), name='cattle_active_entry_idx'),
+            models.Index(fields=['end_date'], condition=models.Q(deleted=False, end_date__isnull=False),
+                         name='cattle_active_end_idx'),
+        ]
 
     def __str__(self):
         """
@@ -92,7 +266,7 @@ class Cattle(models.Model):
         return f'{self.name},  {self.gender}, {self.birth_date}'
 
 
-class Field(models.Model):
+class Field(CounterFieldsModel):
     """
     Represents information about a field, including its name, location, and size.
     """
@@ -110,6 +284,13 @@ class Field(models.Model):
     is_active = models.BooleanField(default=True)
     description = models.TextField(max_length=1200, blank=True)
     picture = models.ImageField(upload_to='field_pictures', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the signal handlers in my_farm.signals, see my_farm.counters.
+    herd_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = FieldQuerySet.as_manager()
+
+    counter_fields = ('herd_count',)
 
     def __str__(self):
         """
@@ -118,7 +299,7 @@ class Field(models.Model):
         return self.name
 
 
-class Herd(models.Model):
+class Herd(CounterFieldsModel):
     """
     Represents information about a herd, including its name, location, and start date.
     """
@@ -131,9 +312,282 @@ class Herd(models.Model):
     herd_leader = models.ForeignKey('Cattle', on_delete=models.SET_NULL, blank=True, null=True,
                                     related_name='herd_leader')
     picture = models.ImageField(upload_to='herd_pictures', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the signal handlers in my_farm.signals, see my_farm.counters.
+    active_cattle_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = HerdQuerySet.as_manager()
+
+    counter_fields = ('active_cattle_count',)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'start_date'], name='herd_active_start_idx'),
+        ]
 
     def __str__(self):
         """
         Returns a string representation of the herd object, showing its name.
         """
         return self.name
+
+
+class DataVersion(models.Model):
+    """
+    A single-row counter that is incremented whenever cattle, herd or field data changes.
+
+    Pages that aggregate many rows, like the cattle groups and the movement report, use it as their version for
+    conditional GET instead of checking every row they are built from.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def bump(cls):
+        """
+        Atomically increments the data version.
+
+        The row is created by a migration, so a bump is a single update. Should the row be missing, e.g. after the
+        tables were flushed, it is created. When a concurrent bump creates it first, the insert fails and the update is
+        tried again, so no increment is lost.
+        """
+        while not cls.objects.filter(pk=1).update(version=models.F('version') + 1, updated_at=timezone.now()):
+            try:
+                with transaction.atomic(using=router.db_for_write(cls)):
+                    cls.objects.create(pk=1, version=1)
+                return
+            except IntegrityError:
+                continue
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the current data version and the time it last changed.
+
+        :return: A (version, updated_at) tuple, or (0, None) if the row does not exist.
+        """
+        return cls.objects.filter(pk=1).values_list('version', 'updated_at').first() or (0, None)
+
+
+class HerdMembership(models.Model):
+    """
+    The period a cattle belonged to a herd, from valid_from up to, but not including, valid_to.
+
+    Cattle.herd only holds the current herd, these rows keep the history. A cattle has at most one open membership,
+    whose valid_to is empty, and it matches Cattle.herd. previous_herd is the herd the cattle moved from, so transfers
+    between herds can be counted without replaying the history.
+    """
+    cattle = models.ForeignKey('Cattle', on_delete=models.CASCADE, related_name='memberships')
+    herd = models.ForeignKey('Herd', on_delete=models.CASCADE, related_name='memberships')
+    previous_herd = models.ForeignKey('Herd', on_delete=models.SET_NULL, blank=True, null=True,
+                                      related_name='transfers_out')
+    valid_from = models.DateField()
+    valid_to = models.DateField(blank=True, null=True)
+
+    objects = HerdMembershipQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Herd composition on a date: a range scan over the memberships of one herd that started by then.
+            models.Index(fields=['herd', 'valid_from', 'valid_to'], name='membership_herd_asof_idx'),
+            # Herd of every cattle on a date, e.g. for the movement report.
+            models.Index(fields=['valid_from', 'valid_to'], name='membership_asof_idx'),
+            # Transfers in a date range.
+            models.Index(fields=['valid_from', 'herd', 'previous_herd'], condition=models.Q(previous_herd__isnull=False),
+                         name='membership_transfer_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['cattle'], condition=models.Q(valid_to__isnull=True),
+                                    name='membership_one_open_per_cattle'),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the membership, showing the cattle, the herd and the period.
+        """
+        return f'{self.cattle_id} in {self.herd_id} from {self.valid_from} to {self.valid_to or "now"}'
+
+
+class ChangeLogEntry(models.Model):
+    """
+    An append-only record of a created, updated or deleted cattle, herd or field.
+
+    'changes' holds a compact field-level diff: the non-empty values of a created row, {column: [old, new]} for the
+    changed columns of an updated row and nothing for a deleted row. The ascending primary key is the cursor that
+    consumers read the log with, see my_farm.changelog.read_changes. The IDs are allocated by ChangeLogSequence in the
+    order their transactions commit.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = [
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(choices=ACTIONS, max_length=6)
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True,
+                             related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Tailing the changes of one model, and the history of one object.
+            models.Index(fields=['model', 'id'], name='changelog_model_cursor_idx'),
+            models.Index(fields=['model', 'object_id', 'id'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the entry, showing the action and the changed object.
+        """
+        return f'{self.action} {self.model} {self.object_id}'
+
+
+class ChangeLogSequence(models.Model):
+    """
+    A single-row counter that allocates the IDs of the change log entries in the order their transactions commit.
+
+    Allocating IDs updates the row, which stays locked until the transaction ends, so a transaction that logs changes
+    waits until the one that logged before it has committed or rolled back. Once an entry is visible, every entry with
+    a lower ID is visible too or never will be, and a reader that continues after the highest ID it has read never
+    skips one, however long a write transaction takes.
+    """
+    last_id = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls, count):
+        """
+        Allocates a block of consecutive change log entry IDs. It must be called in the transaction that writes the
+        entries.
+
+        The row is created by a migration. Should it be missing, e.g. after the tables were flushed, it is created
+        after the highest existing entry ID. When a concurrent allocation creates it first, the update is tried again.
+
+        :param count: The number of IDs.
+        :return: The first allocated ID.
+        """
+        rows = cls.objects.filter(pk=1)
+        while not rows.update(last_id=models.F('last_id') + count):
+            last_id = ChangeLogEntry.objects.aggregate(last_id=models.Max('id'))['last_id'] or 0
+            try:
+                with transaction.atomic(using=router.db_for_write(cls)):
+                    cls.objects.create(pk=1, last_id=last_id + count)
+                return last_id + 1
+            except IntegrityError:
+                continue
+        return rows.values_list('last_id', flat=True).get() - count + 1
+
+
+class SyncRef(models.Model):
+    """
+    The row created by an uploaded create edit, under the 'ref' the device gave the edit.
+
+    A device that uploads the same edits again, e.g. after losing the response, gets the row created the first time
+    instead of a duplicate, and later edits can point their foreign keys at rows by ref, see my_farm.sync.apply_upload.
+    """
+    ref = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """
+        Returns a string representation of the ref, showing the created row.
+        """
+        return f'{self.ref}: {self.model} {self.object_id}'
+
+
+class JobQuerySet(models.QuerySet):
+    """
+    Custom queryset for background jobs.
+    """
+
+    def runnable(self, now):
+        """
+        Returns the queued jobs that are due, highest priority first and oldest first within a priority.
+
+        :param now: The current time.
+        :return: An ordered queryset served by the partial index of queued jobs.
+        """
+        return self.filter(status=Job.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'id')
+
+    def stale(self, locked_before):
+        """
+        Returns the running jobs whose worker has not reported since the given time.
+        """
+        return self.filter(status=Job.RUNNING, locked_at__lt=locked_before)
+
+
+class Job(models.Model):
+    """
+    A background job stored in the database and run by the workers of the run_workers management command.
+
+    'name' is the name a function was registered under with my_farm.jobs.register_job and 'arguments' are its keyword
+    arguments. Failed jobs are queued again with an exponential backoff until they have run 'max_attempts' times.
+    'locked_by' and 'locked_at' identify the worker running a job; 'locked_at' is refreshed while the job runs and with
+    every progress report, so jobs of workers that stopped responding can be queued again.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(choices=STATUSES, max_length=9, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True,
+                                   related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Claiming the next job, and finding the jobs of workers that stopped responding.
+            models.Index(models.F('priority').desc(), 'run_at', 'id', condition=models.Q(status='queued'),
+                         name='job_queue_idx'),
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='job_running_idx'),
+            models.Index(fields=['-created_at'], name='job_recent_idx'),
+        ]
+
+    def report_progress(self, percent, message=''):
+        """
+        Stores the progress of the running job, shown on the jobs page, and refreshes its lock.
+
+        :param percent: The share of the work done, from 0 to 100.
+        :param message: An optional short description of the current step.
+        """
+        self.progress = max(0, min(int(percent), 100))
+        self.progress_message = message[:200]
+        self.locked_at = timezone.now()
+        Job.objects.filter(pk=self.pk, status=Job.RUNNING, locked_by=self.locked_by).update(
+            progress=self.progress, progress_message=self.progress_message, locked_at=self.locked_at)
+
+    def __str__(self):
+        """
+        Returns a string representation of the job, showing its name, ID and status.
+        """
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,190 @@
+from datetime import date, timedelta
+from itertools import accumulate
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from .cache import tiered_cache
+from .models import Cattle
+
+HECTARES_PER_ACRE = 0.40468564224
+
+# Eurostat livestock unit coefficients of cattle by age in months and, for adults, by gender.
+YOUNG_LIVESTOCK_UNITS = ((12, 0.4), (24, 0.7))
+ADULT_LIVESTOCK_UNITS = {'Cow': 0.8, 'Heifer': 0.8, 'Bull': 1.0}
+
+
+def field_area_in_hectares(field_size, size_unit):
+    """
+    Returns the area of a field in hectares, converting acres.
+
+    :param field_size: The size of the field in its unit.
+    :param size_unit: 'ha' or 'ac'.
+    :return: The area in hectares, or None if the size is unknown.
+    """
+    if not field_size:
+        return None
+    return field_size * HECTARES_PER_ACRE if size_unit == 'ac' else field_size
+
+
+def livestock_unit_periods(gender, birth_date):
+    """
+    Returns the livestock units of an animal over its life as (from_date, livestock_units) pairs.
+
+    Cows are counted as adults whatever their age, since they have calved. Animals without a birth date are counted
+    as adults.
+
+    :param gender: The gender of the animal.
+    :param birth_date: The birth date of the animal, or None.
+    :return: A list of (from_date, livestock_units) pairs in date order, the first one starting at date.min.
+    """
+    adult = ADULT_LIVESTOCK_UNITS.get(gender, 1.0)
+    if birth_date is None or gender == 'Cow':
+        return [(date.min, adult)]
+
+    periods = [(date.min, YOUNG_LIVESTOCK_UNITS[0][1])]
+    for index, (months, _) in enumerate(YOUNG_LIVESTOCK_UNITS):
+        units = YOUNG_LIVESTOCK_UNITS[index + 1][1] if index + 1 < len(YOUNG_LIVESTOCK_UNITS) else adult
+        periods.append((birth_date + relativedelta(months=months), units))
+    return periods
+
+
+class FieldOccupancy:
+    """
+    The daily head count, livestock units and stocking density of a field over a date range.
+
+    The series are built from difference arrays: every animal adds its head and livestock units on the day it arrives
+    on the field and removes them on the day it leaves, and a prefix sum turns the changes into daily totals. The cost
+    is linear in the number of animals plus the number of days, and the data is loaded with a single query.
+    """
+
+    def __init__(self, field, start_date, end_date):
+        """
+        Constructor for the FieldOccupancy class.
+
+        :param field: The Field instance.
+        :param start_date: The first day of the series.
+        :param end_date: The last day of the series.
+        """
+        self.field_id = field.pk
+        self.area = field_area_in_hectares(field.field_size, field.size_unit)
+        self.capacity = settings.FIELD_MAX_LIVESTOCK_UNITS_PER_HA
+        self.start_date = start_date
+        self.end_date = end_date
+        self.head_counts = []
+        self.livestock_units = []
+        self.densities = []
+
+    @property
+    def days(self):
+        return (self.end_date - self.start_date).days + 1
+
+    def dates(self):
+        """
+        Returns the days of the series.
+        """
+        return [self.start_date + timedelta(days=offset) for offset in range(self.days)]
+
+    def animals(self):
+        """
+        Loads the arrival, departure, gender and birth date of the animals in the herds of the field.
+
+        An animal arrives on the later of its entry date and the start date of its herd and leaves on its end date.
+        """
+        return Cattle.objects.filter(herd__field_id=self.field_id).values_list(
+            'entry_date', 'herd__start_date', 'end_date', 'gender', 'birth_date')
+
+    def calculate(self, animals=None):
+        """
+        Calculates the daily series.
+
+        :param animals: (entry_date, herd_start_date, end_date, gender, birth_date) tuples, loaded with animals()
+            if not given.
+        :return: The FieldOccupancy instance.
+        """
+        days = self.days
+        head_changes = [0] * (days + 1)
+        unit_changes = [0.0] * (days + 1)
+
+        def offset(day):
+            return min(max((day - self.start_date).days, 0), days)
+
+        for entry_date, herd_start_date, end_date, gender, birth_date in (self.animals() if animals is None
+                                                                          else animals):
+            arrival = max(entry_date or date.min, herd_start_date or date.min)
+            first, last = offset(arrival), offset(end_date) if end_date else days
+            if first >= last:
+                continue
+
+            head_changes[first] += 1
+            head_changes[last] -= 1
+
+            periods = livestock_unit_periods(gender, birth_date)
+            for index, (from_date, units) in enumerate(periods):
+                until = offset(periods[index + 1][0]) if index + 1 < len(periods) else last
+                period_first, period_last = max(first, offset(from_date)), min(last, until)
+                if period_first < period_last:
+                    unit_changes[period_first] += units
+                    unit_changes[period_last] -= units
+
+        self.head_counts = list(accumulate(head_changes[:days]))
+        self.livestock_units = [round(units, 2) for units in accumulate(unit_changes[:days])]
+        self.densities = [round(units / self.area, 2) for units in self.livestock_units] if self.area else []
+        return self
+
+    @property
+    def current_head_count(self):
+        return self.head_counts[-1] if self.head_counts else 0
+
+    @property
+    def current_livestock_units(self):
+        return self.livestock_units[-1] if self.livestock_units else 0
+
+    @property
+    def current_density(self):
+        return self.densities[-1] if self.densities else None
+
+    @property
+    def peak_density(self):
+        return max(self.densities, default=None)
+
+    @property
+    def days_over_capacity(self):
+        return sum(1 for density in self.densities if density > self.capacity)
+
+    @property
+    def is_over_capacity(self):
+        """
+        Returns True if the field is stocked above FIELD_MAX_LIVESTOCK_UNITS_PER_HA on the last day of the series.
+        """
+        return self.current_density is not None and self.current_density > self.capacity
+
+    def chart_points(self, width=600, height=120):
+        """
+        Returns the daily densities as SVG polyline points scaled to the given size, with the capacity line height.
+
+        :param width: The width of the chart.
+        :param height: The height of the chart.
+        :return: A tuple of the points string and the y coordinate of the capacity, or ('', None) without densities.
+        """
+        if not self.densities:
+            return '', None
+
+        top = max(self.peak_density, self.capacity) or 1
+        step = width / max(len(self.densities) - 1, 1)
+        points = ' '.join(f'{index * step:.1f},{height - density / top * height:.1f}'
+                          for index, density in enumerate(self.densities))
+        return points, round(height - self.capacity / top * height, 1)
+
+
+def field_occupancy(field, start_date=None, end_date=None):
+    """
+    Returns the occupancy of a field from the 'occupancy' cache, calculating it on a miss.
+
+    :param field: The Field instance.
+    :param start_date: The first day, by default FIELD_OCCUPANCY_DAYS before the end date.
+    :param end_date: The last day, by default today.
+    :return: The calculated FieldOccupancy.
+    """
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=settings.FIELD_OCCUPANCY_DAYS - 1)
+    key = f'{field.pk}:{start_date.isoformat()}:{end_date.isoformat()}'
+    return tiered_cache.get_or_set('occupancy', key, lambda: FieldOccupancy(field, start_date, end_date).calculate())
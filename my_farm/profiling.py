@@ -0,0 +1,78 @@
+import re
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core import signing
+
+PROFILE_TOKEN_SALT = 'my_farm.profiling'
+PROFILE_FILE_PATTERN = re.compile(r'^\d+_(?P<view>[\w-]+)_(?P<ms>\d+)ms\.(?:prof|speedscope\.json)$')
+
+
+def make_profile_token():
+    """
+    Creates a signed token that enables profiling of a request when passed as the 'profile' query parameter.
+
+    :return: The signed token.
+    """
+    return signing.dumps('profile', salt=PROFILE_TOKEN_SALT)
+
+
+def is_valid_profile_token(token):
+    """
+    Checks whether a token was created by make_profile_token and has not expired.
+
+    :param token: The value of the 'profile' query parameter.
+    :return: True if the token is valid, False otherwise.
+    """
+    try:
+        signing.loads(token, salt=PROFILE_TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def get_profile_dir():
+    """
+    Returns the directory where captured profiles are stored, creating it if necessary.
+    """
+    profile_dir = Path(settings.PROFILING_DIR)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    return profile_dir
+
+
+def build_profile_path(view_name, duration, extension):
+    """
+    Builds the path of a new profile file with the view name and request duration in the filename.
+
+    :param view_name: The name of the profiled view.
+    :param duration: The request duration in seconds.
+    :param extension: The file extension, 'prof' or 'speedscope.json'.
+    :return: The path of the profile file.
+    """
+    safe_view_name = re.sub(r'[^\w-]', '-', view_name or 'unresolved')
+    filename = f'{time.time_ns()}_{safe_view_name}_{int(duration * 1000)}ms.{extension}'
+    return get_profile_dir() / filename
+
+
+def list_profiles(view_name=None):
+    """
+    Lists the captured profile files, oldest first.
+
+    :param view_name: If given, only profiles of this view are listed.
+    :return: A list of paths.
+    """
+    profiles = []
+    for path in sorted(get_profile_dir().iterdir()):
+        match = PROFILE_FILE_PATTERN.match(path.name)
+        if match and (view_name is None or match.group('view') == view_name):
+            profiles.append(path)
+    return profiles
+
+
+def rotate_profiles():
+    """
+    Deletes the oldest profile files so that at most PROFILING_MAX_FILES are kept.
+    """
+    profiles = list_profiles()
+    for path in profiles[:max(len(profiles) - settings.PROFILING_MAX_FILES, 0)]:
+        path.unlink(missing_ok=True)
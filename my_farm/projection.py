@@ -0,0 +1,201 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from .cache import tiered_cache
+from .models import Cattle
+from .report_calculations import AGE_GROUPS
+from .snapshot import cattle_snapshot, decode, decode_date, latest_birth_ordinal
+
+MAX_PROJECTION_MONTHS = 36
+
+
+def parse_projection_params(params):
+    """
+    Reads the projection options from the 'months' and 'rates' query parameters.
+
+    :param params: The query parameters, e.g. request.GET.
+    :return: A (months, apply_rates) tuple, or None if 'months' is not a number between 1 and MAX_PROJECTION_MONTHS.
+    """
+    try:
+        months = int(params.get('months', 12))
+    except ValueError:
+        return None
+    if not 1 <= months <= MAX_PROJECTION_MONTHS:
+        return None
+    return months, params.get('rates', '').lower() in ('1', 'true', 'on', 'yes')
+
+
+def historical_rates(today):
+    """
+    Derives the monthly birth and loss rates of the last PROJECTION_HISTORY_MONTHS months with a single query.
+
+    Births are cattle acquired by 'Birth', losses are cattle with a loss method, and both are related to the current
+    number of cows and cattle.
+
+    :param today: The date the history ends on.
+    :return: A dictionary with the monthly births per cow, the monthly loss rate, the share of heifers among the
+        births and the losses by method.
+    """
+    history_months = settings.PROJECTION_HISTORY_MONTHS
+    since = today - relativedelta(months=history_months)
+    active = Q(entry_date__lt=today) & (Q(end_date__isnull=True) | Q(end_date__gt=today))
+    born = Q(acquisition_method='Birth', entry_date__gte=since, entry_date__lt=today)
+    lost = Q(loss_method__isnull=False, end_date__gte=since, end_date__lt=today)
+
+    counts = Cattle.objects.aggregate(
+        cows=Count('id', filter=active & Q(gender='Cow')),
+        head=Count('id', filter=active),
+        births=Count('id', filter=born),
+        heifer_births=Count('id', filter=born & Q(gender='Heifer')),
+        losses=Count('id', filter=lost),
+        **{f'lost_{method.lower()}': Count('id', filter=lost & Q(loss_method=method))
+           for method, _ in Cattle.LOSS_METHOD},
+    )
+
+    return {
+        'births_per_cow': counts['births'] / counts['cows'] / history_months if counts['cows'] else 0.0,
+        'loss_rate': min(counts['losses'] / counts['head'] / history_months, 1.0) if counts['head'] else 0.0,
+        'heifer_share': counts['heifer_births'] / counts['births'] if counts['births'] else 0.5,
+        'losses_by_method': {method: counts[f'lost_{method.lower()}'] for method, _ in Cattle.LOSS_METHOD},
+    }
+
+
+class CensusProjection:
+    """
+    Projects the number of cattle in every age group at the start of each of the next months.
+
+    Age groups change when an animal reaches 12 and 24 months, following GroupsManagement.calculate_groups. The month
+    an animal crosses each boundary is found with a binary search over the latest birth date of that age on each
+    projected date, see my_farm.snapshot.latest_birth_ordinal, and its time in each group is added to a difference
+    array per group, so the projection takes a single pass over the birth dates followed by a prefix sum per group.
+
+    With historical rates, the counts are reduced by the monthly loss rate, and the calves expected from the cows are
+    added as they are born and grow into the young and adult heifer and bull groups.
+    """
+
+    def __init__(self, start_date, months):
+        """
+        Constructor for the CensusProjection class.
+
+        :param start_date: The date of the first projected month, usually today.
+        :param months: The number of months to project after the start date.
+        """
+        self.start_date = start_date
+        self.months = months
+        self.month_dates = [start_date + relativedelta(months=month) for month in range(months + 1)]
+        self.counts = {group: [0] * (months + 1) for group in AGE_GROUPS}
+        self.rates = None
+
+    def animals(self):
+        """
+        Reads the gender, birth date and entry date of the cattle that are on the farm on the start date from the
+        cattle snapshot.
+        """
+        columns = cattle_snapshot.current()
+        start = self.start_date.toordinal()
+        return [(decode(columns.gender_codes, gender), decode_date(birth), decode_date(entry))
+                for live, end, gender, birth, entry in zip(columns.live, columns.end_dates, columns.genders,
+                                                           columns.birth_dates, columns.entry_dates)
+                if live and (not end or end > start)]
+
+    def first_month_on_or_after(self, day):
+        return bisect_left(self.month_dates, day)
+
+    def calculate(self, animals=None, rates=None):
+        """
+        Calculates the projected counts.
+
+        :param animals: (gender, birth_date, entry_date) tuples, loaded with animals() if not given.
+        :param rates: The historical rates from historical_rates(), or None to only age the current cattle.
+        :return: The CensusProjection instance.
+        """
+        length = self.months + 1
+        changes = {group: [0] * (length + 1) for group in AGE_GROUPS}
+        # The same age thresholds as the cattle snapshot, so projected and current groups agree at month ends.
+        young_births, adult_births = ([latest_birth_ordinal(month_date, months) for month_date in self.month_dates]
+                                      for months in (12, 24))
+
+        def add(group, first, last):
+            if first < last:
+                changes[group][first] += 1
+                changes[group][last] -= 1
+
+        for gender, birth_date, entry_date in (self.animals() if animals is None else animals):
+            if entry_date is None:
+                continue
+            # Cattle belong to a group from the first month after their entry date.
+            entered = bisect_right(self.month_dates, entry_date)
+
+            if gender == 'Cow':
+                add('Cows', entered, length)
+            elif gender in ('Heifer', 'Bull') and birth_date is not None:
+                born = self.first_month_on_or_after(birth_date)
+                young = bisect_left(young_births, birth_date.toordinal())
+                adult = bisect_left(adult_births, birth_date.toordinal())
+                add('Calves', max(entered, born), young)
+                add(f'Young_{gender}', max(entered, young), adult)
+                add(f'Adult_{gender}', max(entered, adult), length)
+
+        self.counts = {group: list(accumulate(changes[group][:length])) for group in AGE_GROUPS}
+        if rates is not None:
+            self.apply_rates(rates)
+        return self
+
+    def apply_rates(self, rates):
+        """
+        Applies the monthly loss rate to the projected counts and adds the expected calves of the cows.
+
+        :param rates: The historical rates from historical_rates().
+        """
+        self.rates = rates
+        survival = 1 - rates['loss_rate']
+        length = self.months + 1
+
+        counts = {group: [count * survival ** month for month, count in enumerate(self.counts[group])]
+                  for group in AGE_GROUPS}
+
+        for born_in in range(1, length):
+            calves = rates['births_per_cow'] * counts['Cows'][born_in - 1]
+            for month in range(born_in, length):
+                alive = calves * survival ** (month - born_in)
+                age = month - born_in
+                if age < 12:
+                    counts['Calves'][month] += alive
+                else:
+                    stage = 'Young' if age < 24 else 'Adult'
+                    counts[f'{stage}_Heifer'][month] += alive * rates['heifer_share']
+                    counts[f'{stage}_Bull'][month] += alive * (1 - rates['heifer_share'])
+
+        self.counts = {group: [round(count, 1) for count in counts[group]] for group in AGE_GROUPS}
+
+    @property
+    def totals(self):
+        return [round(sum(month_counts), 1) for month_counts in zip(*self.counts.values())]
+
+    def rows(self):
+        """
+        Returns the projection as one (date, counts, total) tuple per month, for rendering.
+        """
+        return [(month_date, [self.counts[group][month] for group in AGE_GROUPS], self.totals[month])
+                for month, month_date in enumerate(self.month_dates)]
+
+
+def census_projection(months, apply_rates, today=None):
+    """
+    Returns the census projection from the 'projections' cache, calculating it on a miss.
+
+    :param months: The number of months to project.
+    :param apply_rates: Whether to apply the historical birth and loss rates.
+    :param today: The date of the first projected month, by default today.
+    :return: The calculated CensusProjection.
+    """
+    today = today or date.today()
+
+    def calculate():
+        rates = historical_rates(today) if apply_rates else None
+        return CensusProjection(today, months).calculate(rates=rates)
+
+    return tiered_cache.get_or_set('projections', f'{today.isoformat()}:{months}:{apply_rates}', calculate)
@@ -0,0 +1,52 @@
+"""
+Per-URL query budgets for the "My Farm" application.
+
+Each key is a URL name from my_farm/urls.py and each value is the maximum number of SQL queries a single request to
+that URL may run, including the session and user lookups made by the authentication middleware. The budgets do not
+depend on the number of rows rendered, so any view that grows past its budget as data is added has an N+1 pattern.
+"""
+
+QUERY_BUDGETS = {
+    'home': 5,
+    'group_data': 4,
+
+    'generate_report': 2,
+    'report': 6,
+    'report_api': 6,
+    'dashboard_api': 5,
+    'changes_api': 2,
+    'sync_api': 6,
+
+    'projection': 4,
+    'projection_api': 4,
+
+    'job_list': 3,
+    'job_api': 3,
+
+    'cattle_info': 4,
+    'cattle_detail': 3,
+    'update_cattle': 4,
+    'search_cattle': 3,
+
+    'herd_list': 4,
+    'herd_detail': 3,
+    'cattle_list_by_herd': 4,
+    'search_herd': 3,
+    'herd_composition_api': 4,
+    'herd_transfers_api': 3,
+
+    'field_list': 4,
+    'field_detail': 5,
+    'herd_list_by_field': 4,
+    'search_field': 3,
+}
+
+
+def get_query_budget(url_name):
+    """
+    Returns the query budget declared for the given URL name.
+
+    :param url_name: The URL name resolved for the request.
+    :return: The maximum number of queries allowed, or None if the URL has no budget.
+    """
+    return QUERY_BUDGETS.get(url_name)
@@ -0,0 +1,102 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from django.db import connection
+from .query_budgets import get_query_budget
+
+
+IN_LIST_PATTERN = re.compile(r'IN \((?:%s, )*%s\)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def query_signature(sql):
+    """
+    Normalizes an SQL statement into a signature that is shared by queries of the same shape.
+
+    Query parameters are passed separately from the SQL, so only whitespace and variable-length IN lists need
+    collapsing for repeated per-row lookups to produce the same signature.
+
+    :param sql: The SQL statement as sent to the database driver.
+    :return: The normalized query signature.
+    """
+    sql = WHITESPACE_PATTERN.sub(' ', sql).strip()
+    return IN_LIST_PATTERN.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that records the number, total time and signatures of executed queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Executes the query and records its duration and signature.
+
+        :param execute: The next callable in the execute wrapper chain.
+        :param sql: The SQL statement.
+        :param params: The query parameters.
+        :param many: True if the statement is executed with executemany().
+        :param context: The execution context provided by Django.
+        :return: The result of the wrapped execute call.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.signatures[query_signature(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """
+        Returns the signatures of queries that were executed more than once, with their counts.
+        """
+        return {signature: count for signature, count in self.signatures.items() if count > 1}
+
+    def summary(self):
+        """
+        Returns a compact one-line summary of the recorded queries.
+        """
+        duplicate_count = sum(count - 1 for count in self.duplicates.values())
+        return f'queries={self.count}; time={self.duration * 1000:.1f}ms; duplicates={duplicate_count}'
+
+
+@contextmanager
+def record_queries():
+    """
+    Records every query executed on the default database connection inside the block.
+
+    :return: A QueryRecorder instance holding the recorded statistics.
+    """
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+
+@contextmanager
+def assert_query_budget(url_name):
+    """
+    Test helper that fails if the block runs more queries than the budget declared for the URL name.
+
+    :param url_name: The URL name whose budget is enforced.
+    :raises AssertionError: If the URL has no budget or the budget is exceeded.
+    """
+    budget = get_query_budget(url_name)
+    if budget is None:
+        raise AssertionError(f'No query budget is declared for {url_name!r}.')
+
+    with record_queries() as recorder:
+        yield recorder
+
+    if recorder.count > budget:
+        duplicates = '\n'.join(f'{count}x {signature}' for signature, count in recorder.duplicates.items())
+        raise AssertionError(
+            f'{url_name!r} ran {recorder.count} queries, budget is {budget}.\nDuplicated queries:\n{duplicates}'
+        )
@@ -0,0 +1,74 @@
+import json
+import re
+from datetime import date, timedelta
+from django.db import connection, connections
+from django.utils import timezone
+from .cattle_groups import GroupsManagement
+from .models import Cattle, Herd, HerdMembership, Job
+
+SQLITE_FULL_SCAN_PATTERN = re.compile(r'\bSCAN (?:TABLE )?(my_farm_\w+)\b(?! USING)')
+POSTGRESQL_FULL_SCAN_PATTERN = re.compile(r'Seq Scan on (my_farm_\w+)')
+
+
+def key_queries():
+    """
+    Returns the querysets behind the main views, keyed by a descriptive label.
+
+    Every queryset here is expected to be answered from an index on a seeded database.
+    """
+    today = date.today()
+    herd = Herd.objects.first()
+    return {
+        'home: active herds': Herd.objects.filter(is_active=True, start_date__lte=timezone.now()),
+        'cattle_info: page ordered by name': Cattle.objects.for_listing()[:4],
+        'cattle_info: current livestock page': Cattle.objects.active().for_listing()[:4],
+        'cattle_list_by_herd': Cattle.objects.active().filter(herd=herd).for_listing(),
+        'group_data: page ordered by name': GroupsManagement().group_queryset('Cows', today).order_by('name',
+                                                                                                      'id')[:100],
+        'report: acquisitions in range': Cattle.objects.filter(entry_date__gte=today - timedelta(days=30),
+                                                               entry_date__lt=today),
+        'report: losses in range': Cattle.objects.filter(end_date__gte=today - timedelta(days=30),
+                                                         end_date__lt=today),
+        'herd_composition_api: memberships as of a date': HerdMembership.objects.as_of(today).filter(herd=herd),
+        'herd_transfers_api: transfers in range': HerdMembership.objects.transfers(today - timedelta(days=30), today),
+        'run_workers: next due jobs': Job.objects.runnable(timezone.now()).values_list('id', flat=True)[:10],
+    }
+
+
+def find_full_scans(queryset):
+    """
+    Runs EXPLAIN for a queryset and returns the my_farm tables it reads with a full table scan.
+
+    On PostgreSQL sequential scans are disabled for the EXPLAIN, so a 'Seq Scan' in the plan means that no index can
+    answer the query, whatever the size of the table.
+
+    :param queryset: The queryset to explain.
+    :return: A tuple with the query plan and the list of fully scanned tables.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            plan = queryset.explain()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = on')
+        return plan, POSTGRESQL_FULL_SCAN_PATTERN.findall(plan)
+
+    plan = queryset.explain()
+    return plan, SQLITE_FULL_SCAN_PATTERN.findall(plan)
+
+
+def estimated_count(queryset):
+    """
+    Returns the number of rows the query planner expects a queryset to return, without running the query.
+
+    Only PostgreSQL exposes its estimate, which is read from the JSON plan of EXPLAIN.
+
+    :param queryset: The queryset to estimate.
+    :return: The estimated number of rows, or None on other databases.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.explain(format='json'))
+    return plan[0]['Plan']['Plan Rows']
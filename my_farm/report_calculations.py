@@ -1,3 +1,19 @@
+
+AGE_GROUPS = ('Cows', 'Calves', 'Young_Heifer', 'Adult_Heifer', 'Young_Bull', 'Adult_Bull')
+
+REPORT_DIMENSIONS = {
+    'age_group': 'Age group',
+    'herd': 'Herd',
+    'field': 'Field',
+    'breed': 'Breed',
+    'gender': 'Gender',
+}
+
+ACQUISITION_COUNTERS = {'Birth': 'birth_count', 'Purchase': 'purchase_count', 'Gift': 'gift_count'}
+
+LOSS_COUNTERS = {'Death': 'death_count', 'Sold': 'sold_count', 'Consumed': 'consumed_count', 'Gifted': 'gifted_count'}
+
+
 class GroupDataFilters:
     def __init__(self, group_name, group_data):
         """
@@ -189,4 +205,188 @@ class MovementCalculator(GroupDataFilters):
         self.moved_in = len(moved_in_cattle)
 
         moved_out_cattle = self.get_cattle_moved_between_groups(start_date_data, start_date, end_date_data, end_date)
-        self.moved_out = len(moved_out_cattle)
\ No newline at end of file
+        self.moved_out = len(moved_out_cattle)
+
+
+def parse_report_dimensions(params):
+    """
+    Reads the report dimensions from the comma-separated 'by' query parameter.
+
+    :param params: The query parameters, e.g. request.GET.
+    :return: A tuple of dimension names, ('age_group',) without the parameter, or None if it names unknown dimensions.
+    """
+    dimensions = tuple(dict.fromkeys(name.strip() for name in params.get('by', '').split(',') if name.strip()))
+    if not dimensions:
+        return 'age_group',
+    if any(name not in REPORT_DIMENSIONS for name in dimensions):
+        return None
+    return dimensions
+
+
+class ReportCell:
+    """
+    The report figures of one combination of dimension values, e.g. the young heifers of one herd.
+
+    The cell is its own 'acquisition_stats' and 'movement_stats', so it renders with the same templates and columns as
+    the GroupNumbers of the age group report.
+    """
+
+    def __init__(self, key):
+        """
+        Constructor for the ReportCell class.
+
+        :param key: The tuple of dimension values of the cell.
+        """
+        self.key = key
+        self.group_name = ' / '.join(key)
+        self.start_date_count = 0
+        self.end_date_count = 0
+        self.birth_count = 0
+        self.purchase_count = 0
+        self.gift_count = 0
+        self.death_count = 0
+        self.sold_count = 0
+        self.consumed_count = 0
+        self.gifted_count = 0
+        self.moved_in = 0
+        self.moved_out = 0
+
+    @property
+    def count_difference(self):
+        return self.end_date_count - self.start_date_count
+
+    @property
+    def acquisition_stats(self):
+        return self
+
+    @property
+    def movement_stats(self):
+        return self
+
+    def increment(self, counter):
+        setattr(self, counter, getattr(self, counter) + 1)
+
+
+class GroupByCalculator:
+    """
+    Calculates the movement report figures grouped by any combination of report dimensions in a single pass over the
+    cattle snapshot.
+
+    Every cattle is classified once for the start and once for the end of the period, and its contribution is added to
+    the cells of its dimension values, which are kept in a dictionary. The figures follow the GroupNumbers,
+    AcquisitionLossCalculator and MovementCalculator rules: acquisitions and losses count in the cell of the end of
+    the period, and a cattle moves between cells when its age group or, given the herd memberships, its herd changes.
+    Fields are those the herds are on now.
+    """
+
+    def __init__(self, dimensions):
+        """
+        Constructor for the GroupByCalculator class.
+
+        :param dimensions: The names of the dimensions to group by, keys of REPORT_DIMENSIONS.
+        :raises ValueError: If no or unknown dimensions are given.
+        """
+        unknown = [name for name in dimensions if name not in REPORT_DIMENSIONS]
+        if not dimensions or unknown:
+            raise ValueError(f'Unknown report dimensions: {", ".join(unknown) or "none given"}.')
+        self.dimensions = tuple(dimensions)
+        self.cells = {}
+
+    def cell(self, key):
+        """
+        Returns the cell of a tuple of dimension values, creating it on first use.
+        """
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = ReportCell(key)
+        return cell
+
+    def cell_key(self, columns, position, group, herds=None, current_herds=None):
+        """
+        Returns the dimension values of a cattle on a reference date.
+
+        :param columns: The my_farm.snapshot.SnapshotColumns of the cattle.
+        :param position: The position of the cattle in the columns.
+        :param group: The index into AGE_GROUPS of the cattle on the reference date, -1 for none.
+        :param herds: The (herd name, field name) of the cattle on the reference date by cattle ID, see
+            my_farm.memberships.herds_as_of. Cattle without a membership on that date are in their current herd.
+        :param current_herds: The (herd name, field name) of every herd by ID, needed for the herd and field
+            dimensions.
+        :return: A tuple of dimension values, or None if the cattle is in no age group on that date.
+        """
+        if group < 0:
+            return None
+
+        values = {'age_group': AGE_GROUPS[group]}
+        if 'herd' in self.dimensions or 'field' in self.dimensions:
+            herd_name, field_name = (herds or {}).get(columns.ids[position]) or (current_herds or {}).get(
+                columns.herd_ids[position], (None, None))
+            values['herd'] = herd_name or 'No herd'
+            values['field'] = field_name or 'No field'
+        if 'breed' in self.dimensions:
+            values['breed'] = columns.breed_codes[columns.breeds[position]]
+        if 'gender' in self.dimensions:
+            values['gender'] = columns.gender_codes[columns.genders[position]]
+        return tuple(values[name] for name in self.dimensions)
+
+    def calculate(self, columns, start_date, end_date, herds_at_start=None, herds_at_end=None, current_herds=None):
+        """
+        Calculates the report cells for a date range.
+
+        :param columns: The my_farm.snapshot.SnapshotColumns of the cattle.
+        :param start_date: The start date of the date range.
+        :param end_date: The end date of the date range.
+        :param herds_at_start: The herds of the cattle on the start date, see cell_key.
+        :param herds_at_end: The herds of the cattle on the end date, see cell_key.
+        :param current_herds: The names of the current herds and their fields, see cell_key.
+        :return: The non-empty cells, sorted by their dimension values. Grouped by age group only, every age group is
+            returned.
+        """
+        if self.dimensions == ('age_group',):
+            for group in AGE_GROUPS:
+                self.cell((group,))
+
+        acquisition_counters = [ACQUISITION_COUNTERS.get(method) for method in columns.acquisition_codes]
+        loss_counters = [LOSS_COUNTERS.get(method) for method in columns.loss_codes]
+        start, end = start_date.toordinal(), end_date.toordinal()
+        start_groups, end_groups = columns.age_groups(start_date), columns.age_groups(end_date)
+
+        for position, (start_group, end_group) in enumerate(zip(start_groups, end_groups)):
+            if start_group < 0 and end_group < 0:
+                continue
+            start_key = self.cell_key(columns, position, start_group, herds_at_start, current_herds)
+            end_key = self.cell_key(columns, position, end_group, herds_at_end, current_herds)
+
+            left_on = columns.end_dates[position]
+            entered_on = columns.entry_dates[position]
+            active_at_start = start_key is not None and (not left_on or start < left_on)
+            active_at_end = end_key is not None and (not left_on or end < left_on)
+            entered = bool(entered_on) and start <= entered_on < end
+            left = bool(left_on) and start <= left_on < end
+            stayed = active_at_start and active_at_end and start_key == end_key
+
+            if active_at_start:
+                self.cell(start_key).start_date_count += 1
+            if active_at_end:
+                self.cell(end_key).end_date_count += 1
+
+            if end_key is not None:
+                acquisition, loss = columns.acquisition_methods[position], columns.loss_methods[position]
+                if entered and acquisition >= 0 and acquisition_counters[acquisition]:
+                    self.cell(end_key).increment(acquisition_counters[acquisition])
+                if left and loss >= 0 and loss_counters[loss]:
+                    self.cell(end_key).increment(loss_counters[loss])
+
+            if active_at_end and not stayed and not (entered or left):
+                self.cell(end_key).moved_in += 1
+            if active_at_start and not stayed and not (end_key == start_key and (entered or left)):
+                self.cell(start_key).moved_out += 1
+
+        return sorted(self.cells.values(), key=self.sort_key)
+
+    def sort_key(self, cell):
+        """
+        Orders cells by their dimension values, with the age groups in their usual order.
+        """
+        return tuple(AGE_GROUPS.index(value) if name == 'age_group' else value
+                     for name, value in zip(self.dimensions, cell.key))
@@ -0,0 +1,195 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+from .cache import INVALIDATED_BY, tiered_cache
+from .changelog import load_previous_values, current_values, diff, record_change
+from .counters import is_counted, adjust_herd_count, adjust_field_count
+from .models import Cattle, Herd, Field, DataVersion, ChangeLogEntry
+
+# Sent with the changed model class as sender whenever farm data changes. Code that writes without model signals,
+# such as bulk_create or queryset update, calls notify_model_changed itself.
+model_changed = Signal()
+
+batch_state = threading.local()
+
+
+def notify_model_changed(model, instance=None):
+    """
+    Sends model_changed for the model, or records the change when called inside batched_model_changes.
+
+    :param model: The changed model class.
+    :param instance: The changed instance, if a single row changed.
+    """
+    if hasattr(batch_state, 'changed'):
+        batch_state.changed.add(model)
+    else:
+        model_changed.send(sender=model, instance=instance)
+
+
+@contextmanager
+def batched_model_changes():
+    """
+    Collects the model changes made inside the block and sends model_changed once per changed model at the end,
+    instead of once per saved or deleted row.
+    """
+    outermost = not hasattr(batch_state, 'changed')
+    if outermost:
+        batch_state.changed = set()
+    try:
+        yield
+    finally:
+        if outermost:
+            changed = batch_state.changed
+            del batch_state.changed
+            for model in changed:
+                model_changed.send(sender=model)
+
+
+@receiver(pre_save, sender=Cattle)
+@receiver(pre_save, sender=Herd)
+@receiver(pre_save, sender=Field)
+def remember_previous_values(sender, instance, raw, **kwargs):
+    """
+    Stores the values the row had in the database before it is saved, for the counters and the change log.
+    """
+    instance._previous_values = None if raw else load_previous_values(instance)
+
+
+@receiver(post_save, sender=Cattle)
+def update_herd_cattle_counts(sender, instance, created, raw, **kwargs):
+    """
+    Moves the cattle between herd counters when it changes herd, gets a loss method or is soft deleted. Other saves
+    leave the herd untouched, so its updated_at, and with it the cached fragments showing the herd, stay valid.
+    """
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_values', None)
+    previous_herd_id = None
+    if previous is not None and is_counted(previous['deleted'], previous['loss_method']):
+        previous_herd_id = previous['herd_id']
+    herd_id = instance.herd_id if is_counted(instance.deleted, instance.loss_method) else None
+    if previous_herd_id != herd_id:
+        adjust_herd_count(previous_herd_id, -1)
+        adjust_herd_count(herd_id, 1)
+
+
+@receiver(post_save, sender=Cattle)
+def update_herd_membership(sender, instance, created, raw, **kwargs):
+    """
+    Records herd changes in the membership history on every save path, e.g. the forms, the admin and device sync.
+    New cattle join their herd on their entry date, see my_farm.memberships.record_herd_change.
+    """
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_values', None)
+    if previous is not None and previous['herd_id'] == instance.herd_id:
+        return
+    # Imported here because my_farm.memberships imports this module.
+    from .memberships import record_herd_change
+    record_herd_change(instance, instance.entry_date if created else None)
+
+
+@receiver(post_delete, sender=Cattle)
+def remove_deleted_cattle_from_count(sender, instance, **kwargs):
+    """
+    Removes a hard-deleted cattle from its herd's count.
+    """
+    if is_counted(instance.deleted, instance.loss_method):
+        adjust_herd_count(instance.herd_id, -1)
+
+
+@receiver(pre_delete, sender=Herd)
+def touch_cattle_of_deleted_herd(sender, instance, **kwargs):
+    """
+    Sets updated_at on the cattle of a herd that is deleted, as the deletion clears their herd with an update that
+    does not, so that the cattle snapshot refreshes them.
+    """
+    Cattle.all_objects.filter(herd=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Herd)
+def update_field_herd_counts(sender, instance, created, raw, **kwargs):
+    """
+    Moves the herd between field counters when it is created or changes field.
+    """
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_values', None)
+    previous_field_id = previous['field_id'] if previous else None
+    if created or previous_field_id != instance.field_id:
+        adjust_field_count(previous_field_id, -1)
+        adjust_field_count(instance.field_id, 1)
+
+
+@receiver(post_delete, sender=Herd)
+def remove_deleted_herd_from_count(sender, instance, **kwargs):
+    """
+    Removes a deleted herd from its field's count.
+    """
+    adjust_field_count(instance.field_id, -1)
+
+
+@receiver(post_save, sender=Cattle)
+@receiver(post_save, sender=Herd)
+@receiver(post_save, sender=Field)
+def log_saved_change(sender, instance, created, raw, **kwargs):
+    """
+    Logs the created row, or the changed columns of an updated row, in the change log.
+    """
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_values', None)
+    current = current_values(instance)
+    if previous is None:
+        record_change(sender, instance.pk, ChangeLogEntry.CREATE,
+                      {column: value for column, value in current.items() if value not in (None, '')})
+    elif changes := diff(previous, current):
+        record_change(sender, instance.pk, ChangeLogEntry.UPDATE, changes)
+
+
+@receiver(post_delete, sender=Cattle)
+@receiver(post_delete, sender=Herd)
+@receiver(post_delete, sender=Field)
+def log_deleted_row(sender, instance, **kwargs):
+    """
+    Logs the deletion of a row in the change log.
+    """
+    record_change(sender, instance.pk, ChangeLogEntry.DELETE, {})
+
+
+@receiver(post_save, sender=Cattle)
+@receiver(post_save, sender=Herd)
+@receiver(post_save, sender=Field)
+@receiver(post_delete, sender=Cattle)
+@receiver(post_delete, sender=Herd)
+@receiver(post_delete, sender=Field)
+def broadcast_model_change(sender, instance, **kwargs):
+    """
+    Forwards saves and deletes of cattle, herds and fields to the model_changed bus.
+    """
+    notify_model_changed(sender, instance)
+
+
+@receiver(model_changed)
+def invalidate_cached_data(sender, **kwargs):
+    """
+    Invalidates the cache namespaces derived from the changed model once the transaction commits, so that no request
+    can cache the data from before the change in between.
+    """
+    transaction.on_commit(partial(tiered_cache.invalidate, *INVALIDATED_BY[sender.__name__]))
+
+
+@receiver(model_changed)
+def bump_data_version(sender, **kwargs):
+    """
+    Increments the global data version in the same transaction as the change.
+    """
+    DataVersion.bump()
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+import traceback
+from pathlib import Path
+from django.db import DatabaseError
+from .query_instrumentation import query_signature
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parent
+INSTRUMENTATION_FILES = {
+    str(APP_DIR / name) for name in ('slow_queries.py', 'query_instrumentation.py', 'middleware.py')
+}
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+MAX_EXPLAINED_SHAPES = 1000
+
+explained_shapes = set()
+explained_shapes_lock = threading.Lock()
+
+
+def find_origin():
+    """
+    Finds the innermost stack frame in the my_farm application that led to the current query.
+
+    :return: A 'file:line in function' string, or None if the query did not come from my_farm code.
+    """
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(str(APP_DIR)) and frame.filename not in INSTRUMENTATION_FILES:
+            return f'{Path(frame.filename).relative_to(APP_DIR.parent)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def claim_shape(signature):
+    """
+    Marks a query shape as explained.
+
+    :param signature: The query signature.
+    :return: True if the shape had not been explained before by this process.
+    """
+    with explained_shapes_lock:
+        if signature in explained_shapes or len(explained_shapes) >= MAX_EXPLAINED_SHAPES:
+            return False
+        explained_shapes.add(signature)
+        return True
+
+
+def explain(connection, sql, params):
+    """
+    Returns the query plan of a statement as text, using the EXPLAIN syntax of the database vendor.
+
+    The plan is read through a backend cursor rather than connection.cursor(), so that it bypasses the execute
+    wrappers and is not counted as one of the request's queries.
+
+    :param connection: The database connection the statement ran on.
+    :param sql: The SQL statement.
+    :param params: The statement parameters.
+    :return: The query plan, or None if the vendor is not supported or EXPLAIN failed.
+    """
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None:
+        return None
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+    finally:
+        cursor.close()
+
+
+class SlowQueryLogger:
+    """
+    Database execute wrapper that logs every query slower than a threshold.
+
+    Each log entry names the originating view and the innermost my_farm stack frame. The first time a SELECT of a
+    given shape is slow, its query plan is captured with EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL, MySQL)
+    and logged with it, so missing indexes show up in the logs of production traffic.
+    """
+
+    def __init__(self, threshold, request=None):
+        """
+        :param threshold: The threshold in seconds.
+        :param request: The HTTP request the queries run for, used to name the originating view.
+        """
+        self.threshold = threshold
+        self.request = request
+
+    @property
+    def view_name(self):
+        """
+        Returns the namespaced name of the view handling the request, once the URL has been resolved.
+        """
+        resolver_match = getattr(self.request, 'resolver_match', None)
+        return resolver_match.view_name if resolver_match else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.log(sql, params, many, context['connection'], duration)
+
+    def log(self, sql, params, many, connection, duration):
+        """
+        Logs a slow query, with its query plan if the query shape has not been explained yet.
+        """
+        plan = None
+        signature = query_signature(sql)
+        if not many and sql.lstrip().upper().startswith('SELECT') and claim_shape(signature):
+            plan = explain(connection, sql, params)
+
+        logger.warning(
+            'Slow query (%.1f ms) in view %s at %s: %s%s',
+            duration * 1000, self.view_name or 'unresolved', find_origin() or 'unknown origin', signature,
+            f'\nQuery plan:\n{plan}' if plan else '',
+        )
@@ -0,0 +1,310 @@
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from .models import Cattle, DataVersion
+from .report_calculations import AGE_GROUPS
+
+GENDERS = tuple(code for code, _ in Cattle.GENDER)
+BREEDS = tuple(code for code, _ in Cattle.BREED)
+ACQUISITION_METHODS = tuple(code for code, _ in Cattle.ACQUISITION_METHOD)
+LOSS_METHODS = tuple(code for code, _ in Cattle.LOSS_METHOD)
+
+SNAPSHOT_FIELDS = ('id', 'gender', 'breed', 'birth_date', 'entry_date', 'end_date', 'acquisition_method',
+                   'loss_method', 'herd_id', 'deleted', 'updated_at')
+
+# Rows changed while a transaction was open can carry an 'updated_at' older than the high-water mark when they commit,
+# so incremental refreshes read back this far before it.
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+# Incremental refreshes that change more than this share of the rows, or leave more than this share of dead rows,
+# reload the snapshot instead.
+RELOAD_SHARE = 0.25
+
+COWS, CALVES, YOUNG_HEIFER, ADULT_HEIFER, YOUNG_BULL, ADULT_BULL = range(len(AGE_GROUPS))
+HEIFER, BULL, COW = (GENDERS.index(gender) for gender in ('Heifer', 'Bull', 'Cow'))
+
+
+def encode(codes, value):
+    """
+    Returns the index of a choice value in its codes, or -1 for None. Values outside the choices, which rows saved
+    without validation can hold, are added to the codes.
+    """
+    if value is None:
+        return -1
+    if value not in codes:
+        codes.append(value)
+    return codes.index(value)
+
+
+def decode(codes, index):
+    """
+    Returns the choice value of an index, or None for -1.
+    """
+    return None if index < 0 else codes[index]
+
+
+def decode_date(ordinal):
+    """
+    Returns the date of an ordinal, or None for 0.
+    """
+    return date.fromordinal(ordinal) if ordinal else None
+
+
+def latest_birth_ordinal(reference_date, months):
+    """
+    Returns the ordinal of the latest birth date of cattle that are at least the given number of months old on the
+    reference date, as calculated by my_farm.utils.calculate_age.
+
+    calculate_age counts the months that can be added to the birth date without passing the reference date, which is
+    monotonic in the birth date, so one threshold per age replaces the calculation for every cattle.
+    """
+    threshold = reference_date - relativedelta(months=months)
+    while threshold + timedelta(days=1) + relativedelta(months=months) <= reference_date:
+        threshold += timedelta(days=1)
+    while threshold + relativedelta(months=months) > reference_date:
+        threshold -= timedelta(days=1)
+    return threshold.toordinal()
+
+
+class SnapshotColumns:
+    """
+    An immutable columnar copy of the cattle fields the group and report calculations use.
+
+    Every field is an array with one item per row, ordered by ID: the choices are stored as indexes into the
+    gender_codes, breed_codes, acquisition_codes and loss_codes lists, which start with the model's choices, -1 for
+    None, the dates as ordinals, 0 for None, and the herd as its ID, 0 for None. Rows of cattle that were deleted after
+    the snapshot was loaded stay in the arrays with 'live' set to 0 until the next reload.
+    """
+
+    def __init__(self, ids, genders, breeds, birth_dates, entry_dates, end_dates, acquisition_methods, loss_methods,
+                 herd_ids, live, high_water, codes=None):
+        self.ids = ids
+        self.genders = genders
+        self.breeds = breeds
+        self.birth_dates = birth_dates
+        self.entry_dates = entry_dates
+        self.end_dates = end_dates
+        self.acquisition_methods = acquisition_methods
+        self.loss_methods = loss_methods
+        self.herd_ids = herd_ids
+        self.live = live
+        self.high_water = high_water
+        self.gender_codes, self.breed_codes, self.acquisition_codes, self.loss_codes = codes or (
+            list(GENDERS), list(BREEDS), list(ACQUISITION_METHODS), list(LOSS_METHODS))
+        self.live_count = sum(live)
+
+    @classmethod
+    def load(cls, rows):
+        """
+        Builds the columns from (SNAPSHOT_FIELDS) rows of cattle that are not deleted, ordered by ID.
+        """
+        columns = cls.empty()
+        for row in rows:
+            columns.append(row)
+        columns.live_count = len(columns.ids)
+        return columns
+
+    @classmethod
+    def empty(cls):
+        return cls(array('q'), array('h'), array('h'), array('i'), array('i'), array('i'), array('h'), array('h'),
+                   array('q'), array('b'), None)
+
+    def copy(self):
+        """
+        Returns a copy whose arrays can be changed without affecting readers of this instance.
+        """
+        return SnapshotColumns(*(array(column.typecode, column) for column in (
+            self.ids, self.genders, self.breeds, self.birth_dates, self.entry_dates, self.end_dates,
+            self.acquisition_methods, self.loss_methods, self.herd_ids, self.live)), self.high_water,
+            tuple(list(codes) for codes in (self.gender_codes, self.breed_codes, self.acquisition_codes,
+                                            self.loss_codes)))
+
+    def append(self, row):
+        """
+        Appends a (SNAPSHOT_FIELDS) row.
+        """
+        self.ids.append(row[0])
+        self.genders.append(0)
+        self.breeds.append(0)
+        for column in (self.birth_dates, self.entry_dates, self.end_dates, self.acquisition_methods,
+                       self.loss_methods, self.herd_ids, self.live):
+            column.append(0)
+        self.set(len(self.ids) - 1, row)
+
+    def set(self, position, row):
+        """
+        Overwrites the row at a position with a (SNAPSHOT_FIELDS) row and raises the high-water mark.
+        """
+        _, gender, breed, birth_date, entry_date, end_date, acquisition_method, loss_method, herd_id, deleted, \
+            updated_at = row
+        self.genders[position] = encode(self.gender_codes, gender)
+        self.breeds[position] = encode(self.breed_codes, breed)
+        self.birth_dates[position] = birth_date.toordinal() if birth_date else 0
+        self.entry_dates[position] = entry_date.toordinal() if entry_date else 0
+        self.end_dates[position] = end_date.toordinal() if end_date else 0
+        self.acquisition_methods[position] = encode(self.acquisition_codes, acquisition_method)
+        self.loss_methods[position] = encode(self.loss_codes, loss_method)
+        self.herd_ids[position] = herd_id or 0
+        self.live[position] = 0 if deleted else 1
+        if self.high_water is None or updated_at > self.high_water:
+            self.high_water = updated_at
+
+    def position(self, cattle_id):
+        """
+        Returns the position of a cattle ID in the ID-ordered rows, or None.
+        """
+        position = bisect_left(self.ids, cattle_id)
+        return position if position < len(self.ids) and self.ids[position] == cattle_id else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def age_groups(self, reference_date):
+        """
+        Classifies every row into the age groups of GroupsManagement on the reference date.
+
+        :param reference_date: The reference date.
+        :return: An array with the index into AGE_GROUPS of every row, -1 for rows in no group or not live.
+        """
+        reference = reference_date.toordinal()
+        young, adult = latest_birth_ordinal(reference_date, 12), latest_birth_ordinal(reference_date, 24)
+        groups = array('b', bytes(len(self.ids)))
+        for position, (live, gender, birth, entry) in enumerate(zip(self.live, self.genders, self.birth_dates,
+                                                                     self.entry_dates)):
+            group = -1
+            if live and entry and entry < reference:
+                if gender == COW:
+                    group = COWS
+                elif birth and birth <= reference and gender in (HEIFER, BULL):
+                    if birth > young:
+                        group = CALVES
+                    elif birth > adult:
+                        group = YOUNG_HEIFER if gender == HEIFER else YOUNG_BULL
+                    else:
+                        group = ADULT_HEIFER if gender == HEIFER else ADULT_BULL
+            groups[position] = group
+        return groups
+
+    def group_ids(self, reference_date, on_farm_only=True):
+        """
+        Returns the IDs of the cattle in every age group on the reference date.
+
+        :param reference_date: The reference date.
+        :param on_farm_only: If True, leaves out the cattle with an end date.
+        :return: A dictionary of age group names to lists of IDs, in ID order.
+        """
+        members = {group: [] for group in AGE_GROUPS}
+        for position, group in enumerate(self.age_groups(reference_date)):
+            if group >= 0 and not (on_farm_only and self.end_dates[position]):
+                members[AGE_GROUPS[group]].append(self.ids[position])
+        return members
+
+    def record(self, position):
+        """
+        Returns the row at a position as a dictionary of SNAPSHOT_FIELDS values, with dates and choices decoded, for
+        code that works on cattle dictionaries.
+        """
+        return {
+            'id': self.ids[position],
+            'gender': decode(self.gender_codes, self.genders[position]),
+            'breed': decode(self.breed_codes, self.breeds[position]),
+            'birth_date': decode_date(self.birth_dates[position]),
+            'entry_date': decode_date(self.entry_dates[position]),
+            'end_date': decode_date(self.end_dates[position]),
+            'acquisition_method': decode(self.acquisition_codes, self.acquisition_methods[position]),
+            'loss_method': decode(self.loss_codes, self.loss_methods[position]),
+            'herd_id': self.herd_ids[position] or None,
+        }
+
+    def group_records(self, reference_date):
+        """
+        Returns the cattle in every age group on the reference date as dictionaries, see record, in the format of
+        the group data the GroupNumbers, AcquisitionLossCalculator and MovementCalculator classes work on.
+        """
+        members = {group: [] for group in AGE_GROUPS}
+        for position, group in enumerate(self.age_groups(reference_date)):
+            if group >= 0:
+                members[AGE_GROUPS[group]].append(self.record(position))
+        return members
+
+
+class CattleSnapshot:
+    """
+    A process-wide columnar snapshot of the cattle that are not deleted, shared by the group and report calculations
+    instead of loading the cattle for every calculation.
+
+    current() checks the global data version, which every change to the cattle increments, and brings the snapshot up
+    to date when it changed by loading only the cattle updated since the newest 'updated_at' it has seen. Every write
+    sets 'updated_at': saves through auto_now, queryset updates through CattleQuerySet.update and the deletion of a
+    herd, which clears the herd of its cattle, through a pre_delete signal. Refreshes
+    build new columns and replace them at once, so readers keep a consistent copy without locking. The snapshot is
+    reloaded when an incremental refresh would change or leave dead too many rows, or when its number of cattle no
+    longer matches the table, e.g. after rows were deleted with a queryset.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def current(self, version=None):
+        """
+        Returns the columns, refreshing them first if the data changed since they were loaded.
+
+        :param version: The global data version, if the caller already read it, e.g. for an ETag.
+        :return: The current SnapshotColumns.
+        """
+        if version is None:
+            version, _ = DataVersion.current()
+        if self.columns is not None and version == self.version:
+            return self.columns
+
+        with self.lock:
+            if self.columns is None or version != self.version:
+                columns = self.refreshed(self.columns) if self.columns is not None else None
+                self.columns = columns or self.reload()
+                # The version was read before the rows, so changes made meanwhile are loaded by the next refresh.
+                self.version = version
+        return self.columns
+
+    def reload(self):
+        """
+        Loads the columns of all cattle that are not deleted.
+        """
+        return SnapshotColumns.load(Cattle.objects.order_by('id').values_list(*SNAPSHOT_FIELDS).iterator(
+            chunk_size=5000))
+
+    def refreshed(self, columns):
+        """
+        Returns a copy of the columns with the cattle updated since their high-water mark applied, or None if the
+        snapshot must be reloaded instead.
+        """
+        changed = Cattle.all_objects.order_by('id').values_list(*SNAPSHOT_FIELDS)
+        if columns.high_water is not None:
+            changed = changed.filter(updated_at__gte=columns.high_water - REFRESH_OVERLAP)
+        changed = list(changed[:int(len(columns) * RELOAD_SHARE) + 1])
+        if len(changed) > len(columns) * RELOAD_SHARE:
+            return None
+
+        columns = columns.copy()
+        for row in changed:
+            position = columns.position(row[0])
+            if position is not None:
+                columns.set(position, row)
+            elif row[SNAPSHOT_FIELDS.index('deleted')]:
+                continue
+            elif not columns.ids or row[0] > columns.ids[-1]:
+                columns.append(row)
+            else:
+                return None
+
+        columns.live_count = sum(columns.live)
+        dead = len(columns) - columns.live_count
+        if dead > len(columns) * RELOAD_SHARE or columns.live_count != Cattle.objects.count():
+            return None
+        return columns
+
+
+cattle_snapshot = CattleSnapshot()
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from .compression import brotli, brotli_compress, gzip_compress_static
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage that content-hashes filenames and writes Brotli ('.br') and gzip ('.gz') siblings of every
+    hashed file during collectstatic.
+
+    A sibling is only kept when it is at least STATIC_COMPRESSION_MIN_SAVING smaller than the original, so already
+    compressed formats such as PNG are served as they are. Because hashed names change with their content, the web
+    server can serve them, and their precompressed siblings, with an immutable Cache-Control header.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        """
+        Hashes the collected files like ManifestStaticFilesStorage, then writes the compressed siblings of the hashed
+        files.
+        """
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for hashed_name in dict.fromkeys(hashed_names):
+            for compressed_name in self.compress(hashed_name):
+                yield hashed_name, compressed_name, True
+
+    def compress(self, name):
+        """
+        Writes the compressed siblings of a stored file.
+
+        :param name: The stored file name.
+        :return: The names of the written siblings.
+        """
+        with self.open(name) as original:
+            data = original.read()
+
+        encoders = [('gz', gzip_compress_static)]
+        if brotli is not None:
+            encoders.append(('br', lambda content: brotli_compress(content, quality=11)))
+
+        written = []
+        for extension, encode in encoders:
+            compressed = encode(data)
+            compressed_name = f'{name}.{extension}'
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            if len(compressed) <= len(data) * (1 - settings.STATIC_COMPRESSION_MIN_SAVING):
+                self._save(compressed_name, ContentFile(compressed))
+                written.append(compressed_name)
+        return written
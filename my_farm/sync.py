@@ -0,0 +1,362 @@
+import json
+import zlib
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from .changelog import batched_changes, column_value, tracked_fields
+from .models import Cattle, ChangeLogEntry, Field, Herd, SyncRef
+
+# The synced models, in the order a device applies them so that the foreign keys of each row resolve.
+SYNC_MODELS = {'Field': Field, 'Herd': Herd, 'Cattle': Cattle}
+
+# Columns that devices read but never write: files are uploaded through the picture views.
+READ_ONLY_COLUMNS = {'deleted', 'picture'}
+
+# The longest ref a device can give a created row, see my_farm.models.SyncRef.
+REF_MAX_LENGTH = 64
+
+# Rows per chunk of a streamed sync response, so compression works on whole batches of lines.
+CHUNK_ROWS = 500
+
+EDIT_ACTIONS = (ChangeLogEntry.CREATE, ChangeLogEntry.UPDATE, ChangeLogEntry.DELETE)
+
+
+class SyncRejected(Exception):
+    """
+    Raised when an upload cannot be applied. The upload is rolled back as a whole.
+
+    :param status: The HTTP status to answer with, 400 for invalid edits or 409 for conflicts.
+    :param errors: A list of dictionaries describing the rejected edits, each with the 'index' of the edit.
+    """
+
+    def __init__(self, status, errors):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+def latest_token():
+    """
+    Returns the current change token, the ID of the newest change log entry, 0 if there is none.
+
+    The IDs follow the commit order, see my_farm.models.ChangeLogSequence, so no entry below the token can still
+    commit.
+    """
+    return ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def encode_line(data):
+    """
+    Encodes a dictionary as a compact NDJSON line.
+    """
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+def chunked(lines, size=CHUNK_ROWS):
+    """
+    Joins an iterable of lines into byte chunks of up to size lines.
+    """
+    lines = iter(lines)
+    while chunk := ''.join(islice(lines, size)):
+        yield chunk.encode()
+
+
+def row_records(model, queryset):
+    """
+    Yields the rows of a queryset as {"model", "id", "data"} records, or {"model", "id", "deleted"} for soft-deleted
+    cattle. The data holds the logged columns by attname and 'updated_at'.
+    """
+    fields = tracked_fields(model)
+    rows = queryset.order_by('pk').values('pk', 'updated_at', *(field.attname for field in fields))
+    for row in rows.iterator(chunk_size=2000):
+        if row.get('deleted'):
+            yield {'model': model.__name__, 'id': row['pk'], 'deleted': True}
+            continue
+        data = {field.attname: column_value(field, row[field.attname]) for field in fields}
+        data['updated_at'] = row['updated_at']
+        yield {'model': model.__name__, 'id': row['pk'], 'data': data}
+
+
+def full_sync(token, csrf_token):
+    """
+    Returns the NDJSON lines of a full download: a header with the change token followed by every live row.
+
+    :param token: The change token read before the rows, so that changes made while streaming are sent again by the
+        next delta sync.
+    :param csrf_token: The CSRF token the device sends with its next upload, passed on in the header.
+    :return: An iterator of lines.
+    """
+    yield encode_line({'token': token, 'full': True, 'has_more': False, 'csrf_token': csrf_token})
+    for model in SYNC_MODELS.values():
+        for record in row_records(model, model.objects.all()):
+            yield encode_line(record)
+
+
+def delta_sync(since, limit, csrf_token):
+    """
+    Returns the NDJSON lines of a delta download: a header with the new change token followed by the current state of
+    every row created, updated or deleted after the given token.
+
+    As the change log IDs follow the commit order, the new token never passes an entry that has not committed yet and a
+    device sees every change.
+
+    The change log is read with a range scan of its primary key and every changed model is then loaded with one query,
+    so the cost depends on the number of changes and not on the size of the farm. A row changed several times is sent
+    once. Rows that no longer exist are sent as {"model", "id", "deleted": true}.
+
+    :param since: The change token the device synced last.
+    :param limit: The maximum number of change log entries to read. The header has 'has_more' set when the device
+        must sync again to catch up.
+    :param csrf_token: The CSRF token the device sends with its next upload, passed on in the header.
+    :return: An iterator of lines.
+    """
+    changes = list(ChangeLogEntry.objects.filter(id__gt=since, model__in=SYNC_MODELS).order_by('id').values_list(
+        'id', 'model', 'object_id')[:limit])
+    token = changes[-1][0] if changes else since
+    changed = {}
+    for _, model_name, object_id in changes:
+        changed.setdefault(model_name, set()).add(object_id)
+
+    yield encode_line({'token': token, 'full': False, 'has_more': len(changes) == limit, 'csrf_token': csrf_token})
+    for model_name, model in SYNC_MODELS.items():
+        object_ids = changed.get(model_name)
+        if not object_ids:
+            continue
+        found = set()
+        for record in row_records(model, model._base_manager.filter(pk__in=object_ids)):
+            found.add(record['id'])
+            yield encode_line(record)
+        for object_id in sorted(object_ids - found):
+            yield encode_line({'model': model_name, 'id': object_id, 'deleted': True})
+
+
+def read_upload(body, content_encoding, max_size):
+    """
+    Decodes an upload of NDJSON edits, optionally gzip-compressed.
+
+    :param body: The request body.
+    :param content_encoding: The Content-Encoding header of the request.
+    :param max_size: The maximum decompressed size in bytes.
+    :return: A list of edits.
+    :raises SyncRejected: If the body is not valid gzip or NDJSON, or decompresses to more than max_size bytes.
+    """
+    if content_encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_size)
+        except zlib.error:
+            raise SyncRejected(400, [{'index': None, 'errors': 'The body is not valid gzip.'}])
+        if decompressor.unconsumed_tail:
+            raise SyncRejected(400, [{'index': None, 'errors': f'The upload is larger than {max_size} bytes.'}])
+
+    edits = []
+    for index, line in enumerate(body.splitlines()):
+        if not line.strip():
+            continue
+        try:
+            edit = json.loads(line)
+        except ValueError:
+            raise SyncRejected(400, [{'index': len(edits), 'errors': f'Line {index + 1} is not valid JSON.'}])
+        edits.append(edit)
+    return edits
+
+
+def check_edit(index, edit):
+    """
+    Checks the shape of an edit.
+
+    :param index: The position of the edit in the upload.
+    :param edit: A dictionary with the 'model', 'action', 'token' the device synced before making the edit, the 'id'
+        of the row for updates and deletes, the 'data' of creates and updates and an optional 'ref'.
+    :raises SyncRejected: If the edit is malformed or writes read-only or unknown columns.
+    """
+    def reject(message):
+        raise SyncRejected(400, [{'index': index, 'errors': message}])
+
+    if not isinstance(edit, dict) or edit.get('model') not in SYNC_MODELS:
+        reject(f'The model must be one of {", ".join(SYNC_MODELS)}.')
+    if edit.get('action') not in EDIT_ACTIONS:
+        reject(f'The action must be one of {", ".join(EDIT_ACTIONS)}.')
+    if edit['action'] != ChangeLogEntry.CREATE and not (isinstance(edit.get('id'), int)
+                                                        and isinstance(edit.get('token'), int)):
+        reject('Updates and deletes need the id of the row and the change token the device synced before the edit.')
+    ref = edit.get('ref')
+    if ref is not None and not (isinstance(ref, str) and 0 < len(ref) <= REF_MAX_LENGTH):
+        reject(f'The ref must be a string of 1 to {REF_MAX_LENGTH} characters.')
+    data = edit.setdefault('data', {})
+    if not isinstance(data, dict):
+        reject('The data must be an object.')
+    writable = {field.attname: field for field in tracked_fields(SYNC_MODELS[edit['model']])
+                if field.attname not in READ_ONLY_COLUMNS}
+    unknown = sorted(set(data) - set(writable))
+    if unknown:
+        reject(f'Unknown or read-only columns: {", ".join(unknown)}.')
+    for attname, value in data.items():
+        if isinstance(value, dict) and not (writable[attname].is_relation and set(value) == {'ref'}
+                                            and isinstance(value['ref'], str)):
+            reject(f'{attname} must be a value or, for foreign keys, {{"ref": ...}} naming a created row.')
+
+
+def find_conflicts(edits, instances):
+    """
+    Finds the edits that overwrite changes made on the server after the device synced.
+
+    An update conflicts with a later change to one of its columns, unless the server already has the value the edit
+    writes, e.g. when a device uploads the same edits again after losing the response. A delete conflicts with any
+    later change. Updates of rows that no longer exist always conflict, while deleting them again does not. The later
+    changes are read with one query.
+
+    :param edits: The checked edits.
+    :param instances: The edited rows, keyed by (model name, id).
+    :return: A list of conflicts, each with the 'index', 'model' and 'id' of the edit and the conflicting 'columns'.
+    """
+    targets = [edit for edit in edits if edit['action'] != ChangeLogEntry.CREATE]
+    if not targets:
+        return []
+
+    later = {}
+    entries = ChangeLogEntry.objects.filter(
+        id__gt=min(edit['token'] for edit in targets),
+        model__in={edit['model'] for edit in targets},
+        object_id__in={edit['id'] for edit in targets},
+    ).values_list('id', 'model', 'object_id', 'changes')
+    for entry_id, model_name, object_id, changes in entries:
+        later.setdefault((model_name, object_id), []).append((entry_id, changes))
+
+    conflicts = []
+    for index, edit in enumerate(edits):
+        if edit['action'] == ChangeLogEntry.CREATE:
+            continue
+        key = (edit['model'], edit['id'])
+        instance = instances.get(key)
+        if is_deleted(instance):
+            if edit['action'] != ChangeLogEntry.DELETE:
+                conflicts.append({'index': index, 'model': edit['model'], 'id': edit['id'], 'columns': ['deleted']})
+            continue
+
+        changed = {column for entry_id, changes in later.get(key, ()) if entry_id > edit['token'] for column in changes}
+        if edit['action'] == ChangeLogEntry.UPDATE:
+            changed = {column for column in changed & set(edit['data'])
+                       if not writes_current_value(instance, column, edit['data'][column])}
+        if changed:
+            conflicts.append({'index': index, 'model': edit['model'], 'id': edit['id'], 'columns': sorted(changed)})
+    return conflicts
+
+
+def writes_current_value(instance, attname, value):
+    """
+    Returns True if the value an edit writes to a column equals the value of the instance.
+    """
+    field = next(field for field in tracked_fields(type(instance)) if field.attname == attname)
+    try:
+        return field.to_python(value) == getattr(instance, attname)
+    except ValidationError:
+        return False
+
+
+def is_deleted(instance):
+    """
+    Returns True if an edited row no longer exists or, for cattle, was soft-deleted.
+    """
+    return instance is None or getattr(instance, 'deleted', False)
+
+
+def resolve_refs(index, edit, created):
+    """
+    Replaces the {"ref": ...} foreign key values of an edit with the IDs of the rows created under those refs.
+
+    :param index: The position of the edit in the upload.
+    :param edit: The checked edit.
+    :param created: The IDs of the created rows by ref, from earlier uploads and the earlier edits of this one.
+    :raises SyncRejected: If a ref names no created row.
+    """
+    for attname, value in edit['data'].items():
+        if isinstance(value, dict):
+            if value['ref'] not in created:
+                message = f'{attname} names the unknown ref {value["ref"]!r}.'
+                raise SyncRejected(400, [{'index': index, 'errors': message}])
+            edit['data'][attname] = created[value['ref']]
+
+
+def apply_edit(index, edit, instance):
+    """
+    Applies one edit with the model validation and signals of a form save, which also record herd changes of cattle.
+
+    :return: The primary key of the saved or deleted row.
+    :raises SyncRejected: If the edited row does not validate.
+    """
+    if edit['action'] == ChangeLogEntry.DELETE:
+        if is_deleted(instance):
+            return edit['id']
+        pk = instance.pk
+        instance.delete()
+        return pk
+
+    if instance is None:
+        instance = SYNC_MODELS[edit['model']]()
+    for attname, value in edit['data'].items():
+        setattr(instance, attname, value)
+    try:
+        instance.full_clean()
+    except ValidationError as exc:
+        raise SyncRejected(400, [{'index': index, 'errors': exc.message_dict}])
+    instance.save()
+    return instance.pk
+
+
+def apply_upload(edits):
+    """
+    Applies a batch of offline edits in one transaction: either every edit is applied or none.
+
+    Creates with a 'ref' the server has seen before are not applied again, so a device can safely upload a batch again
+    when it lost the response, and foreign keys given as {"ref": ...} point at the rows created under those refs.
+
+    :param edits: The decoded edits, see check_edit.
+    :return: A list with the 'model', 'id' and the device's 'ref' of every applied edit, in upload order.
+    :raises SyncRejected: With status 409 and the conflicts if an edit overwrites a later change on the server, or
+        with status 400 if an edit is malformed, reuses a ref or does not validate.
+    """
+    for index, edit in enumerate(edits):
+        check_edit(index, edit)
+
+    with transaction.atomic(), batched_changes():
+        object_ids = {}
+        for edit in edits:
+            if edit['action'] != ChangeLogEntry.CREATE:
+                object_ids.setdefault(edit['model'], set()).add(edit['id'])
+        instances = {
+            (model_name, pk): instance
+            for model_name, pks in object_ids.items()
+            for pk, instance in SYNC_MODELS[model_name]._base_manager.select_for_update().in_bulk(pks).items()
+        }
+
+        conflicts = find_conflicts(edits, instances)
+        if conflicts:
+            raise SyncRejected(409, conflicts)
+
+        refs = {edit['ref'] for edit in edits if edit.get('ref')}
+        refs.update(value['ref'] for edit in edits for value in edit['data'].values() if isinstance(value, dict))
+        known_refs = {sync_ref.ref: sync_ref for sync_ref in SyncRef.objects.filter(ref__in=refs)}
+        created = {ref: sync_ref.object_id for ref, sync_ref in known_refs.items()}
+
+        applied = []
+        new_refs = []
+        for index, edit in enumerate(edits):
+            ref = edit.get('ref')
+            if edit['action'] == ChangeLogEntry.CREATE and ref in known_refs:
+                if known_refs[ref].model != edit['model']:
+                    message = f'The ref {ref!r} names a {known_refs[ref].model}.'
+                    raise SyncRejected(400, [{'index': index, 'errors': message}])
+                pk = known_refs[ref].object_id
+            elif edit['action'] == ChangeLogEntry.CREATE and ref in created:
+                raise SyncRejected(400, [{'index': index, 'errors': f'The ref {ref!r} is used by an earlier edit.'}])
+            else:
+                resolve_refs(index, edit, created)
+                pk = apply_edit(index, edit, instances.get((edit['model'], edit.get('id'))))
+                if edit['action'] == ChangeLogEntry.CREATE and ref:
+                    created[ref] = pk
+                    new_refs.append(SyncRef(ref=ref, model=edit['model'], object_id=pk))
+            applied.append({'model': edit['model'], 'id': pk, 'ref': ref})
+        SyncRef.objects.bulk_create(new_refs)
+    return applied
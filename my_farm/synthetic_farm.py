@@ -0,0 +1,132 @@
+import random
+from datetime import date, timedelta
+from .counters import reconcile_herd_counts, reconcile_field_counts
+from .memberships import open_missing_memberships
+from .models import Cattle, Herd, Field
+from .signals import notify_model_changed
+
+BATCH_SIZE = 5000
+
+FIELD_TYPES = ['Pasture', 'Meadow', 'Hay field', 'Paddock']
+LOCATIONS = ['North', 'South', 'East', 'West', 'River side', 'Hill']
+ACQUISITION_WEIGHTS = {'Birth': 80, 'Purchase': 17, 'Gift': 3}
+LOSS_WEIGHTS = {'Sold': 70, 'Death': 15, 'Consumed': 12, 'Gifted': 3}
+
+
+def generate_farm(cattle_count, herd_count, field_count, years, loss_rate=0.25, seed=None, today=None):
+    """
+    Generates a synthetic farm with fields, herds and cattle born, bought and lost over the given number of years.
+
+    Cows are adult females that entered the farm before the simulated period, calves are born to the herd over the
+    period, and a share of all animals leave the farm through one of the loss methods.
+
+    :param cattle_count: The number of cattle to create.
+    :param herd_count: The number of herds to create.
+    :param field_count: The number of fields to create.
+    :param years: The number of years of history to simulate.
+    :param loss_rate: The share of cattle that have left the farm by today.
+    :param seed: The random seed, for reproducible farms.
+    :param today: The last day of the simulated period, defaults to today.
+    :return: A tuple with the number of created fields, herds and cattle.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    period_start = today - timedelta(days=365 * years)
+    period_days = (today - period_start).days
+
+    fields = Field.objects.bulk_create([
+        Field(
+            name=f'Field {i + 1}',
+            location=rng.choice(LOCATIONS),
+            coordinates=f'{rng.uniform(53.9, 56.4):.5f}, {rng.uniform(21.0, 26.8):.5f}',
+            field_size=round(rng.uniform(2, 120), 1),
+            size_unit=rng.choice(['ha', 'ha', 'ac']),
+            field_type=rng.choice(FIELD_TYPES),
+        )
+        for i in range(field_count)
+    ])
+
+    herds = Herd.objects.bulk_create([
+        Herd(
+            name=f'Herd {i + 1}',
+            location=rng.choice(LOCATIONS),
+            field=rng.choice(fields) if fields else None,
+            start_date=period_start + timedelta(days=rng.randrange(max(period_days // 4, 1))),
+        )
+        for i in range(herd_count)
+    ])
+
+    number_offset = Cattle.all_objects.count()
+    created = 0
+    while created < cattle_count:
+        batch_size = min(BATCH_SIZE, cattle_count - created)
+        batch = [
+            build_cattle(rng, number_offset + created + i, herds, period_start, period_days, today, loss_rate)
+            for i in range(batch_size)
+        ]
+        Cattle.objects.bulk_create(batch)
+        created += batch_size
+
+    leaders = []
+    for herd in herds:
+        herd.herd_leader = Cattle.objects.active().filter(herd=herd, gender='Cow').first()
+        if herd.herd_leader:
+            leaders.append(herd)
+    Herd.objects.bulk_update(leaders, ['herd_leader'], batch_size=BATCH_SIZE)
+
+    # bulk_create does not send signals, so the denormalized counters and herd memberships are filled in afterwards.
+    reconcile_herd_counts()
+    reconcile_field_counts()
+    open_missing_memberships()
+    for model in (Field, Herd, Cattle):
+        notify_model_changed(model)
+
+    return len(fields), len(herds), created
+
+
+def build_cattle(rng, index, herds, period_start, period_days, today, loss_rate):
+    """
+    Builds a single unsaved Cattle instance with realistic dates for the simulated period.
+
+    :param rng: The random number generator.
+    :param index: The sequential index used for the cattle number.
+    :param herds: The herds to allocate the cattle to.
+    :param period_start: The first day of the simulated period.
+    :param period_days: The length of the simulated period in days.
+    :param today: The last day of the simulated period.
+    :param loss_rate: The share of cattle that have left the farm by today.
+    :return: An unsaved Cattle instance.
+    """
+    if rng.random() < 0.3:
+        gender = 'Cow'
+        birth_date = period_start - timedelta(days=rng.randrange(2 * 365, 10 * 365))
+        acquisition_method = rng.choices(['Purchase', 'Gift'], weights=[85, 15])[0]
+        entry_date = period_start - timedelta(days=rng.randrange(1, 365))
+    else:
+        gender = rng.choice(['Heifer', 'Bull'])
+        acquisition_method = rng.choices(list(ACQUISITION_WEIGHTS), weights=list(ACQUISITION_WEIGHTS.values()))[0]
+        birth_date = period_start + timedelta(days=rng.randrange(period_days))
+        if acquisition_method == 'Birth':
+            entry_date = birth_date
+        else:
+            entry_date = min(birth_date + timedelta(days=rng.randrange(30, 400)), today)
+
+    loss_method = None
+    end_date = None
+    if rng.random() < loss_rate and entry_date < today:
+        loss_method = rng.choices(list(LOSS_WEIGHTS), weights=list(LOSS_WEIGHTS.values()))[0]
+        end_date = entry_date + timedelta(days=rng.randrange(1, (today - entry_date).days + 1))
+
+    return Cattle(
+        number=f'LT{index + 1:08d}',
+        name=f'{gender} {index + 1}',
+        gender=gender,
+        breed=rng.choice(['Angus', 'Crossbreed']),
+        birth_date=birth_date,
+        acquisition_method=acquisition_method,
+        entry_date=entry_date,
+        herd=rng.choice(herds) if herds else None,
+        loss_method=loss_method,
+        end_date=end_date,
+        comments='',
+    )
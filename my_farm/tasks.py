@@ -0,0 +1,49 @@
+from django.db import transaction
+from .counters import reconcile_herd_counts, reconcile_field_counts
+from .jobs import register_job
+from .memberships import open_missing_memberships
+from .models import Herd, Field
+from .projection import census_projection
+from .signals import notify_model_changed
+
+
+@register_job('reconcile_counters')
+def reconcile_counters(job):
+    """
+    Corrects the herd and field counters that drifted from the actual rows, like the reconcile_counters command.
+
+    :return: The number of corrected herd and field counters.
+    """
+    with transaction.atomic():
+        herds = reconcile_herd_counts()
+        if herds:
+            notify_model_changed(Herd)
+    # The progress is reported between the transactions, so it is visible at once and does not hold the write lock.
+    job.report_progress(50, 'Herd counters reconciled')
+    with transaction.atomic():
+        fields = reconcile_field_counts()
+        if fields:
+            notify_model_changed(Field)
+    return {'herds': len(herds), 'fields': len(fields)}
+
+
+@register_job('backfill_memberships')
+def backfill_memberships(job):
+    """
+    Opens the missing herd memberships of cattle created without signals, e.g. by bulk imports.
+
+    :return: The number of created memberships.
+    """
+    return {'memberships': open_missing_memberships()}
+
+
+@register_job('census_projection')
+def project_census(job, months=12, apply_rates=False):
+    """
+    Calculates a census projection into the 'projections' cache, so the projection page is served from the cache.
+
+    :param months: The number of months to project.
+    :param apply_rates: Whether to apply the historical birth and loss rates.
+    :return: The projected total number of cattle of every month.
+    """
+    return {'totals': census_projection(months, apply_rates).totals}
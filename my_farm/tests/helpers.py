@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..cache import clear_cached_data
+from ..models import Cattle, Field, Herd
+from ..snapshot import cattle_snapshot
+
+# Process-local caches, so the tests neither read nor fill the cache directory of the site.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'template_fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests_fragments'},
+}
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def create_farm(name, herd_count, cattle_per_herd):
+    """
+    Creates a field with herds of cattle, each herd led by its first cattle.
+
+    :param name: The name of the field, also used as the prefix of the herd names and cattle numbers.
+    :param herd_count: The number of herds.
+    :param cattle_per_herd: The number of cattle in every herd.
+    :return: The field and the list of herds.
+    """
+    field = Field.objects.create(name=name, location='North', coordinates='1,1', field_size=10, size_unit='ha')
+    return field, create_herds(field, herd_count, cattle_per_herd)
+
+
+def create_herds(field, count, cattle_per_herd):
+    """
+    Adds herds of cattle to a field, named after the field and numbered on from its existing herds.
+
+    :return: The list of created herds.
+    """
+    start = Herd.objects.filter(field=field).count()
+    herds = []
+    for herd_number in range(start, start + count):
+        herd = Herd.objects.create(name=f'{field.name} herd {herd_number}', location='North', field=field,
+                                   start_date=date(2020, 1, 1))
+        create_cattle(herd, cattle_per_herd)
+        herds.append(herd)
+    return herds
+
+
+def create_cattle(herd, count):
+    """
+    Adds cattle to a herd, numbered on from its existing cattle. The first cattle of a herd becomes its leader.
+    """
+    start = Cattle.all_objects.filter(herd=herd).count()
+    for number in range(start, start + count):
+        day = date(2020, 1, 1) + timedelta(days=30 * number)
+        cattle = Cattle.objects.create(
+            number=f'{herd.pk}-{number}', name=f'Cattle {number}', gender=['Cow', 'Heifer', 'Bull'][number % 3],
+            breed='Angus', birth_date=day, entry_date=day, acquisition_method='Birth', herd=herd)
+        if herd.herd_leader_id is None:
+            herd.herd_leader = cattle
+            herd.save()
+
+
+def clear_caches():
+    """
+    Drops the cached data of the app and the cattle snapshot, which otherwise outlive the rolled back test data. The
+    sessions in the default cache are kept, as the query budgets expect them to be read from the cache.
+    """
+    clear_cached_data()
+    cattle_snapshot.columns = None
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+class ViewTestCase(TestCase):
+    """
+    A test case whose client is logged in and whose requests start with empty caches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('farmer', 'farmer@example.com', 'password')
+
+    def setUp(self):
+        caches['default'].clear()
+        clear_caches()
+        self.client.force_login(self.user)
+
+    def get(self, url_name, *args, **params):
+        """
+        Requests a page of the app and reads the whole response, including streamed ones.
+
+        :return: The response.
+        """
+        response = self.client.get(reverse(f'my_farm:{url_name}', args=args), params)
+        self.assertEqual(response.status_code, 200, url_name)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
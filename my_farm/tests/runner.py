@@ -0,0 +1,22 @@
+import shutil
+import tempfile
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with METRICS_DIR pointed at a temporary directory that is removed afterwards, so the metrics
+    recorded by the tests are neither written to the metrics directory of the site nor scraped with its metrics.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_dir = tempfile.mkdtemp(prefix='my_farm-metrics-')
+        self.metrics_settings = override_settings(METRICS_DIR=self.metrics_dir)
+        self.metrics_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.metrics_settings.disable()
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,99 @@
+from datetime import date
+from unittest import mock
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..admin import ESTIMATED_COUNT_THRESHOLD, EstimatedCountPaginator
+from ..models import Cattle, HerdMembership
+from .helpers import TEST_CACHES, TEST_STORAGES, create_farm
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+class CattleAdminActionTests(TestCase):
+    """
+    Checks the bulk actions of the cattle changelist.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.field, (cls.herd, cls.other_herd) = create_farm('North', herd_count=2, cattle_per_herd=3)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def run_action(self, action, cattle, **data):
+        """
+        Posts a changelist action for the given cattle.
+
+        :return: The response.
+        """
+        return self.client.post(reverse('admin:my_farm_cattle_changelist'), {
+            'action': action, helpers.ACTION_CHECKBOX_NAME: [cattle.pk for cattle in cattle], **data})
+
+    def test_move_to_herd_asks_for_the_herd_first(self):
+        response = self.run_action('move_to_herd', self.herd.cattle_set.all())
+
+        self.assertContains(response, 'Move cattle to a herd')
+        self.assertEqual(response.context['selected'], [str(cattle.pk) for cattle in self.herd.cattle_set.all()])
+        self.assertEqual(self.herd.cattle_set.count(), 3)
+
+    def test_move_to_herd_moves_the_selected_cattle(self):
+        moved = list(self.herd.cattle_set.all()[:2])
+
+        response = self.run_action('move_to_herd', moved, apply='Move cattle', herd=self.other_herd.pk)
+
+        self.assertRedirects(response, reverse('admin:my_farm_cattle_changelist'), fetch_redirect_response=False)
+        for cattle in moved:
+            self.assertEqual(Cattle.objects.get(pk=cattle.pk).herd, self.other_herd)
+            self.assertTrue(HerdMembership.objects.filter(cattle=cattle, herd=self.other_herd,
+                                                          previous_herd=self.herd, valid_to=None).exists())
+        self.herd.refresh_from_db()
+        self.other_herd.refresh_from_db()
+        self.assertEqual((self.herd.active_cattle_count, self.other_herd.active_cattle_count), (1, 5))
+
+    def test_mark_sold_ends_the_cattle_still_on_the_farm(self):
+        died, sold = self.herd.cattle_set.all()[:2]
+        died.loss_method = 'Death'
+        died.end_date = date(2021, 1, 1)
+        died.save()
+
+        response = self.run_action('mark_sold', [died, sold])
+
+        self.assertEqual(response.status_code, 302)
+        died.refresh_from_db()
+        sold.refresh_from_db()
+        self.assertEqual((died.loss_method, died.end_date), ('Death', date(2021, 1, 1)))
+        self.assertEqual((sold.loss_method, sold.end_date), ('Sold', date.today()))
+        self.herd.refresh_from_db()
+        self.assertEqual(self.herd.active_cattle_count, 1)
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES)
+class EstimatedCountPaginatorTests(TestCase):
+    """
+    Checks when the changelist paginator uses the query planner's estimate instead of counting.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_farm('North', herd_count=1, cattle_per_herd=3)
+
+    def count(self, estimate):
+        with mock.patch('my_farm.admin.estimated_count', return_value=estimate):
+            return EstimatedCountPaginator(Cattle.objects.order_by('pk'), 100).count
+
+    def test_large_changelists_use_the_estimate(self):
+        self.assertEqual(self.count(ESTIMATED_COUNT_THRESHOLD), ESTIMATED_COUNT_THRESHOLD)
+
+    def test_small_changelists_and_databases_without_estimates_are_counted(self):
+        self.assertEqual(self.count(ESTIMATED_COUNT_THRESHOLD - 1), 3)
+        self.assertEqual(self.count(None), 3)
+
+    def test_the_changelist_shows_the_exact_count_without_an_estimate(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        response = self.client.get(reverse('admin:my_farm_cattle_changelist'))
+
+        self.assertEqual(response.context['cl'].result_count, 3)
@@ -0,0 +1,28 @@
+from django.test import TestCase
+from django.urls import reverse
+
+
+class ApiAccessTests(TestCase):
+    """
+    Checks that every JSON API sends anonymous clients to the login page.
+    """
+
+    def test_anonymous_requests_are_redirected_to_login(self):
+        urls = [
+            ('report_api', (), 'get'),
+            ('dashboard_api', (), 'get'),
+            ('changes_api', (), 'get'),
+            ('sync_api', (), 'get'),
+            ('sync_upload_api', (), 'post'),
+            ('projection_api', (), 'get'),
+            ('job_api', (1,), 'get'),
+            ('herd_composition_api', (1,), 'get'),
+            ('herd_transfers_api', (), 'get'),
+        ]
+        for url_name, args, method in urls:
+            with self.subTest(url_name):
+                url = reverse(f'my_farm:{url_name}', args=args)
+
+                response = getattr(self.client, method)(url)
+
+                self.assertRedirects(response, f'/login/?next={url}', fetch_redirect_response=False)
@@ -0,0 +1,148 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from ..changelog import attributed_changes, batched_changes, object_history, read_changes
+from ..middleware import ChangeLogMiddleware
+from ..models import ChangeLogEntry, ChangeLogSequence, Field
+
+
+def create_field(name):
+    return Field.objects.create(name=name, location='North', coordinates='1,1', field_size=10, size_unit='ha')
+
+
+class ChangeLogTests(TestCase):
+    """
+    Checks how change log entries are written, numbered and read.
+    """
+
+    def entries(self):
+        return list(ChangeLogEntry.objects.order_by('id').values_list('model', 'object_id', 'action'))
+
+    def test_read_changes_continues_after_the_cursor(self):
+        fields = [create_field(name) for name in ('North', 'South', 'East')]
+        fields[0].name = 'West'
+        fields[0].save()
+
+        first, cursor = read_changes(limit=2)
+        second, last_cursor = read_changes(cursor, limit=2)
+        rest, end = read_changes(last_cursor)
+
+        self.assertEqual([(entry.object_id, entry.action) for entry in first + second], [
+            (fields[0].pk, ChangeLogEntry.CREATE),
+            (fields[1].pk, ChangeLogEntry.CREATE),
+            (fields[2].pk, ChangeLogEntry.CREATE),
+            (fields[0].pk, ChangeLogEntry.UPDATE),
+        ])
+        self.assertEqual(first[1].changes['name'], 'South')
+        self.assertEqual(second[1].changes, {'name': ['North', 'West']})
+        self.assertEqual((cursor, last_cursor), (first[1].id, second[1].id))
+        self.assertEqual((rest, end), ([], last_cursor))
+
+    def test_read_changes_of_some_models(self):
+        create_field('North')
+
+        self.assertEqual(read_changes(models=['Cattle']), ([], 0))
+        self.assertEqual(len(read_changes(models=['Field'])[0]), 1)
+
+    def test_entries_are_numbered_by_the_sequence(self):
+        create_field('North')
+        with transaction.atomic():
+            create_field('South')
+            transaction.set_rollback(True)
+        create_field('East')
+
+        # The IDs of the rolled back entry are allocated again, so the log has no gaps.
+        ids = list(ChangeLogEntry.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(ids, [ids[0], ids[0] + 1])
+        self.assertEqual(ChangeLogSequence.objects.get().last_id, ids[-1])
+
+    def test_a_missing_sequence_is_created_after_the_last_entry(self):
+        create_field('North')
+        last_id = ChangeLogEntry.objects.get().id
+        ChangeLogSequence.objects.all().delete()
+
+        create_field('South')
+
+        self.assertEqual(ChangeLogEntry.objects.latest('id').id, last_id + 1)
+        self.assertEqual(ChangeLogSequence.objects.get().last_id, last_id + 1)
+
+    def test_batched_changes_are_written_at_the_end_of_the_block(self):
+        with transaction.atomic(), batched_changes():
+            north = create_field('North')
+            with batched_changes():
+                south = create_field('South')
+            # The inner block hands its entries to the outer one.
+            north.name = 'West'
+            north.save()
+            self.assertEqual(self.entries(), [])
+
+        self.assertEqual(self.entries(), [('Field', north.pk, ChangeLogEntry.CREATE),
+                                          ('Field', south.pk, ChangeLogEntry.CREATE),
+                                          ('Field', north.pk, ChangeLogEntry.UPDATE)])
+
+    def test_batched_changes_that_raise_are_dropped(self):
+        with transaction.atomic(), batched_changes():
+            north = create_field('North')
+            try:
+                with transaction.atomic(), batched_changes():
+                    create_field('South')
+                    raise ValueError
+            except ValueError:
+                pass
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic(), batched_changes():
+                create_field('East')
+                raise ValueError
+
+        self.assertEqual(self.entries(), [('Field', north.pk, ChangeLogEntry.CREATE)])
+
+    def test_object_history_is_newest_first_with_users(self):
+        user = User.objects.create_user('farmer')
+        north = create_field('North')
+        create_field('South')
+        with attributed_changes(lambda: user.pk):
+            north.name = 'West'
+            north.save()
+
+        history = list(object_history(Field, north.pk))
+
+        self.assertEqual([entry.action for entry in history], [ChangeLogEntry.UPDATE, ChangeLogEntry.CREATE])
+        self.assertEqual([entry.user for entry in history], [user, None])
+
+
+class ChangeLogMiddlewareTests(TestCase):
+    """
+    Checks that the change log entries of a request are written together and attributed to its user.
+    """
+
+    def handle(self, method, user):
+        """
+        Passes a request that creates two fields through the middleware.
+
+        :return: The number of change log entries that existed when the view returned.
+        """
+        logged_in_view = []
+
+        def view(request):
+            create_field('North')
+            create_field('South')
+            logged_in_view.append(ChangeLogEntry.objects.count())
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.user = user
+        ChangeLogMiddleware(view)(request)
+        return logged_in_view[0]
+
+    def test_entries_of_a_post_are_written_at_its_end(self):
+        user = User.objects.create_user('farmer')
+
+        self.assertEqual(self.handle('post', user), 0)
+
+        entries = ChangeLogEntry.objects.order_by('id')
+        self.assertEqual([entry.user_id for entry in entries], [user.pk, user.pk])
+
+    def test_entries_of_a_get_are_written_at_once(self):
+        self.assertEqual(self.handle('get', AnonymousUser()), 2)
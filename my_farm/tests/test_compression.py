@@ -0,0 +1,138 @@
+import gzip
+import os
+import tempfile
+from unittest import skipIf
+from django.core.files.base import ContentFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from ..compression import brotli
+from ..middleware import CompressionMiddleware
+from ..storage import CompressedManifestStaticFilesStorage
+
+BODY = b'<p>Cattle 1</p>' * 200
+
+CSS = b'.cattle { color: black; }\n' * 100
+
+requires_brotli = skipIf(brotli is None, 'brotli is not installed')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """
+    Checks which responses CompressionMiddleware compresses and that clients can decode them.
+    """
+
+    def compress(self, response, accept_encoding='br, gzip'):
+        """
+        Passes a response through the middleware for a request with the given Accept-Encoding header.
+        """
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_responses_below_the_minimum_size_are_not_compressed(self):
+        response = self.compress(HttpResponse(b'x' * 1023))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_responses_of_other_content_types_are_not_compressed(self):
+        response = self.compress(HttpResponse(BODY, content_type='image/png'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @requires_brotli
+    def test_brotli_is_preferred(self):
+        response = self.compress(HttpResponse(BODY))
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(brotli.decompress(response.content), BODY)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_gzip_is_used_when_brotli_is_not_accepted(self):
+        response = self.compress(HttpResponse(BODY), accept_encoding='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_unsupported_encodings_are_not_used(self):
+        response = self.compress(HttpResponse(BODY), accept_encoding='deflate')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, BODY)
+
+    def assert_length_is_randomised(self, accept_encoding):
+        lengths = {len(self.compress(HttpResponse(BODY), accept_encoding).content) for _ in range(10)}
+
+        self.assertGreater(len(lengths), 1)
+
+    def test_gzip_length_is_randomised(self):
+        self.assert_length_is_randomised('gzip')
+
+    @requires_brotli
+    def test_brotli_length_is_randomised(self):
+        self.assert_length_is_randomised('br')
+
+    def test_strong_etags_are_weakened(self):
+        response = HttpResponse(BODY)
+        response['ETag'] = '"abc"'
+
+        self.assertEqual(self.compress(response)['ETag'], 'W/"abc"')
+
+    def assert_streaming_response_is_compressed(self, accept_encoding, decompress):
+        response = self.compress(StreamingHttpResponse([b'a,b\n', b'c,d\n'], content_type='text/csv'), accept_encoding)
+
+        self.assertEqual(response['Content-Encoding'], accept_encoding)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(decompress(b''.join(response.streaming_content)), b'a,b\nc,d\n')
+
+    def test_streaming_gzip_responses_are_compressed_whatever_their_size(self):
+        self.assert_streaming_response_is_compressed('gzip', gzip.decompress)
+
+    @requires_brotli
+    def test_streaming_brotli_responses_are_compressed_whatever_their_size(self):
+        self.assert_streaming_response_is_compressed('br', brotli.decompress)
+
+
+@override_settings(STATIC_COMPRESSION_MIN_SAVING=0.05)
+class CompressedStaticFilesStorageTests(SimpleTestCase):
+    """
+    Checks the precompressed siblings that collectstatic writes next to the hashed static files.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = CompressedManifestStaticFilesStorage(location=directory.name)
+
+    def collect(self, name, content):
+        """
+        Stores a static file and post-processes it like collectstatic.
+
+        :return: The hashed name and the processed (name, hashed name, processed) tuples.
+        """
+        self.storage.save(name, ContentFile(content))
+        processed = list(self.storage.post_process({name: (self.storage, name)}))
+        return self.storage.stored_name(name), processed
+
+    def read(self, name):
+        with self.storage.open(name) as file:
+            return file.read()
+
+    def test_compressible_files_get_a_gzip_sibling(self):
+        hashed_name, processed = self.collect('app.css', CSS)
+
+        self.assertIn((hashed_name, f'{hashed_name}.gz', True), processed)
+        self.assertEqual(gzip.decompress(self.read(f'{hashed_name}.gz')), CSS)
+
+    @requires_brotli
+    def test_compressible_files_get_a_brotli_sibling(self):
+        hashed_name, processed = self.collect('app.css', CSS)
+
+        self.assertIn((hashed_name, f'{hashed_name}.br', True), processed)
+        self.assertEqual(brotli.decompress(self.read(f'{hashed_name}.br')), CSS)
+
+    def test_incompressible_files_get_no_siblings(self):
+        self.storage.save('image.png', ContentFile(os.urandom(2048)))
+
+        self.assertEqual(self.storage.compress('image.png'), [])
+        self.assertFalse(self.storage.exists('image.png.br'))
+        self.assertFalse(self.storage.exists('image.png.gz'))
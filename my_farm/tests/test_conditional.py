@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .helpers import ViewTestCase, create_farm
+
+REPORT_RANGE = {'start_date': '2020-01-01', 'end_date': '2021-12-31'}
+
+
+class ConditionalGetTests(ViewTestCase):
+    """
+    Checks that the views with an ETag answer repeated requests with 304 Not Modified until the data they show
+    changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.field, (cls.herd,) = create_farm('North', herd_count=1, cattle_per_herd=3)
+        cls.cattle = cls.herd.herd_leader
+
+    def conditional_views(self):
+        """
+        Returns the URL name, URL arguments and query parameters of every view with an ETag.
+        """
+        return [
+            ('cattle_detail', (self.cattle.pk,), {}),
+            ('herd_detail', (self.herd.pk,), {}),
+            ('field_detail', (self.field.pk,), {}),
+            ('group_data', ('Cows',), {}),
+            ('report', (), REPORT_RANGE),
+            ('report_api', (), REPORT_RANGE),
+            ('dashboard_api', (), {}),
+            ('projection', (), {}),
+            ('projection_api', (), {}),
+            ('herd_composition_api', (self.herd.pk,), {}),
+            ('herd_transfers_api', (), REPORT_RANGE),
+        ]
+
+    def revalidate(self, url_name, *args, etag, **params):
+        """
+        Requests a page with the ETag of an earlier response in If-None-Match.
+        """
+        return self.client.get(reverse(f'my_farm:{url_name}', args=args), params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_repeated_requests_are_not_modified(self):
+        for url_name, args, params in self.conditional_views():
+            with self.subTest(url_name):
+                etag = self.get(url_name, *args, **params)['ETag']
+
+                response = self.revalidate(url_name, *args, etag=etag, **params)
+
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_a_write_changes_the_etag(self):
+        etags = {url_name: self.get(url_name, *args, **params)['ETag']
+                 for url_name, args, params in self.conditional_views()}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cattle.name = 'Renamed'
+            self.cattle.save()
+
+        for url_name, args, params in self.conditional_views():
+            with self.subTest(url_name):
+                response = self.revalidate(url_name, *args, etag=etags[url_name], **params)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etags[url_name])
+
+    def test_another_user_gets_the_full_page(self):
+        etag = self.get('cattle_detail', self.cattle.pk)['ETag']
+        self.client.force_login(User.objects.create_user('other'))
+
+        response = self.revalidate('cattle_detail', self.cattle.pk, etag=etag)
+
+        self.assertEqual(response.status_code, 200)
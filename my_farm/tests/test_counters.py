@@ -0,0 +1,34 @@
+from datetime import date
+from django.test import TestCase
+from ..counters import reconcile_herd_counts
+from ..models import Herd
+from .helpers import create_farm, create_herds
+
+
+class HerdCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.field, (cls.herd,) = create_farm('North', herd_count=1, cattle_per_herd=3)
+        (cls.other_herd,) = create_herds(cls.field, 1, cattle_per_herd=1)
+        cls.cattle = cls.herd.herd_leader
+
+    def test_moves_and_losses_update_the_counters(self):
+        self.cattle.herd = self.other_herd
+        self.cattle.save()
+        second = self.herd.cattle_set.first()
+        second.loss_method = 'Sold'
+        second.end_date = date(2024, 1, 1)
+        second.save()
+
+        counts = dict(Herd.objects.values_list('id', 'active_cattle_count'))
+        self.assertEqual(counts, {self.herd.pk: 1, self.other_herd.pk: 2})
+        self.assertEqual(reconcile_herd_counts(dry_run=True), [])
+
+    def test_saves_that_keep_the_count_leave_the_herd_untouched(self):
+        updated_at = Herd.objects.get(pk=self.herd.pk).updated_at
+
+        self.cattle.name = 'Renamed'
+        self.cattle.save()
+
+        self.assertEqual(Herd.objects.get(pk=self.herd.pk).updated_at, updated_at)
@@ -0,0 +1,29 @@
+import threading
+from django.db import connection
+from django.test import TransactionTestCase
+from ..models import DataVersion
+
+
+class DataVersionTests(TransactionTestCase):
+
+    def test_concurrent_bumps_are_all_counted(self):
+        # Without the row, e.g. after the tables were flushed, the first bumps race to create it.
+        DataVersion.objects.all().delete()
+        start = threading.Barrier(4)
+
+        def bump():
+            try:
+                connection.ensure_connection()
+                start.wait()
+                for _ in range(25):
+                    DataVersion.bump()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(DataVersion.current()[0], 100)
@@ -0,0 +1,51 @@
+from django.core.cache import caches
+from .helpers import ViewTestCase, create_farm
+
+
+class FragmentCacheTests(ViewTestCase):
+    """
+    Checks that the cached template fragments are rendered again after the rows they show change.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.field, (cls.herd,) = create_farm('North', herd_count=1, cattle_per_herd=2)
+        cls.cattle = cls.herd.herd_leader
+
+    def get_after_write(self, url_name, *args, write):
+        """
+        Requests a page, so its fragments are cached, makes a write and returns the page requested again.
+        """
+        self.get(url_name, *args)
+        self.assertTrue(caches['template_fragments']._cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        return self.get(url_name, *args)
+
+    def test_cattle_detail_card_shows_a_renamed_cattle(self):
+        def write():
+            self.cattle.name = 'Renamed cattle'
+            self.cattle.save()
+
+        response = self.get_after_write('cattle_detail', self.cattle.pk, write=write)
+
+        self.assertContains(response, 'Cattle Renamed cattle')
+
+    def test_herd_detail_card_shows_a_renamed_field(self):
+        def write():
+            self.field.name = 'Renamed field'
+            self.field.save()
+
+        response = self.get_after_write('herd_detail', self.herd.pk, write=write)
+
+        self.assertContains(response, 'Renamed field')
+
+    def test_herd_list_row_shows_a_renamed_herd_leader(self):
+        def write():
+            self.cattle.name = 'Renamed leader'
+            self.cattle.save()
+
+        response = self.get_after_write('herd_list', write=write)
+
+        self.assertContains(response, 'Renamed leader')
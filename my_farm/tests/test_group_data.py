@@ -0,0 +1,54 @@
+from datetime import date
+from django.test import override_settings
+from django.urls import reverse
+from ..models import Cattle
+from .helpers import ViewTestCase, create_farm
+
+
+@override_settings(GROUP_DATA_PAGE_SIZE=2)
+class GroupDataTests(ViewTestCase):
+    """
+    Checks the pages and the streamed listing of the cattle in a group.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Every third cattle is a cow.
+        _, (cls.herd,) = create_farm('North', herd_count=1, cattle_per_herd=7)
+
+    def cow_numbers(self):
+        return list(Cattle.objects.filter(gender='Cow').order_by('-number').values_list('number', flat=True))
+
+    def test_pages_of_a_group(self):
+        pages = [self.get('group_data', 'Cows', sort='-number', page=page).context['groups'][0] for page in (1, 2)]
+
+        self.assertEqual([[cattle.number for cattle in group.cattle_list] for group in pages],
+                         [self.cow_numbers()[:2], self.cow_numbers()[2:]])
+        self.assertEqual([group.active_cattle for group in pages], [3, 3])
+        self.assertEqual(pages[0].page.paginator.num_pages, 2)
+
+    def test_the_count_matches_the_rows_when_the_cached_groups_are_out_of_date(self):
+        self.get('home')
+        # Inserted without signals, so the cached groups of the home page still hold three cows.
+        Cattle.objects.bulk_create([Cattle(number='new', gender='Cow', breed='Angus', birth_date=date(2020, 1, 1),
+                                           entry_date=date(2020, 1, 1), herd=self.herd)])
+
+        group = self.get('group_data', 'Cows', page=2).context['groups'][0]
+
+        self.assertEqual(group.active_cattle, 4)
+        self.assertEqual(len(group.cattle_list), 2)
+        self.assertContains(self.get('group_data', 'Cows'), 'Show all 4')
+
+    def test_all_cattle_of_a_group_are_streamed(self):
+        response = self.client.get(reverse('my_farm:group_data', args=['Cows']), {'all': '1', 'sort': '-number'})
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        positions = [content.index(f'>{number}<') for number in self.cow_numbers()]
+        self.assertEqual(positions, sorted(positions))
+        self.assertNotIn('Show all', content)
+        self.assertTrue(content.rstrip().endswith('</html>'))
+
+    def test_unknown_groups_have_no_cattle(self):
+        self.assertEqual(self.get('group_data', 'Horses').context['groups'], [])
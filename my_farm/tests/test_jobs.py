@@ -0,0 +1,80 @@
+import threading
+import time
+from datetime import timedelta
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+from ..jobs import JOBS, claim_job, enqueue, register_job, run_job, work
+from ..models import Job
+from .helpers import create_farm
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    """
+    Runs background jobs with several workers at once, as the run_workers command does.
+    """
+
+    def run_workers(self, count):
+        """
+        Runs the given number of workers in threads until the queue is empty.
+        """
+        def run(worker):
+            try:
+                work(worker, threading.Event(), poll_interval=0.01, burst=True)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(f'worker-{number}',)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_reconcile_counters_jobs_succeed_at_first_attempt(self):
+        create_farm('Field', herd_count=3, cattle_per_herd=3)
+        jobs = [enqueue('reconcile_counters') for _ in range(20)]
+
+        self.run_workers(4)
+
+        for job in Job.objects.filter(pk__in=[job.pk for job in jobs]):
+            self.assertEqual(job.status, Job.SUCCEEDED, job.error)
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(job.progress, 100)
+
+
+class JobLockTests(TransactionTestCase):
+    """
+    Checks that running jobs keep their lock and that the jobs of stopped workers are queued again.
+    """
+
+    def register(self, name, function):
+        register_job(name)(function)
+        self.addCleanup(JOBS.pop, name)
+
+    def test_the_lock_of_a_running_job_is_refreshed(self):
+        def slow_job(job):
+            time.sleep(0.3)
+            return Job.objects.get(pk=job.pk).locked_at.isoformat()
+
+        self.register('slow_job', slow_job)
+        enqueue('slow_job')
+        job = claim_job('worker')
+
+        self.assertTrue(run_job(job, heartbeat_interval=0.05))
+
+        claimed_at = job.locked_at
+        job.refresh_from_db()
+        self.assertGreater(job.result, claimed_at.isoformat())
+
+    def test_stale_jobs_are_released_while_the_queue_is_busy(self):
+        create_farm('Field', herd_count=1, cattle_per_herd=1)
+        stale = enqueue('reconcile_counters')
+        Job.objects.filter(pk=stale.pk).update(status=Job.RUNNING, locked_by='stopped', attempts=1,
+                                               locked_at=timezone.now() - timedelta(days=1))
+        queued = enqueue('reconcile_counters')
+
+        work('worker', threading.Event(), poll_interval=0.01, burst=True)
+
+        for job in Job.objects.filter(pk__in=[stale.pk, queued.pk]):
+            self.assertEqual(job.status, Job.SUCCEEDED, job.error)
+        self.assertEqual(Job.objects.get(pk=stale.pk).attempts, 2)
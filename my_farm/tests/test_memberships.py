@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+from django.test import TestCase
+from ..memberships import herd_composition, herd_transfer_counts, herds_as_of, move_cattle
+from ..models import Cattle, HerdMembership
+from .helpers import create_farm
+
+MOVE_DATE = date(2022, 6, 1)
+
+
+class HerdMembershipTests(TestCase):
+    """
+    Checks the herd membership history written by saves and bulk moves, and the lookups made on it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.field, (cls.herd, cls.other_herd, cls.third_herd) = create_farm('North', herd_count=3, cattle_per_herd=2)
+        cls.cattle = cls.herd.herd_leader
+
+    def history(self, cattle):
+        """
+        Returns the memberships of a cattle as (herd, previous herd, valid from, valid to) tuples.
+        """
+        return list(HerdMembership.objects.filter(cattle=cattle).order_by('valid_from', 'id').values_list(
+            'herd_id', 'previous_herd_id', 'valid_from', 'valid_to'))
+
+    def test_a_move_closes_the_membership_and_opens_one_in_the_new_herd(self):
+        move_cattle(Cattle.objects.filter(pk=self.cattle.pk), self.other_herd, MOVE_DATE)
+
+        self.assertEqual(self.history(self.cattle), [
+            (self.herd.pk, None, self.cattle.entry_date, MOVE_DATE),
+            (self.other_herd.pk, self.herd.pk, MOVE_DATE, None),
+        ])
+
+    def test_moves_on_the_same_day_keep_the_original_previous_herd(self):
+        moved = Cattle.objects.filter(pk=self.cattle.pk)
+        move_cattle(moved, self.other_herd, MOVE_DATE)
+        move_cattle(moved, self.third_herd, MOVE_DATE)
+        moved_in_bulk = self.history(self.cattle)
+
+        saved = self.herd.cattle_set.exclude(pk=self.cattle.pk).get()
+        today = date.today()
+        for herd in (self.other_herd, self.third_herd):
+            saved.herd = herd
+            saved.save()
+
+        expected = [(self.herd.pk, None, self.cattle.entry_date, MOVE_DATE),
+                    (self.third_herd.pk, self.herd.pk, MOVE_DATE, None)]
+        self.assertEqual(moved_in_bulk, expected)
+        self.assertEqual(self.history(saved), [(self.herd.pk, None, saved.entry_date, today),
+                                               (self.third_herd.pk, self.herd.pk, today, None)])
+
+    def test_herds_as_of_a_date(self):
+        move_cattle(Cattle.objects.filter(pk=self.cattle.pk), self.other_herd, MOVE_DATE)
+
+        before = herds_as_of(MOVE_DATE - timedelta(days=1))
+        after = herds_as_of(MOVE_DATE)
+
+        self.assertEqual(before[self.cattle.pk], (self.herd.name, self.field.name))
+        self.assertEqual(after[self.cattle.pk], (self.other_herd.name, self.field.name))
+        self.assertNotIn(self.cattle.pk, herds_as_of(self.cattle.entry_date - timedelta(days=1)))
+
+    def test_herd_composition_on_a_date(self):
+        other = self.herd.cattle_set.exclude(pk=self.cattle.pk).get()
+        other.loss_method = 'Sold'
+        other.end_date = MOVE_DATE
+        other.save()
+        move_cattle(Cattle.objects.filter(pk=self.cattle.pk), self.other_herd, MOVE_DATE)
+
+        def composition(herd, on_date):
+            return set(herd_composition(herd.pk, on_date).values_list('pk', flat=True))
+
+        self.assertEqual(composition(self.herd, MOVE_DATE - timedelta(days=1)), {self.cattle.pk, other.pk})
+        self.assertEqual(composition(self.herd, MOVE_DATE), set())
+        self.assertIn(self.cattle.pk, composition(self.other_herd, MOVE_DATE))
+        self.assertNotIn(self.cattle.pk, composition(self.other_herd, MOVE_DATE - timedelta(days=1)))
+
+    def test_herd_transfer_counts_in_a_date_range(self):
+        move_cattle(self.herd.cattle_set.all(), self.other_herd, MOVE_DATE)
+        move_cattle(Cattle.objects.filter(pk=self.cattle.pk), self.third_herd, MOVE_DATE + timedelta(days=10))
+        # Moved away and back on the same day.
+        returning = self.third_herd.herd_leader
+        move_cattle(Cattle.objects.filter(pk=returning.pk), self.herd, MOVE_DATE)
+        move_cattle(Cattle.objects.filter(pk=returning.pk), self.third_herd, MOVE_DATE)
+
+        self.assertEqual(herd_transfer_counts(MOVE_DATE, MOVE_DATE + timedelta(days=30)), [
+            {'from_herd': self.herd.name, 'to_herd': self.other_herd.name, 'count': 2},
+            {'from_herd': self.other_herd.name, 'to_herd': self.third_herd.name, 'count': 1},
+        ])
+        self.assertEqual(herd_transfer_counts(MOVE_DATE, MOVE_DATE + timedelta(days=10)), [
+            {'from_herd': self.herd.name, 'to_herd': self.other_herd.name, 'count': 2},
+        ])
+        self.assertEqual(herd_transfer_counts(MOVE_DATE + timedelta(days=1), MOVE_DATE + timedelta(days=10)), [])
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase, override_settings
+from ..metrics import collect
+
+
+class MetricsCollectionTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.metrics_dir = Path(directory.name)
+        settings = override_settings(METRICS_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write_metrics(self, pid, view, value):
+        """
+        Writes the metrics file of a process with a query counter for the view.
+        """
+        path = self.metrics_dir / f'{pid}-1.json'
+        path.write_text(json.dumps({'counters': [['my_farm_db_queries_total', [['view', view]], value]],
+                                    'histograms': []}))
+        return path
+
+    def exited_pid(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        return process.pid
+
+    def test_metrics_of_exited_processes_are_absorbed(self):
+        exited = self.write_metrics(self.exited_pid(), 'exited', 7)
+        running = self.write_metrics(os.getppid(), 'running', 3)
+
+        counters, _ = collect()
+
+        self.assertEqual(counters[('my_farm_db_queries_total', (('view', 'exited'),))], 7)
+        self.assertEqual(counters[('my_farm_db_queries_total', (('view', 'running'),))], 3)
+        self.assertFalse(exited.exists())
+        self.assertTrue(running.exists())
+
+        counters, _ = collect()
+
+        self.assertEqual(counters[('my_farm_db_queries_total', (('view', 'exited'),))], 7)
+        self.assertEqual(len(list(self.metrics_dir.glob('*.json'))), 2)
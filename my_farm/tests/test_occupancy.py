@@ -0,0 +1,98 @@
+from datetime import date
+from django.test import SimpleTestCase, override_settings
+from ..models import Field
+from ..occupancy import FieldOccupancy
+
+
+def occupancy(animals, start_date, end_date, field_size=1, size_unit='ha'):
+    """
+    Calculates the occupancy of an unsaved field from (entry_date, herd_start_date, end_date, gender, birth_date)
+    tuples.
+    """
+    field = Field(name='North', field_size=field_size, size_unit=size_unit)
+    return FieldOccupancy(field, start_date, end_date).calculate(animals)
+
+
+@override_settings(FIELD_MAX_LIVESTOCK_UNITS_PER_HA=2.0)
+class FieldOccupancyTests(SimpleTestCase):
+    """
+    Checks the daily series FieldOccupancy builds from the arrivals and departures of the animals on a field.
+    """
+
+    def test_head_counts_follow_arrivals_and_departures(self):
+        animals = [
+            # Entered before the series, but its herd only started on the field on the third day.
+            (date(2023, 12, 1), date(2024, 1, 3), None, 'Cow', None),
+            # Counted up to the day before it left.
+            (date(2024, 1, 5), date(2023, 1, 1), date(2024, 1, 8), 'Cow', None),
+            # Left before the series and arrived after it.
+            (date(2023, 1, 1), date(2023, 1, 1), date(2023, 12, 31), 'Cow', None),
+            (date(2024, 1, 11), date(2023, 1, 1), None, 'Cow', None),
+        ]
+
+        result = occupancy(animals, date(2024, 1, 1), date(2024, 1, 10))
+
+        self.assertEqual(result.head_counts, [0, 0, 1, 1, 2, 2, 2, 1, 1, 1])
+        self.assertEqual(result.livestock_units, [0, 0, 0.8, 0.8, 1.6, 1.6, 1.6, 0.8, 0.8, 0.8])
+        self.assertEqual(result.current_head_count, 1)
+        self.assertEqual(len(result.dates()), 10)
+
+    def test_acres_are_converted_to_hectares(self):
+        animals = [(date(2023, 1, 1), None, None, 'Bull', None)] * 2
+
+        in_hectares = occupancy(animals, date(2024, 1, 1), date(2024, 1, 1), field_size=10, size_unit='ha')
+        in_acres = occupancy(animals, date(2024, 1, 1), date(2024, 1, 1), field_size=10, size_unit='ac')
+
+        self.assertEqual(in_hectares.densities, [0.2])
+        self.assertEqual(in_acres.densities, [0.49])
+
+    def test_fields_without_a_size_have_no_density(self):
+        result = occupancy([(date(2023, 1, 1), None, None, 'Bull', None)], date(2024, 1, 1), date(2024, 1, 1),
+                           field_size=None)
+
+        self.assertEqual(result.densities, [])
+        self.assertIsNone(result.current_density)
+        self.assertFalse(result.is_over_capacity)
+
+    def test_livestock_units_change_with_age(self):
+        animals = [
+            (date(2023, 1, 15), None, None, 'Heifer', date(2023, 1, 15)),
+            (date(2022, 1, 16), None, None, 'Bull', date(2022, 1, 16)),
+            # Cows count as adults whatever their age.
+            (date(2023, 1, 15), None, None, 'Cow', date(2023, 1, 15)),
+        ]
+
+        result = occupancy(animals, date(2024, 1, 14), date(2024, 1, 16))
+
+        # The heifer becomes a yearling on the 15th, the bull an adult on the 16th.
+        self.assertEqual(result.livestock_units, [1.9, 2.2, 2.5])
+
+    def test_adult_livestock_units_depend_on_gender(self):
+        animals = [
+            (date(2020, 1, 1), None, None, 'Heifer', date(2020, 1, 1)),
+            (date(2020, 1, 1), None, None, 'Bull', date(2020, 1, 1)),
+            (date(2020, 1, 1), None, None, 'Bull', None),
+        ]
+
+        result = occupancy(animals, date(2024, 1, 1), date(2024, 1, 1))
+
+        self.assertEqual(result.livestock_units, [2.8])
+
+    def test_fields_stocked_above_the_capacity_are_flagged(self):
+        animals = [(date(2024, 1, 1), None, None, 'Bull', None)] * 2 + [(date(2024, 1, 3), None, None, 'Bull', None)]
+
+        result = occupancy(animals, date(2024, 1, 1), date(2024, 1, 4))
+
+        # Two bulls per hectare are at the capacity, not above it.
+        self.assertEqual(result.densities, [2.0, 2.0, 3.0, 3.0])
+        self.assertEqual(result.days_over_capacity, 2)
+        self.assertEqual(result.peak_density, 3.0)
+        self.assertTrue(result.is_over_capacity)
+
+    def test_only_the_last_day_sets_the_over_capacity_flag(self):
+        animals = [(date(2024, 1, 1), None, date(2024, 1, 3), 'Bull', None)] * 3
+
+        result = occupancy(animals, date(2024, 1, 1), date(2024, 1, 4))
+
+        self.assertEqual(result.days_over_capacity, 2)
+        self.assertFalse(result.is_over_capacity)
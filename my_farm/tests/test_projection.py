@@ -0,0 +1,117 @@
+import random
+from datetime import date, timedelta
+from django.test import SimpleTestCase, TestCase, override_settings
+from ..models import Cattle
+from ..projection import CensusProjection, historical_rates, parse_projection_params
+from ..report_calculations import AGE_GROUPS
+from ..utils import calculate_age
+
+
+def age_group(gender, birth_date, reference_date):
+    """
+    Returns the age group of an animal on a reference date by the rules of GroupsManagement.calculate_groups.
+    """
+    if gender == 'Cow':
+        return 'Cows'
+    age = calculate_age(birth_date, reference_date)
+    if age < 0:
+        return None
+    if age < 12:
+        return 'Calves'
+    return f'{"Young" if age < 24 else "Adult"}_{gender}'
+
+
+class CensusProjectionTests(SimpleTestCase):
+    """
+    Checks the projected age group counts against the age of every animal on the projected dates.
+    """
+
+    def test_counts_match_the_age_groups_on_every_projected_date(self):
+        rng = random.Random(43)
+        start_date = date(2024, 1, 31)
+        animals = []
+        for _ in range(500):
+            # Births and entries around month ends, including the leap day.
+            birth_date = date(2021, 1, 1) + timedelta(days=rng.randrange(4 * 365))
+            entry_date = birth_date + timedelta(days=rng.choice([0, 0, 30, 400]))
+            animals.append((rng.choice(['Cow', 'Heifer', 'Bull']), birth_date, entry_date))
+        animals.append(('Heifer', date(2023, 2, 28), date(2023, 2, 28)))
+        animals.append(('Bull', date(2022, 2, 28), date(2022, 2, 28)))
+
+        projection = CensusProjection(start_date, 24).calculate(animals)
+
+        for month, month_date in enumerate(projection.month_dates):
+            expected = dict.fromkeys(AGE_GROUPS, 0)
+            for gender, birth_date, entry_date in animals:
+                group = age_group(gender, birth_date, month_date)
+                if group and entry_date < month_date:
+                    expected[group] += 1
+            with self.subTest(month_date=month_date):
+                self.assertEqual({group: projection.counts[group][month] for group in AGE_GROUPS}, expected)
+
+    def test_cattle_change_group_on_the_day_they_reach_the_age(self):
+        animals = [('Heifer', date(2020, 2, 29), date(2020, 2, 29)), ('Bull', date(2019, 3, 31), date(2019, 3, 31))]
+
+        projection = CensusProjection(date(2021, 1, 28), 2).calculate(animals)
+
+        self.assertEqual(projection.month_dates, [date(2021, 1, 28), date(2021, 2, 28), date(2021, 3, 28)])
+        self.assertEqual(projection.counts['Calves'], [1, 0, 0])
+        self.assertEqual(projection.counts['Young_Heifer'], [0, 1, 1])
+        self.assertEqual(projection.counts['Young_Bull'], [1, 1, 1])
+        self.assertEqual(projection.counts['Adult_Bull'], [0, 0, 0])
+
+    def test_animals_without_an_entry_date_are_left_out(self):
+        projection = CensusProjection(date(2024, 1, 1), 1).calculate([('Cow', None, None)])
+
+        self.assertEqual(projection.totals, [0, 0])
+
+    def test_rates_reduce_the_counts_and_add_calves(self):
+        rates = {'births_per_cow': 0.1, 'loss_rate': 0.0, 'heifer_share': 0.5, 'losses_by_method': {}}
+        animals = [('Cow', None, date(2020, 1, 1))] * 10
+
+        projection = CensusProjection(date(2024, 1, 1), 13).calculate(animals, rates)
+
+        # One calf a month, which is a yearling twelve months after its birth.
+        self.assertEqual(projection.counts['Cows'], [10] * 14)
+        self.assertEqual(projection.counts['Calves'], list(range(13)) + [12])
+        self.assertEqual(projection.counts['Young_Heifer'], [0] * 13 + [0.5])
+        self.assertEqual(projection.counts['Young_Bull'], [0] * 13 + [0.5])
+
+        rates['loss_rate'] = 0.5
+        projection = CensusProjection(date(2024, 1, 1), 2).calculate(animals, rates)
+
+        self.assertEqual(projection.counts['Cows'], [10, 5, 2.5])
+        self.assertEqual(projection.counts['Calves'], [0, 1, 0.5 + 0.5])
+
+    def test_projection_params(self):
+        self.assertEqual(parse_projection_params({}), (12, False))
+        self.assertEqual(parse_projection_params({'months': '36', 'rates': 'on'}), (36, True))
+        self.assertIsNone(parse_projection_params({'months': '37'}))
+        self.assertIsNone(parse_projection_params({'months': 'x'}))
+
+
+@override_settings(PROJECTION_HISTORY_MONTHS=12)
+class HistoricalRatesTests(TestCase):
+    """
+    Checks the monthly rates derived from the births and losses of the last PROJECTION_HISTORY_MONTHS months.
+    """
+
+    def create(self, number, gender, entry_date, acquisition_method, end_date=None, loss_method=None):
+        Cattle.objects.create(number=number, gender=gender, breed='Angus', birth_date=entry_date,
+                              entry_date=entry_date, acquisition_method=acquisition_method, end_date=end_date,
+                              loss_method=loss_method)
+
+    def test_rates_relate_births_and_losses_to_the_current_cattle(self):
+        self.create('1', 'Cow', date(2020, 1, 1), 'Purchase')
+        self.create('2', 'Cow', date(2020, 1, 1), 'Purchase')
+        self.create('3', 'Heifer', date(2023, 6, 1), 'Birth')
+        self.create('4', 'Bull', date(2023, 7, 1), 'Birth', date(2023, 12, 1), 'Sold')
+        # Born before the history.
+        self.create('5', 'Bull', date(2022, 12, 31), 'Birth', date(2022, 12, 31), 'Death')
+
+        rates = historical_rates(date(2024, 1, 1))
+
+        self.assertAlmostEqual(rates['births_per_cow'], 2 / 2 / 12)
+        self.assertAlmostEqual(rates['loss_rate'], 1 / 3 / 12)
+        self.assertEqual(rates['heifer_share'], 0.5)
+        self.assertEqual(rates['losses_by_method'], {'Death': 0, 'Sold': 1, 'Consumed': 0, 'Gifted': 0})
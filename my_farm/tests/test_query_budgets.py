@@ -0,0 +1,62 @@
+from ..jobs import enqueue
+from ..query_budgets import QUERY_BUDGETS
+from ..query_instrumentation import assert_query_budget
+from .helpers import ViewTestCase, clear_caches, create_farm
+
+
+class QueryBudgetTests(ViewTestCase):
+    """
+    Requests every URL that has a query budget in my_farm.query_budgets and checks that it stays within it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.field, cls.herds = create_farm('North', herd_count=3, cattle_per_herd=4)
+        cls.herd = cls.herds[0]
+        cls.cattle = cls.herd.herd_leader
+        cls.job = enqueue('reconcile_counters', user=cls.user)
+
+    def requests(self):
+        """
+        Returns the URL arguments and query parameters to request every budgeted URL with, by URL name.
+        """
+        report_range = {'start_date': '2020-01-01', 'end_date': '2021-12-31'}
+        return {
+            'home': ((), {}),
+            'group_data': (('Cows',), {}),
+            'generate_report': ((), {}),
+            'report': ((), report_range),
+            'report_api': ((), report_range),
+            'dashboard_api': ((), {}),
+            'changes_api': ((), {}),
+            'sync_api': ((), {}),
+            'projection': ((), {}),
+            'projection_api': ((), {}),
+            'job_list': ((), {}),
+            'job_api': ((self.job.pk,), {}),
+            'cattle_info': ((), {}),
+            'cattle_detail': ((self.cattle.pk,), {}),
+            'update_cattle': ((self.cattle.pk,), {}),
+            'search_cattle': ((), {'query': 'Cattle'}),
+            'herd_list': ((), {}),
+            'herd_detail': ((self.herd.pk,), {}),
+            'cattle_list_by_herd': ((self.herd.pk,), {}),
+            'search_herd': ((), {'query': 'North'}),
+            'herd_composition_api': ((self.herd.pk,), {}),
+            'herd_transfers_api': ((), report_range),
+            'field_list': ((), {}),
+            'field_detail': ((self.field.pk,), {}),
+            'herd_list_by_field': ((self.field.pk,), {}),
+            'search_field': ((), {'query': 'North'}),
+        }
+
+    def test_every_budgeted_url_is_requested(self):
+        self.assertEqual(set(self.requests()), set(QUERY_BUDGETS))
+
+    def test_views_stay_within_their_query_budgets(self):
+        for url_name, (args, params) in self.requests().items():
+            with self.subTest(url_name):
+                clear_caches()
+                with assert_query_budget(url_name):
+                    self.get(url_name, *args, **params)
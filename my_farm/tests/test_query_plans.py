@@ -0,0 +1,22 @@
+from django.db import connection
+from django.test import TestCase
+from ..query_plans import find_full_scans, key_queries
+from ..synthetic_farm import generate_farm
+
+
+class QueryPlanTests(TestCase):
+    """
+    Explains the key view queries on a seeded farm, like the check_query_plans command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_farm(cattle_count=2000, herd_count=20, field_count=6, years=5, seed=1)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_key_queries_use_indexes(self):
+        for label, queryset in key_queries().items():
+            with self.subTest(label):
+                plan, scanned_tables = find_full_scans(queryset)
+                self.assertEqual(scanned_tables, [], plan)
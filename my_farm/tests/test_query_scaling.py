@@ -0,0 +1,37 @@
+from ..query_instrumentation import record_queries
+from .helpers import ViewTestCase, clear_caches, create_cattle, create_farm, create_herds
+
+
+class QueryScalingTests(ViewTestCase):
+    """
+    Renders the listings with N and then 2N rows and checks that the number of queries stays the same, which catches
+    the per-row lookups a budget with headroom can hide.
+    """
+
+    def query_count(self, url_name, *args, **params):
+        """
+        Returns the number of queries a request to the URL runs with empty caches.
+        """
+        clear_caches()
+        with record_queries() as recorder:
+            self.get(url_name, *args, **params)
+        return recorder.count
+
+    def test_herd_listings(self):
+        field, _ = create_farm('North', herd_count=2, cattle_per_herd=2)
+        requests = [('herd_list', (), {}), ('search_herd', (), {'query': 'North'}),
+                    ('herd_list_by_field', (field.pk,), {})]
+        counts = [self.query_count(url_name, *args, **params) for url_name, args, params in requests]
+
+        create_herds(field, 2, cattle_per_herd=2)
+
+        self.assertEqual([self.query_count(url_name, *args, **params) for url_name, args, params in requests], counts)
+
+    def test_cattle_listings(self):
+        _, (herd,) = create_farm('North', herd_count=1, cattle_per_herd=2)
+        requests = [('cattle_info',), ('cattle_list_by_herd', herd.pk)]
+        counts = [self.query_count(*request) for request in requests]
+
+        create_cattle(herd, 2)
+
+        self.assertEqual([self.query_count(*request) for request in requests], counts)
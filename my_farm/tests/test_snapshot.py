@@ -0,0 +1,51 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from ..models import Cattle
+from ..snapshot import CattleSnapshot
+from .helpers import create_farm
+
+
+def live_records(columns):
+    """
+    Returns the live rows of snapshot columns as dictionaries.
+    """
+    return [columns.record(position) for position in range(len(columns)) if columns.live[position]]
+
+
+class CattleSnapshotTests(TestCase):
+    """
+    Checks that incremental refreshes of the cattle snapshot end with the same rows as a full reload.
+    """
+
+    def setUp(self):
+        _, (self.herd, self.other_herd, *_) = create_farm('North', herd_count=5, cattle_per_herd=6)
+        # Rows last written long before the high-water mark, which only the newest cattle sets.
+        Cattle.all_objects.update(updated_at=timezone.now() - timedelta(days=1))
+        Cattle.all_objects.filter(pk=Cattle.objects.latest('pk').pk).update(updated_at=timezone.now())
+        self.snapshot = CattleSnapshot()
+        self.snapshot.current()
+
+    def assertRefreshedLikeReload(self):
+        refreshed = self.snapshot.refreshed(self.snapshot.columns)
+
+        self.assertIsNotNone(refreshed)
+        self.assertEqual(live_records(refreshed), live_records(self.snapshot.reload()))
+
+    def test_refresh_after_saves(self):
+        cattle = self.herd.cattle_set.first()
+        cattle.gender = 'Cow'
+        cattle.save()
+        self.other_herd.cattle_set.last().delete()
+
+        self.assertRefreshedLikeReload()
+
+    def test_refresh_after_queryset_updates(self):
+        Cattle.objects.filter(herd=self.herd, gender='Bull').update(loss_method='Sold')
+
+        self.assertRefreshedLikeReload()
+
+    def test_refresh_after_a_herd_is_deleted(self):
+        self.other_herd.delete()
+
+        self.assertRefreshedLikeReload()
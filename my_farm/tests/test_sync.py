@@ -0,0 +1,126 @@
+import gzip
+import json
+from django.test import Client
+from django.urls import reverse
+from ..models import Field, Herd, SyncRef
+from ..sync import latest_token
+from .helpers import ViewTestCase, create_farm
+
+
+class SyncTests(ViewTestCase):
+    """
+    Checks the sync downloads and the uploads of edits made offline.
+    """
+
+    def sync(self, token=None, client=None):
+        """
+        Downloads the changes since a token.
+
+        :return: The header and the row records.
+        """
+        response = (client or self.client).get(reverse('my_farm:sync_api'), {} if token is None else {'token': token})
+        self.assertEqual(response.status_code, 200)
+        header, *records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        return header, records
+
+    def upload(self, *edits, client=None, **headers):
+        """
+        Uploads edits as gzip-compressed NDJSON.
+
+        :return: The response.
+        """
+        body = gzip.compress(''.join(json.dumps(edit) + '\n' for edit in edits).encode())
+        return (client or self.client).post(reverse('my_farm:sync_upload_api'), body,
+                                            content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip',
+                                            **headers)
+
+    def create_field_edit(self, ref, name='West'):
+        return {'model': 'Field', 'action': 'create', 'ref': ref,
+                'data': {'name': name, 'location': 'West', 'coordinates': '2,2'}}
+
+    def test_delta_sync_sends_the_rows_changed_after_the_token(self):
+        field, (herd,) = create_farm('North', herd_count=1, cattle_per_herd=1)
+        header, records = self.sync()
+        self.assertTrue(header['full'])
+        self.assertEqual(len(records), 3)
+
+        herd.name = 'Renamed'
+        herd.save()
+        field_id = field.pk
+        field.delete()
+        delta_header, delta_records = self.sync(header['token'])
+
+        self.assertEqual((delta_header['full'], delta_header['token']), (False, latest_token()))
+        # The herd lost its field, which the delta reports with the rename.
+        self.assertEqual(delta_records, [
+            {'model': 'Field', 'id': field_id, 'deleted': True},
+            {'model': 'Herd', 'id': herd.pk, 'data': {**delta_records[1]['data'], 'name': 'Renamed', 'field_id': None}},
+        ])
+        self.assertEqual(self.sync(delta_header['token'])[1], [])
+
+    def test_conflicting_uploads_are_rejected_with_409(self):
+        field, _ = create_farm('North', herd_count=0, cattle_per_herd=0)
+        token = latest_token()
+        field.name = 'Changed on the server'
+        field.save()
+
+        response = self.upload({'model': 'Field', 'action': 'update', 'id': field.pk, 'token': token,
+                                'data': {'name': 'Changed offline'}})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'conflicts': [{'index': 0, 'model': 'Field', 'id': field.pk,
+                                                          'columns': ['name']}]})
+        field.refresh_from_db()
+        self.assertEqual(field.name, 'Changed on the server')
+
+    def test_invalid_edits_roll_back_the_whole_upload(self):
+        response = self.upload(self.create_field_edit('a'), {'model': 'Field', 'action': 'create', 'data': {}})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertFalse(Field.objects.exists())
+        self.assertFalse(SyncRef.objects.exists())
+
+    def test_a_repeated_upload_returns_the_rows_created_first(self):
+        field, _ = create_farm('North', herd_count=0, cattle_per_herd=0)
+        edits = [
+            self.create_field_edit('field-1'),
+            {'model': 'Herd', 'action': 'create', 'ref': 'herd-1',
+             'data': {'name': 'West herd', 'location': 'West', 'field_id': {'ref': 'field-1'}}},
+            {'model': 'Field', 'action': 'delete', 'id': field.pk, 'token': latest_token()},
+        ]
+
+        first = self.upload(*edits).json()['applied']
+        second = self.upload(*edits).json()['applied']
+
+        self.assertEqual(first, second)
+        self.assertEqual([(edit['model'], edit['ref']) for edit in first],
+                         [('Field', 'field-1'), ('Herd', 'herd-1'), ('Field', None)])
+        self.assertEqual(Field.objects.count(), 1)
+        herd = Herd.objects.get()
+        self.assertEqual((herd.pk, herd.field_id), (first[1]['id'], first[0]['id']))
+
+    def test_refs_to_later_or_reused_refs_are_rejected(self):
+        self.upload(self.create_field_edit('field-1'))
+
+        unknown = self.upload({'model': 'Herd', 'action': 'create',
+                               'data': {'name': 'West herd', 'location': 'West', 'field_id': {'ref': 'field-2'}}},
+                              self.create_field_edit('field-2'))
+        reused = self.upload(self.create_field_edit('field-2'), self.create_field_edit('field-2', 'East'))
+        other_model = self.upload({'model': 'Herd', 'action': 'create', 'ref': 'field-1',
+                                   'data': {'name': 'West herd', 'location': 'West'}})
+
+        self.assertEqual([response.status_code for response in (unknown, reused, other_model)], [400] * 3)
+        self.assertEqual(Field.objects.count(), 1)
+        self.assertFalse(Herd.objects.exists())
+
+    def test_uploads_need_the_csrf_token_of_the_sync_header(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        header, _ = self.sync(client=client)
+
+        rejected = self.upload(self.create_field_edit('field-1'), client=client)
+        accepted = self.upload(self.create_field_edit('field-1'), client=client, HTTP_X_CSRFTOKEN=header['csrf_token'])
+
+        self.assertEqual(rejected.status_code, 403)
+        self.assertEqual(accepted.status_code, 200)
@@ -4,6 +4,10 @@ from .views import home, group_data
 from .views_herd import herd_list, add_herd, herd_detail, cattle_list_by_herd, search_herd, update_herd, \
     upload_herd_picture
 from .views_movement_report import GenerateReportView, LivestockMovementReportView
+from .views_api import LivestockMovementReportApiView, dashboard_api, projection_api, herd_composition_api, \
+    herd_transfers_api, changes_api, sync_api, sync_upload_api, job_api
+from .views_jobs import job_list
+from .views_projection import projection
 from .views_field import field_list, field_detail, herd_list_by_field, update_field, add_field, upload_field_picture, \
     search_field
 from .views_cattle import cattle_info, add_cattle, update_cattle, search_cattle, cattle_detail, \
@@ -20,6 +24,18 @@ urlpatterns = [
     path('generate_report/', GenerateReportView.as_view(), name='generate_report'),
     path('livestock_movement_report/', LivestockMovementReportView.as_view(), name='report'),
 
+    path('api/report/', LivestockMovementReportApiView.as_view(), name='report_api'),
+    path('api/dashboard/', dashboard_api, name='dashboard_api'),
+    path('api/changes/', changes_api, name='changes_api'),
+    path('api/sync/', sync_api, name='sync_api'),
+    path('api/sync/upload/', sync_upload_api, name='sync_upload_api'),
+
+    path('projection/', projection, name='projection'),
+    path('api/projection/', projection_api, name='projection_api'),
+
+    path('jobs/', job_list, name='job_list'),
+    path('api/jobs/<int:job_id>/', job_api, name='job_api'),
+
     path('cattle_info/', cattle_info, name='cattle_info'),
     path('cattle/<int:cattle_id>/', cattle_detail, name='cattle_detail'),
     path('add_cattle/', add_cattle, name='add_cattle'),
@@ -36,6 +52,8 @@ urlpatterns = [
     path('herd/update_herd/<int:herd_id>/', update_herd, name='update_herd'),
     path('herd/upload_herd_picture/<int:herd_id>/', upload_herd_picture, name='upload_herd_picture'),
     path('search_herd/', search_herd, name='search_herd'),
+    path('api/herds/<int:herd_id>/composition/', herd_composition_api, name='herd_composition_api'),
+    path('api/herd_transfers/', herd_transfers_api, name='herd_transfers_api'),
 
     path('fields/', field_list, name='field_list'),
     path('fields/<int:field_id>/', field_detail, name='field_detail'),
@@ -1,3 +1,4 @@
+from datetime import date
 from dateutil.relativedelta import relativedelta
 
 
@@ -16,3 +17,15 @@ def calculate_age(birth_date, estimation_date):
         age_in_months = age.years * 12 + age.months
         return age_in_months
 
+
+def parse_report_range(params):
+    """
+    Reads the report period from the 'start_date' and 'end_date' query parameters.
+
+    :param params: The query parameters, e.g. request.GET.
+    :return: A (start_date, end_date) tuple, or None if a date is missing or not an ISO date.
+    """
+    try:
+        return date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date'])
+    except (KeyError, ValueError):
+        return None
@@ -1,12 +1,19 @@
 from datetime import date
+from itertools import islice
+from django.conf import settings
 from django.utils.text import slugify
 from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.template.defaultfilters import slugify
 from django.utils import timezone
 from .models import Herd, Field
 from django.urls import reverse
-from .cattle_groups import GroupsManagement, CattleGroupData
+from django.views.decorators.http import condition
+from .cache import tiered_cache
+from .conditional import group_data_etag
+from .cattle_groups import GroupsManagement, CattleGroupData, GROUP_DATA_FIELDS, parse_group_sort
 
 
 @login_required
@@ -14,67 +21,117 @@ def home(request):
     """
     Renders the home page of the "My Farm" application.
 
-    Retrieves various statistics and groups of cattle for display on the home page.
+    Retrieves various statistics and groups of cattle for display on the home page from the 'dashboard' cache.
 
     :param request: The HTTP request object.
     :return: The rendered home page with the required data.
     """
+    today = date.today()
+    context = tiered_cache.get_or_set('dashboard', today.isoformat(), lambda: dashboard_data(today))
+
+    return render(request, 'my_farm/my_farm_main.html', context)
+
+
+def dashboard_data(today, version=None):
+    """
+    Calculates the statistics and cattle group counts shown on the home page.
+
+    :param today: The date the statistics are calculated for.
+    :param version: The global data version, if the caller already read it, e.g. for an ETag.
+    :return: A dictionary with the groups and the active herd, field and cattle counts.
+    """
     active_herds_count = Herd.objects.filter(is_active=True, start_date__lte=timezone.now()).count()
     active_field_count = Field.objects.filter(is_active=True).count()
 
     groups_manager = GroupsManagement()
-    today_groups = groups_manager.calculate_groups(reference_date=date.today())
+    today_groups = groups_manager.cached_groups(reference_date=today, version=version)
 
-    total_cattle_count = 0
-    for group_data in today_groups.values():
-        alive_cows_in_group = 0
-        for cattle_data in group_data:
-            if cattle_data['end_date'] is None:
-                alive_cows_in_group += 1
-        total_cattle_count += alive_cows_in_group
+    total_cattle_count = sum(len(cattle_ids) for cattle_ids in today_groups.values())
 
     groups = []
-    for group_name, cattle_data in today_groups.items():
-        group = CattleGroupData(group_name, cattle_data)
+    for group_name, cattle_ids in today_groups.items():
+        group = CattleGroupData(group_name, cattle_ids)
         group.count_active_cattle()
+        # Only the counts are rendered, the cached dashboard does not need the cattle of every group.
+        group.group_data = []
         group_url = reverse('my_farm:group_data', args=[slugify(group_name)])
         group.url = group_url
         groups.append(group)
 
-    context = {
+    return {
         'groups': groups,
         'active_herds_count': active_herds_count,
         'active_field_count': active_field_count,
         'total_cattle_count': total_cattle_count,
     }
 
-    return render(request, 'my_farm/my_farm_main.html', context)
 
+# The rows of a streamed group data page replace this comment of the rendered page.
+STREAMED_ROWS_MARKER = '<!-- group data rows -->'
+
+# Rows rendered per chunk of a streamed group data page.
+STREAM_CHUNK_ROWS = 500
+
+# The header of the group data table, with the column each header sorts by.
+GROUP_DATA_COLUMNS = [('Type', 'type'), ('Number', 'number'), ('Name', 'name'), ('Gender', 'gender'),
+                      ('Breed', 'breed'), ('Birth Date', 'birth_date'), ('Acquisition Method', 'acquisition_method'),
+                      ('Entry Date', 'entry_date'), ('Comments', None)]
 
+
+@condition(etag_func=group_data_etag)
 def group_data(request, group_name):
     """
     Renders the group data page for the selected group.
 
-    Retrieves the cattle data for the selected group and displays it on the page.
+    The cattle of the group are loaded by a query, sorted by the column in the 'sort' query parameter and paginated
+    with GROUP_DATA_PAGE_SIZE cattle per page. The number of cattle is counted by the same query, so it matches the
+    rows even when the cached groups of the home page are out of date. With the 'all' query parameter the whole group
+    is streamed instead, rendering the rows in chunks, so large groups are not held in memory. Conditional requests
+    are answered with 304 Not Modified while the data version and the day are unchanged.
 
     :param request: The HTTP request object.
     :param group_name: The name of the selected group.
     :return: The rendered group data page with the selected group's data.
     """
-    groups_manager = GroupsManagement()
-    today_cattle = groups_manager.calculate_groups(reference_date=date.today())
-
     selected_group = group_name
-
-    groups = []
-    if selected_group in today_cattle:
-        cattle_data = today_cattle[selected_group]
-        group = CattleGroupData(selected_group, cattle_data)
-        group.cattle_data()
-        groups.append(group)
-
+    sort = parse_group_sort(request.GET)
     context = {
-        'groups': groups,
-        'selected_group': selected_group
+        'groups': [],
+        'selected_group': selected_group,
+        'columns': GROUP_DATA_COLUMNS,
+        'sort': sort,
     }
-    return render(request, 'my_farm/group_data.html', context)
\ No newline at end of file
+    cattle = GroupsManagement().group_queryset(selected_group, date.today())
+    if cattle is None:
+        return render(request, 'my_farm/group_data.html', context)
+
+    group = CattleGroupData(selected_group, [])
+    context['groups'].append(group)
+    cattle = cattle.order_by(sort, 'id')
+    if request.GET.get('all'):
+        return StreamingHttpResponse(stream_group_data(request, context, cattle))
+
+    group.cattle_page(cattle, request.GET.get('page'), settings.GROUP_DATA_PAGE_SIZE)
+    return render(request, 'my_farm/group_data.html', context)
+
+
+def stream_group_data(request, context, cattle):
+    """
+    Renders the group data page around the rows of all the cattle, which are loaded and rendered STREAM_CHUNK_ROWS at
+    a time.
+
+    :param request: The HTTP request object.
+    :param context: The context of the group data page.
+    :param cattle: The sorted cattle of the group.
+    :return: A generator of the page's HTML chunks.
+    """
+    head, tail = render_to_string('my_farm/group_data.html', {**context, 'streamed': True}, request).split(
+        STREAMED_ROWS_MARKER, 1)
+    yield head
+    rows = cattle.only(*GROUP_DATA_FIELDS).iterator(chunk_size=STREAM_CHUNK_ROWS)
+    chunk = list(islice(rows, STREAM_CHUNK_ROWS))
+    # The first chunk is rendered even when empty, for the row saying the group has no cattle.
+    yield render_to_string('my_farm/group_data_rows.html', {'cattle_list': chunk})
+    while chunk := list(islice(rows, STREAM_CHUNK_ROWS)):
+        yield render_to_string('my_farm/group_data_rows.html', {'cattle_list': chunk})
+    yield tail
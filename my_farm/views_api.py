@@ -0,0 +1,359 @@
+from datetime import date
+from operator import attrgetter
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_GET, require_POST
+from .cache import tiered_cache
+from .changelog import read_changes
+from .conditional import report_api_etag, report_last_modified, dashboard_api_etag, data_query_etag, data_version
+from .memberships import herd_composition, herd_transfer_counts
+from .models import Herd, Job
+from .projection import census_projection, parse_projection_params, MAX_PROJECTION_MONTHS
+from .report_calculations import AGE_GROUPS
+from .sync import SyncRejected, apply_upload, chunked, delta_sync, full_sync, latest_token, read_upload
+from .utils import parse_report_range
+from .views import dashboard_data
+from .views_movement_report import LivestockMovementReportView
+
+REPORT_COLUMNS = {
+    'group': attrgetter('group_name'),
+    'start_count': attrgetter('start_date_count'),
+    'end_count': attrgetter('end_date_count'),
+    'difference': attrgetter('count_difference'),
+    'acquired_birth': attrgetter('acquisition_stats.birth_count'),
+    'acquired_purchase': attrgetter('acquisition_stats.purchase_count'),
+    'acquired_gift': attrgetter('acquisition_stats.gift_count'),
+    'lost_death': attrgetter('acquisition_stats.death_count'),
+    'lost_sold': attrgetter('acquisition_stats.sold_count'),
+    'lost_consumed': attrgetter('acquisition_stats.consumed_count'),
+    'lost_gifted': attrgetter('acquisition_stats.gifted_count'),
+    'moved_in': attrgetter('movement_stats.moved_in'),
+    'moved_out': attrgetter('movement_stats.moved_out'),
+}
+
+DASHBOARD_COLUMNS = {
+    'group': attrgetter('group_name'),
+    'active_cattle': attrgetter('active_cattle'),
+}
+
+
+class FieldsError(ValueError):
+    """
+    Raised when the 'fields' query parameter names unknown columns.
+    """
+
+
+def requested_columns(request, columns):
+    """
+    Returns the columns selected by the comma-separated 'fields' query parameter, or all columns without it.
+
+    :param request: The HTTP request object.
+    :param columns: The available columns, keyed by name.
+    :return: The selected column names, in the requested order.
+    :raises FieldsError: If the parameter names an unknown column.
+    """
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(columns)
+
+    selected = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in columns]
+    if unknown:
+        raise FieldsError(f'Unknown fields: {", ".join(unknown)}. Available fields: {", ".join(columns)}.')
+    return list(dict.fromkeys(selected))
+
+
+def columnar(rows, columns, selected):
+    """
+    Turns a list of objects into a dictionary of parallel value arrays, one per selected column.
+
+    :param rows: The objects, one per row.
+    :param columns: The available columns, mapping names to value getters.
+    :param selected: The names of the columns to include.
+    :return: A dictionary of column names to lists of values.
+    """
+    return {name: [columns[name](row) for row in rows] for name in selected}
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(require_GET, name='dispatch')
+class LivestockMovementReportApiView(LivestockMovementReportView):
+    """
+    Returns the livestock movement report as JSON with one array per column instead of one object per group.
+
+    Takes the same 'start_date', 'end_date' and 'by' query parameters as the HTML report, and an optional
+    comma-separated 'fields' parameter to select the columns. Conditional requests are answered with 304 Not Modified
+    while the data version is unchanged.
+    """
+
+    @method_decorator(condition(etag_func=report_api_etag, last_modified_func=report_last_modified))
+    def get(self, request):
+        """
+        Handles the GET request for the JSON report.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            JsonResponse: The columnar report, or an error with status 400 for missing dates, unknown dimensions or
+            unknown fields.
+        """
+        if not self.load_report_data(request):
+            return JsonResponse({'error': 'The start_date and end_date parameters must be ISO dates and the by '
+                                          'parameter must name report dimensions.'}, status=400)
+        try:
+            selected = requested_columns(request, REPORT_COLUMNS)
+        except FieldsError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        groups = self.load_report_groups()
+        return JsonResponse({
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'dimensions': self.dimensions,
+            'rows': len(groups),
+            'columns': columnar(groups, REPORT_COLUMNS, selected),
+        })
+
+
+@login_required
+@require_GET
+@condition(etag_func=dashboard_api_etag)
+def dashboard_api(request):
+    """
+    Returns the home page statistics as JSON: the active herd, field and cattle totals and the active cattle of every
+    group as columnar arrays.
+
+    Takes an optional comma-separated 'fields' parameter to select the group columns. Conditional requests are
+    answered with 304 Not Modified while the data version and the day are unchanged.
+
+    :param request: The HTTP request object.
+    :return: The JSON response, or an error with status 400 for unknown fields.
+    """
+    try:
+        selected = requested_columns(request, DASHBOARD_COLUMNS)
+    except FieldsError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    today = date.today()
+    version, _ = data_version(request)
+    data = tiered_cache.get_or_set('dashboard', today.isoformat(), lambda: dashboard_data(today, version))
+    return JsonResponse({
+        'date': today.isoformat(),
+        'totals': {
+            'active_herds': data['active_herds_count'],
+            'active_fields': data['active_field_count'],
+            'active_cattle': data['total_cattle_count'],
+        },
+        'rows': len(data['groups']),
+        'columns': columnar(data['groups'], DASHBOARD_COLUMNS, selected),
+    })
+
+
+@login_required
+@require_GET
+@condition(etag_func=data_query_etag)
+def projection_api(request):
+    """
+    Returns the census projection as JSON: the projected month dates and one array of counts per age group.
+
+    Takes the same 'months' and 'rates' query parameters as the projection page. Conditional requests are answered
+    with 304 Not Modified while the data version and the day are unchanged.
+
+    :param request: The HTTP request object.
+    :return: The JSON response, or an error with status 400 for an invalid number of months.
+    """
+    options = parse_projection_params(request.GET)
+    if options is None:
+        return JsonResponse({'error': f'The months parameter must be a number between 1 and {MAX_PROJECTION_MONTHS}.'},
+                            status=400)
+
+    months, apply_rates = options
+    projection = census_projection(months, apply_rates)
+    return JsonResponse({
+        'months': [month_date.isoformat() for month_date in projection.month_dates],
+        'rates': projection.rates,
+        'columns': {**{group: projection.counts[group] for group in AGE_GROUPS}, 'total': projection.totals},
+    })
+
+
+@login_required
+@require_GET
+@condition(etag_func=data_query_etag)
+def herd_composition_api(request, herd_id):
+    """
+    Returns the cattle that were in a herd on the date in the 'date' query parameter, today by default, as JSON
+    columns, read from the herd membership history.
+
+    :param request: The HTTP request object.
+    :param herd_id: The ID of the herd.
+    :return: The JSON response, or an error with status 400 for an invalid date.
+    """
+    herd = get_object_or_404(Herd, id=herd_id)
+    try:
+        on_date = date.fromisoformat(request.GET['date']) if 'date' in request.GET else date.today()
+    except ValueError:
+        return JsonResponse({'error': 'The date parameter must be an ISO date.'}, status=400)
+
+    cattle = list(herd_composition(herd.pk, on_date).order_by('number').values('id', 'number', 'name', 'gender',
+                                                                                'breed', 'birth_date'))
+    return JsonResponse({
+        'herd': herd.name,
+        'date': on_date.isoformat(),
+        'rows': len(cattle),
+        'columns': {name: [row[name] for row in cattle] for name in ('id', 'number', 'name', 'gender', 'breed',
+                                                                      'birth_date')},
+    })
+
+
+@login_required
+@require_GET
+@condition(etag_func=data_query_etag)
+def herd_transfers_api(request):
+    """
+    Returns the number of cattle moved between every pair of herds from 'start_date' up to, but not including,
+    'end_date' as JSON columns.
+
+    :param request: The HTTP request object.
+    :return: The JSON response, or an error with status 400 for missing or invalid dates.
+    """
+    report_range = parse_report_range(request.GET)
+    if report_range is None:
+        return JsonResponse({'error': 'The start_date and end_date parameters must be ISO dates.'}, status=400)
+
+    transfers = herd_transfer_counts(*report_range)
+    return JsonResponse({
+        'start_date': report_range[0].isoformat(),
+        'end_date': report_range[1].isoformat(),
+        'rows': len(transfers),
+        'columns': {name: [row[name] for row in transfers] for name in ('from_herd', 'to_herd', 'count')},
+    })
+
+
+@login_required
+@require_GET
+def changes_api(request):
+    """
+    Returns the change log entries after the 'after' cursor as JSON, for consumers that tail the changes.
+
+    Takes the cursor from the 'after' query parameter, 0 by default, at most 'limit' entries, 500 by default and at
+    most CHANGE_LOG_PAGE_SIZE, and optional comma-separated 'models'. The response has the entries and the cursor to
+    pass as 'after' on the next request.
+
+    :param request: The HTTP request object.
+    :return: The JSON response, or an error with status 400 for an invalid cursor or limit.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = min(int(request.GET.get('limit', settings.CHANGE_LOG_PAGE_SIZE)), settings.CHANGE_LOG_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'The after and limit parameters must be numbers.'}, status=400)
+    if after < 0 or limit < 1:
+        return JsonResponse({'error': 'The after and limit parameters must be positive.'}, status=400)
+
+    models = [name for name in request.GET.get('models', '').split(',') if name]
+    entries, cursor = read_changes(after, limit, models)
+    return JsonResponse({
+        'entries': [
+            {
+                'id': entry.id,
+                'model': entry.model,
+                'object_id': entry.object_id,
+                'action': entry.action,
+                'changes': entry.changes,
+                'user_id': entry.user_id,
+                'created_at': entry.created_at,
+            }
+            for entry in entries
+        ],
+        'cursor': cursor,
+        'has_more': len(entries) == limit,
+    })
+
+
+@login_required
+@require_GET
+def sync_api(request):
+    """
+    Returns the rows changed since the change token in the 'token' query parameter as NDJSON, for devices that work
+    offline.
+
+    The first line is a header with the new 'token' to pass on the next sync, 'has_more' when the device must sync
+    again to catch up, 'full' when the response is a full download and the 'csrf_token' of the session. Devices
+    upload with the session cookie of their login and send the newest csrf_token as the X-CSRFToken header, as
+    sync_upload_api is protected against cross-site requests like every other POST view. Every other line is one row as
+    {"model", "id", "data"}, or {"model", "id", "deleted": true} for rows that were deleted. Without a token, or with a
+    token newer than the change log, e.g. after a restore, every live row is sent and the device replaces its copy.
+    The response is streamed and compressed by CompressionMiddleware.
+
+    :param request: The HTTP request object.
+    :return: The streamed NDJSON response, or an error with status 400 for an invalid token.
+    """
+    try:
+        since = int(request.GET['token']) if request.GET.get('token') else None
+    except ValueError:
+        return JsonResponse({'error': 'The token parameter must be a change token from a previous sync.'}, status=400)
+
+    token = latest_token()
+    if since is None or not 0 <= since <= token:
+        lines = full_sync(token, get_token(request))
+    else:
+        lines = delta_sync(since, settings.SYNC_PAGE_SIZE, get_token(request))
+    return StreamingHttpResponse(chunked(lines), content_type='application/x-ndjson')
+
+
+@login_required
+@require_POST
+def sync_upload_api(request):
+    """
+    Applies a batch of edits made offline, uploaded as NDJSON and optionally gzip-compressed, in one transaction.
+
+    Every line is an edit with the 'model', the 'action' ('create', 'update' or 'delete'), the 'id' of the row and the
+    'token' the device synced before the edit for updates and deletes, the changed columns as 'data' and an optional
+    'ref', a unique string such as a UUID, for creates. A create whose ref was applied before returns the row it
+    created instead of creating another one, and foreign keys can be given as {"ref": ...} to point at rows created
+    by earlier edits. Deleting a row that is already deleted succeeds. The request needs the X-CSRFToken header with
+    the 'csrf_token' of the last sync, see sync_api. Edits that overwrite columns changed on the server after the
+    device's token are conflicts and reject the whole batch, so the device can sync, resolve them and upload again.
+    Applied edits are logged like any other change, so the device receives the saved rows on its next sync.
+
+    :param request: The HTTP request object.
+    :return: The JSON response with the 'applied' edits, or the rejected edits as 'errors' with status 400 or
+        'conflicts' with status 409.
+    """
+    try:
+        edits = read_upload(request.body, request.headers.get('Content-Encoding', ''), settings.SYNC_MAX_UPLOAD_SIZE)
+        applied = apply_upload(edits)
+    except SyncRejected as exc:
+        return JsonResponse({'conflicts' if exc.status == 409 else 'errors': exc.errors}, status=exc.status)
+    return JsonResponse({'applied': applied})
+
+
+@login_required
+@require_GET
+def job_api(request, job_id):
+    """
+    Returns the status, progress and result of a background job as JSON, for clients that poll a job they queued.
+
+    :param request: The HTTP request object.
+    :param job_id: The ID of the job.
+    :return: The JSON response.
+    """
+    job = get_object_or_404(Job, id=job_id)
+    return JsonResponse({
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'progress_message': job.progress_message,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    })
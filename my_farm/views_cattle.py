@@ -3,8 +3,10 @@ from django.db.models import Q
 from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
+from django.views.decorators.http import condition
 from django.views.generic import DeleteView
 from django_app.forms import GenderForm, CattleForm
+from my_farm.conditional import cattle_detail_etag, cattle_detail_last_modified
 from my_farm.models import Cattle, Herd
 
 
@@ -19,7 +21,7 @@ def cattle_info(request):
     """
     query_loss_method_null = request.GET.get('query_loss_method_null')
 
-    cattle = Cattle.objects.filter(deleted=False)
+    cattle = Cattle.objects.for_listing()
 
     if query_loss_method_null:
         cattle = cattle.filter(loss_method__isnull=True)
@@ -79,7 +81,7 @@ def search_cattle(request):
     """
     query = request.GET.get('query')
     if query:
-        cattle_list = Cattle.objects.filter(deleted=False).filter(
+        cattle_list = Cattle.objects.filter(
             Q(type__icontains=query) |
             Q(number__icontains=query) |
             Q(name__icontains=query) |
@@ -91,9 +93,9 @@ def search_cattle(request):
             Q(loss_method__icontains=query) |
             Q(end_date__icontains=query) |
             Q(comments__icontains=query)
-        )
+        ).for_listing()
     else:
-        cattle_list = Cattle.objects.filter(deleted=False)
+        cattle_list = Cattle.objects.for_listing()
 
     context = {
         'cattle_list': cattle_list,
@@ -104,7 +106,8 @@ def search_cattle(request):
 
 def add_cattle(request):
     """
-    Adds a new row to the cattle table based on the submitted form data.
+    Adds a new row to the cattle table based on the submitted form data and opens its herd membership from its entry
+    date.
 
     :param request: The HTTP request object.
     :return: The rendered HTTP response with the form or a redirect to the cattle information page.
@@ -126,7 +129,8 @@ def add_cattle(request):
 
 def update_cattle(request, cattle_id=None):
     """
-    Updates the information of a specific cattle based on the submitted form data.
+    Updates the information of a specific cattle based on the submitted form data and records a herd change in its
+    membership history.
 
     :param request: The HTTP request object.
     :param cattle_id: The ID of the cattle to be updated.
@@ -150,15 +154,18 @@ def update_cattle(request, cattle_id=None):
     return render(request, 'cattle/update_cattle.html', context)
 
 
+@condition(etag_func=cattle_detail_etag, last_modified_func=cattle_detail_last_modified)
 def cattle_detail(request, cattle_id=None):
     """
     Displays detailed information about a specific cattle.
 
+    Answers conditional requests with 304 Not Modified while the cattle and its herd are unchanged.
+
     :param request: The HTTP request object.
     :param cattle_id: The ID of the cattle to display information about.
     :return: The rendered HTTP response with the cattle information.
     """
-    cattle = get_object_or_404(Cattle, id=cattle_id) if cattle_id else None
+    cattle = get_object_or_404(Cattle.objects.for_detail(), id=cattle_id) if cattle_id else None
     return render(request, 'cattle/cattle_detail.html', {'cattle': cattle})
 
 
@@ -1,27 +1,30 @@
-from django.core.paginator import Paginator
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.shortcuts import render, redirect, get_object_or_404
 from django_app.forms import FieldForm
+from django.views.decorators.http import condition
+from .cache import cached_page
+from .conditional import field_detail_etag
 from .models import Field, Herd
+from .occupancy import field_occupancy
+from .utils import parse_report_range
 
 
 def field_list(request):
     """
     Retrieves field information and displays the list of fields.
-    The fields are paginated to display 5 fields per page.
+    The fields are paginated by name to display 5 fields per page, and the pages are cached in the 'fields' cache
+    namespace.
 
     :param request: The HTTP request object.
     :return: The rendered HTTP response with the field information displayed.
     """
     is_active = request.GET.get('is_active')
-    fields = Field.objects.annotate(count_herd=Count('field_herds'))
+    fields = Field.objects.for_listing().order_by('name', 'id')
 
     if is_active == 'True':
         fields = fields.filter(is_active=True)
 
-    paginator = Paginator(fields, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = cached_page('fields', f'list:{is_active == "True"}', fields, 5, request.GET.get('page'))
 
     return render(request, 'fields/field_list.html', {'page_obj': page_obj})
 
@@ -75,9 +78,15 @@ def update_field(request, field_id):
     return render(request, 'fields/update_field.html', {'form': form, 'field': field})
 
 
+@condition(etag_func=field_detail_etag)
 def field_detail(request, field_id=None):
     """
-    Displays detailed information about a specific field.
+    Displays detailed information about a specific field and its daily head count, livestock units and stocking
+    density, flagging fields stocked above capacity.
+
+    The occupancy covers the last FIELD_OCCUPANCY_DAYS days, or the 'start_date' and 'end_date' query parameters, and
+    is cached in the 'occupancy' cache namespace. Answers conditional requests with 304 Not Modified while the field
+    and the cattle data are unchanged.
 
     :param request: The HTTP request object.
     :param field_id: The ID of the field to display information about.
@@ -85,10 +94,16 @@ def field_detail(request, field_id=None):
     """
     field = get_object_or_404(Field, id=field_id) if field_id else None
 
+    context = {'field': field}
     if field:
-        field.herd_count = field.field_herds.count()
+        start_date, end_date = parse_report_range(request.GET) or (None, None)
+        if start_date and end_date and start_date > end_date:
+            start_date, end_date = None, None
+        occupancy = field_occupancy(field, start_date, end_date)
+        context['occupancy'] = occupancy
+        context['chart_points'], context['capacity_y'] = occupancy.chart_points()
 
-    return render(request, 'fields/field_detail.html', {'field': field})
+    return render(request, 'fields/field_detail.html', context)
 
 
 def upload_field_picture(request, field_id):
@@ -123,9 +138,7 @@ def herd_list_by_field(request, field_id):
     :return: The rendered herd_list_by_field page with the field and herd_list as context.
     """
     field = get_object_or_404(Field, id=field_id)
-    herd_list = Herd.objects.filter(field=field).annotate(
-        count_cattle=Count('cattle', filter=Q(cattle__deleted=False, cattle__loss_method__isnull=True))
-    )
+    herd_list = Herd.objects.filter(field=field).for_listing()
 
     return render(request, 'fields/herd_list_by_field.html', {'field': field, 'herd_list': herd_list})
 
@@ -146,7 +159,7 @@ def search_field(request):
         except KeyError:
             is_active_value = None
 
-        field_list = Field.objects.annotate(count_herd=Count('field_herds')).filter(
+        field_list = Field.objects.for_listing().filter(
             Q(name__icontains=query) |
             Q(location__icontains=query) |
             Q(coordinates__icontains=query) |
@@ -157,7 +170,7 @@ def search_field(request):
             Q(is_active=is_active_value)
         )
     else:
-        field_list = Field.objects.annotate(count_herd=Count('field_herds'))
+        field_list = Field.objects.for_listing()
 
     context = {
         'field_list': field_list,
@@ -1,7 +1,9 @@
-from django.core.paginator import Paginator
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.shortcuts import render, redirect, get_object_or_404
 from django_app.forms import HerdForm
+from django.views.decorators.http import condition
+from my_farm.cache import cached_page
+from my_farm.conditional import herd_detail_etag, herd_detail_last_modified
 from my_farm.models import Cattle, Herd
 
 
@@ -9,28 +11,20 @@ def herd_list(request):
     """
     Retrieves herd information and displays the list of herds.
 
-    This view retrieves information about herds, including the number of active cattle in each herd. Only cattle that
-    are not marked as deleted and have no loss method specified are counted. The herds are paginated to display 5 herds
-    per page.
+    This view retrieves information about herds, including the number of active cattle in each herd, read from the
+    stored 'active_cattle_count' column. The herds are paginated by name to display 5 herds per page, and the pages are
+    cached in the 'herds' cache namespace.
     :param request: The HTTP request object.
     :return: The rendered HTTP response with the herd information displayed.
 
     """
-
-    cattle_count_query = Count(
-        'cattle',
-        filter=Q(cattle__deleted=False, cattle__loss_method__isnull=True)
-    )
-
     is_active = request.GET.get('is_active')
 
-    herds = Herd.objects.annotate(count_cattle=cattle_count_query)
+    herds = Herd.objects.for_listing().order_by('name', 'id')
     if is_active == 'True':
         herds = herds.filter(is_active=True)
 
-    paginator = Paginator(herds, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = cached_page('herds', f'list:{is_active == "True"}', herds, 5, request.GET.get('page'))
 
     context = {'page_obj': page_obj}
     return render(request, 'herd/herd_list.html', context)
@@ -52,7 +46,7 @@ def add_herd(request):
 
             herd_leader_id = request.POST.get('herd_leader')
             if herd_leader_id:
-                herd_leader = Cattle.objects.filter(id=herd_leader_id, deleted=False, loss_method__isnull=True).first()
+                herd_leader = Cattle.objects.active().filter(id=herd_leader_id).first()
                 if herd_leader:
                     herd.herd_leader = herd_leader
                     herd.save()
@@ -61,7 +55,7 @@ def add_herd(request):
     else:
         form = HerdForm()
 
-    cattle_queryset = Cattle.objects.filter(deleted=False, loss_method__isnull=True)
+    cattle_queryset = Cattle.objects.active()
 
     return render(request, 'herd/add_herd.html', {'form': form, 'cattle_queryset': cattle_queryset})
 
@@ -91,24 +85,24 @@ def update_herd(request, herd_id=None):
     else:
         form = HerdForm(instance=herd)
 
-    form.fields['cattle'].queryset = Cattle.objects.filter(deleted=False, loss_method__isnull=True)
-    form.fields['herd_leader'].queryset = Cattle.objects.filter(deleted=False, loss_method__isnull=True)
+    form.fields['cattle'].queryset = Cattle.objects.active()
+    form.fields['herd_leader'].queryset = Cattle.objects.active()
 
     return render(request, 'herd/update_herd.html', {'form': form, 'herd': herd})
 
 
+@condition(etag_func=herd_detail_etag, last_modified_func=herd_detail_last_modified)
 def herd_detail(request, herd_id=None):
     """
     Displays detailed information about a specific herd.
 
+    Answers conditional requests with 304 Not Modified while the herd, its field and its leader are unchanged.
+
     :param request: The HTTP request object.
     :param herd_id: The ID of the herd to display information about.
     :return: The rendered HTTP response with the herd information.
     """
-    herd = get_object_or_404(Herd, id=herd_id) if herd_id else None
-
-    if herd:
-        herd.cattle_count = herd.cattle_set.filter(deleted=False, loss_method__isnull=True).count()
+    herd = get_object_or_404(Herd.objects.for_detail(), id=herd_id) if herd_id else None
 
     return render(request, 'herd/herd_detail.html', {'herd': herd})
 
@@ -146,7 +140,7 @@ def cattle_list_by_herd(request, herd_id):
     :return: The rendered cattle_list_by_herd page with the herd and cattle_list as context.
     """
     herd = get_object_or_404(Herd, id=herd_id)
-    cattle_list = Cattle.objects.filter(herd=herd, deleted=False, loss_method__isnull=True)
+    cattle_list = Cattle.objects.active().filter(herd=herd).for_listing()
 
     context = {
         'herd': herd,
@@ -172,20 +166,18 @@ def search_herd(request):
         except KeyError:
             is_active_value = None
 
-        herd_list = Herd.objects.annotate(
-            count_cattle=Count('cattle')
-        ).filter(
+        herd_list = Herd.objects.for_listing().filter(
             Q(name__icontains=query) |
             Q(location__icontains=query) |
             Q(field__name__icontains=query) |
             Q(description__icontains=query) |
             Q(start_date__icontains=query) |
             Q(herd_leader__name__icontains=query) |
-            Q(count_cattle__icontains=query) |
+            Q(active_cattle_count__icontains=query) |
             Q(is_active=is_active_value)
         )
     else:
-        herd_list = Herd.objects.annotate(count_cattle=Count('cattle'))
+        herd_list = Herd.objects.for_listing()
 
     context = {
         'herd_list': herd_list,
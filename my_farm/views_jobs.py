@@ -0,0 +1,34 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+from .jobs import JOBS, enqueue
+from .models import Job
+
+RECENT_JOBS = 50
+
+
+@login_required
+def job_list(request):
+    """
+    Renders the jobs page with the latest background jobs and their progress, and queues a job submitted with the
+    form.
+
+    The page reloads itself every few seconds while jobs are queued or running, so their progress stays current.
+
+    :param request: The HTTP request object.
+    :return: The rendered jobs page, or a redirect to it after queueing a job.
+    """
+    if request.method == 'POST' and request.POST.get('name') in JOBS:
+        try:
+            priority = int(request.POST.get('priority') or 0)
+        except ValueError:
+            priority = 0
+        enqueue(request.POST['name'], priority=priority, user=request.user)
+        return redirect('my_farm:job_list')
+
+    jobs = list(Job.objects.select_related('created_by').order_by('-created_at')[:RECENT_JOBS])
+    context = {
+        'jobs': jobs,
+        'job_names': sorted(JOBS),
+        'active': any(job.status in (Job.QUEUED, Job.RUNNING) for job in jobs),
+    }
+    return render(request, 'my_farm/jobs.html', context)
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.http import HttpResponse, Http404
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from .metrics import collect, cache_hit_ratios, render
+from .models import Cattle, Herd
+
+
+@require_GET
+def metrics(request):
+    """
+    Renders the application metrics in the Prometheus text exposition format.
+
+    The endpoint is only available when METRICS_TOKEN is set, and the token must be sent either as a bearer token in
+    the Authorization header or as the 'token' query parameter.
+
+    :param request: The HTTP request object.
+    :return: The HTTP response with the metrics.
+    :raises Http404: If the endpoint is disabled or the token is missing or wrong.
+    """
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ') or request.GET.get('token', '')
+    if not settings.METRICS_TOKEN or not constant_time_compare(token, settings.METRICS_TOKEN):
+        raise Http404
+
+    counters, histograms = collect()
+
+    herd_sizes = Herd.objects.values_list('id', 'name', 'active_cattle_count')
+    gauges = {
+        ('my_farm_herd_size', (('herd', herd_id), ('name', name))): count for herd_id, name, count in herd_sizes
+    }
+    gauges[('my_farm_active_cattle', ())] = Cattle.objects.active().count()
+    gauges.update(cache_hit_ratios(counters))
+
+    return HttpResponse(render(counters, histograms, gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
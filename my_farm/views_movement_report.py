@@ -1,8 +1,19 @@
-from datetime import date, datetime
+import time
+from urllib.parse import urlencode
 from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
+from .cache import tiered_cache
 from .cattle_groups import GroupsManagement
-from .report_calculations import AcquisitionLossCalculator, MovementCalculator, GroupNumbers
+from .memberships import herds_as_of
+from .conditional import report_etag, report_last_modified
+from .metrics import record_report
+from .models import Herd
+from .report_calculations import GroupByCalculator, REPORT_DIMENSIONS, parse_report_dimensions
+from .snapshot import cattle_snapshot
+from .utils import parse_report_range
 
 
 class GenerateReportView(View):
@@ -45,19 +56,21 @@ class GenerateReportView(View):
         """
         Handles the POST request for generating a report.
 
+        The form submits to the report page directly; this keeps older form posts working by redirecting them to the
+        report URL with the dates in the query string.
+
         :param: request (HttpRequest): The HTTP request object.
         :return:HttpResponse: The redirect HTTP response to the report page.
         """
-        start_date = datetime.fromisoformat(request.POST.get('start_date')).date()
-        end_date = datetime.fromisoformat(request.POST.get('end_date')).date()
-
-        # Store the data in session
-        request.session['report_data'] = {
-            'start_date': start_date.isoformat(),
-            'end_date': end_date.isoformat(),
-        }
+        report_range = parse_report_range(request.POST)
+        dimensions = parse_report_dimensions(request.POST)
+        if report_range is None or dimensions is None:
+            return render(request, self.generate_report_template)
 
-        return redirect('my_farm:report')
+        start_date, end_date = report_range
+        query = urlencode({'start_date': start_date.isoformat(), 'end_date': end_date.isoformat(),
+                           'by': ','.join(dimensions)})
+        return redirect(f"{reverse('my_farm:report')}?{query}")
 
 
 class LivestockMovementReportView(GroupsManagement, GenerateReportView, View):
@@ -71,8 +84,10 @@ class LivestockMovementReportView(GroupsManagement, GenerateReportView, View):
 
     Methods:
         __init__(): Initializes the class and sets initial values.
-        load_report_data(request): Loads the report data from the session.
+        load_report_data(request): Loads the report dates from the query string.
         get(request): Handles the GET request for generating and displaying the report.
+        load_report_groups(): Returns the cached report statistics of every group.
+        calculate_report_groups(): Calculates the report statistics of every group.
     """
 
     report_template = 'my_farm/livestock_movement_report.html'
@@ -87,10 +102,13 @@ class LivestockMovementReportView(GroupsManagement, GenerateReportView, View):
         super(GenerateReportView, self).__init__()
         super(View, self).__init__()
         self.groups = []
+        self.dimensions = ('age_group',)
 
     def load_report_data(self, request):
         """
-        Loads the report data from the session.
+        Loads the report dates from the 'start_date' and 'end_date' query parameters, so that report URLs are
+        idempotent and can be bookmarked and cached, and the dimensions to group by from the comma-separated 'by'
+        parameter, which defaults to the age group.
 
         Args:
             request (HttpRequest): The HTTP request object.
@@ -98,19 +116,26 @@ class LivestockMovementReportView(GroupsManagement, GenerateReportView, View):
         Returns:
             bool: True if the report data is loaded successfully, False otherwise.
         """
-        report_data = request.session.get('report_data')
-        if not report_data:
+        report_range = parse_report_range(request.GET)
+        if report_range is None:
             return False
 
-        self.start_date = date.fromisoformat(report_data['start_date'])
-        self.end_date = date.fromisoformat(report_data['end_date'])
+        dimensions = parse_report_dimensions(request.GET)
+        if dimensions is None:
+            return False
+
+        self.start_date, self.end_date = report_range
+        self.dimensions = dimensions
 
         return True
 
+    @method_decorator(condition(etag_func=report_etag, last_modified_func=report_last_modified))
     def get(self, request):
         """
         Handles the GET request for generating and displaying the livestock movement report.
 
+        Conditional requests are answered with 304 Not Modified while the data version is unchanged.
+
         Args:
             request (HttpRequest): The HTTP request object.
 
@@ -121,49 +146,50 @@ class LivestockMovementReportView(GroupsManagement, GenerateReportView, View):
         if not self.load_report_data(request):
             return redirect('my_farm:generate_report')
 
-        # Initialize the GroupsManagement instance
-        groups_manager = GroupsManagement()
-
-        # Calculate groups data for estimation, start date, and end date
-        estimation_date = groups_manager.calculate_groups(reference_date=self.end_date)
-        start_date_groups = groups_manager.calculate_groups(reference_date=self.start_date)
-        end_date_groups = groups_manager.calculate_groups(reference_date=self.end_date)
-
-        # Initialize the groups list to store group statistics
-        self.groups = []
-
-        for group_name, cattle_data in estimation_date.items():
-            # Create a GroupNumbers instance and calculate statistics
-            group = GroupNumbers(group_name, cattle_data)
-            group.calculate_start_date_stats(start_date_groups, self.start_date)
-            group.calculate_end_date_stats(end_date_groups, self.end_date)
-            group.calculate_difference()
-
-            # Create an instance of AcquisitionLossCalculator and calculate acquisition and loss statistics
-            acquisition_loss_calculator = AcquisitionLossCalculator(group_name, cattle_data)
-            acquisition_loss_calculator.calculate_acquisition(self.start_date, self.end_date)
-            acquisition_loss_calculator.calculate_loss(self.start_date, self.end_date)
-
-            # Assign acquisition and loss statistics to the group
-            group.acquisition_stats = acquisition_loss_calculator
-
-            # Create an instance of MovementCalculator and calculate movement statistics
-            movement_calculator = MovementCalculator(group_name, cattle_data)
-            movement_calculator.calculate_movement_in_and_out(start_date_groups, self.start_date, end_date_groups,
-                                                              self.end_date)
-
-            # Assign movement statistics to the group
-            group.movement_stats = movement_calculator
-
-            # Add the group to the list of groups
-            self.groups.append(group)
+        self.groups = self.load_report_groups()
 
         # Prepare context for rendering the report template
         context = {
             'start_date': self.start_date.isoformat(),
             'end_date': self.end_date.isoformat(),
+            'dimensions': ' / '.join(REPORT_DIMENSIONS[name] for name in self.dimensions),
             'groups': self.groups,
         }
 
         # Render the report template and return the HTTP response
-        return render(request, self.report_template, context)
\ No newline at end of file
+        return render(request, self.report_template, context)
+
+    def load_report_groups(self):
+        """
+        Returns the report statistics of every group from the 'reports' cache, calculating them on a miss.
+
+        Returns:
+            list: The ReportCell of every group.
+        """
+        key = f'{self.start_date.isoformat()}:{self.end_date.isoformat()}:{",".join(self.dimensions)}'
+        return tiered_cache.get_or_set('reports', key, self.calculate_report_groups)
+
+    def calculate_report_groups(self):
+        """
+        Calculates the statistics of every group for the report period with a single pass over the cattle snapshot.
+
+        Grouped by herd or field, the herds of the cattle at the start and end of the period are loaded from the herd
+        memberships, so moves between herds are reported, and the names of the current herds for the cattle without a
+        membership on those dates.
+
+        Returns:
+            list: The ReportCell of every group.
+        """
+        started = time.perf_counter()
+
+        columns = cattle_snapshot.current()
+        herds_at_start = herds_at_end = current_herds = None
+        if {'herd', 'field'} & set(self.dimensions):
+            herds_at_start, herds_at_end = herds_as_of(self.start_date), herds_as_of(self.end_date)
+            current_herds = {herd_id: (name, field_name) for herd_id, name, field_name in
+                             Herd.objects.values_list('id', 'name', 'field__name')}
+        self.groups = GroupByCalculator(self.dimensions).calculate(columns, self.start_date, self.end_date,
+                                                                   herds_at_start, herds_at_end, current_herds)
+
+        record_report(self.start_date, self.end_date, time.perf_counter() - started)
+        return self.groups
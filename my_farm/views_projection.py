@@ -0,0 +1,32 @@
+from django.shortcuts import render
+from django.views.decorators.http import condition
+from .conditional import data_query_etag
+from .projection import census_projection, parse_projection_params, MAX_PROJECTION_MONTHS
+from .report_calculations import AGE_GROUPS
+
+
+@condition(etag_func=data_query_etag)
+def projection(request):
+    """
+    Renders the census projection page: the projected number of cattle in every age group for each of the next
+    months.
+
+    Takes the number of months from the 'months' query parameter, 12 by default, and applies the historical birth and
+    loss rates when the 'rates' parameter is set. The projection is cached in the 'projections' cache namespace until
+    the cattle change. Conditional requests are answered with 304 Not Modified while the data version and the day are
+    unchanged.
+
+    :param request: The HTTP request object.
+    :return: The rendered census projection page.
+    """
+    options = parse_projection_params(request.GET) or (12, False)
+    months, apply_rates = options
+
+    context = {
+        'projection': census_projection(months, apply_rates),
+        'groups': AGE_GROUPS,
+        'months': months,
+        'apply_rates': apply_rates,
+        'month_choices': [3, 6, 12, 24, MAX_PROJECTION_MONTHS],
+    }
+    return render(request, 'my_farm/projection.html', context)